@@ -0,0 +1,217 @@
+"""Retrieval and end-to-end QA benchmarks on synthetic corpora.
+
+    python -m benchmarks.run --scale tiny
+    python -m benchmarks.run --scale small --save-baseline
+    python -m benchmarks.run --scale small --fail-on-regression
+
+Results are written as JSON to benchmarks/results/<scale>.json and compared with
+benchmarks/baselines/<scale>.json when it exists. LLM calls go to a local stub.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+from benchmarks.stub_llm import StubCompletion  # noqa: E402
+from benchmarks.synthetic import SCALES, MB, generate_corpus, generate_questions  # noqa: E402
+from src.hypernodes import HyperNode  # noqa: E402
+
+NODES_PATH = ROOT / "src" / "nodes"
+BENCHMARKS: Dict[str, Callable[..., Dict[str, float]]] = {}
+
+
+def benchmark(name: str):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def timed(func: Callable[[], Any]):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def latency_stats(prefix: str, seconds: List[float]) -> Dict[str, float]:
+    return {f"{prefix}_p50_seconds": float(np.percentile(seconds, 50)),
+            f"{prefix}_p95_seconds": float(np.percentile(seconds, 95)),
+            f"{prefix}_mean_seconds": float(np.mean(seconds))}
+
+
+def load_chunks(texts_path: str) -> List[str]:
+    chunks = []
+    for path in sorted(Path(texts_path).glob("*.txt")):
+        chunks.extend(path.read_text(encoding="utf-8").split("\n\n"))
+    return chunks
+
+
+def recall_at_k(ranked: List[List[str]], answers: List[str]) -> float:
+    hits = sum(any(answer in chunk[:20] for chunk in chunks) for chunks, answer in zip(ranked, answers))
+    return hits / max(1, len(answers))
+
+
+@benchmark("sklearn_ranker")
+def bench_ranker(texts_path: str, questions: List[str], answers: List[str], args, ranker_type: str = "sklearn_ranker"):
+    chunks = load_chunks(texts_path)
+    # a fresh (uncached) load so the index is built from scratch
+    ranker = HyperNode.load(str(NODES_PATH / ranker_type), use_cache=False)
+    ranker.instantiate_inputs()
+
+    _, index_seconds = timed(lambda: ranker.execute(final_vars=["top_k_chunks"],
+                                                    inputs={"text_chunks": chunks, "query": questions[0]}))
+    latencies = []
+    for question in questions[:args.latency_samples]:
+        _, seconds = timed(lambda: ranker.execute(final_vars=["top_k_chunks"],
+                                                  inputs={"text_chunks": chunks, "query": question}))
+        latencies.append(seconds)
+
+    ranked, batch_seconds = timed(lambda: ranker.execute(final_vars=["batch_top_k_chunks"],
+                                                         inputs={"text_chunks": chunks, "queries": questions}))
+    return {"chunks": len(chunks),
+            "index_build_seconds": index_seconds,
+            **latency_stats("query", latencies),
+            "batch_queries_per_second": len(questions) / batch_seconds,
+            "recall_at_k": recall_at_k(ranked["batch_top_k_chunks"], answers)}
+
+
+@benchmark("bm25_ranker")
+def bench_bm25_ranker(texts_path: str, questions: List[str], answers: List[str], args):
+    return bench_ranker(texts_path, questions, answers, args, ranker_type="bm25_ranker")
+
+
+@benchmark("rag_qa")
+def bench_rag_qa(texts_path: str, questions: List[str], answers: List[str], args):
+    rag_qa = HyperNode.load(str(NODES_PATH / "rag_qa"))
+    rag_qa.instantiate_inputs(selections={"use_llm_cache": False}, overrides={"texts_path": texts_path})
+    rag_qa = rag_qa.with_inputs({"completion_fn": StubCompletion(args.llm_latency)})
+
+    _, cold_seconds = timed(lambda: rag_qa.execute(final_vars=["llm_response"], inputs={"query": questions[0]}))
+    latencies = []
+    for question in questions[:args.rag_samples]:
+        _, seconds = timed(lambda: rag_qa.execute(final_vars=["llm_response"], inputs={"query": question}))
+        latencies.append(seconds)
+    return {"cold_query_seconds": cold_seconds, **latency_stats("query", latencies)}
+
+
+@benchmark("batch_qa")
+def bench_batch_qa(texts_path: str, questions: List[str], answers: List[str], args):
+    rag_qa = HyperNode.load(str(NODES_PATH / "rag_qa"))
+    rag_qa.instantiate_inputs(selections={"use_llm_cache": False}, overrides={"texts_path": texts_path})
+    rag_qa = rag_qa.with_inputs({"completion_fn": StubCompletion(args.llm_latency)})
+
+    batch_qa = HyperNode.load(str(NODES_PATH / "batch_qa"))
+    batch_qa.instantiate_inputs(overrides={"use_mlflow_adapter": False, "texts_path": texts_path,
+                                           "max_concurrency": args.concurrency})
+    results, seconds = timed(lambda: batch_qa.execute(
+        final_vars=["accuracy"], inputs={"rag_qa_node": rag_qa},
+        overrides={"questions": _series(questions), "answers": _series(answers)}))
+    return {"questions_per_second": len(questions) / seconds,
+            "total_seconds": seconds,
+            "accuracy": float(results["accuracy"])}
+
+
+def _series(values: List[str]):
+    import pandas as pd
+    return pd.Series(values)
+
+
+def flatten(results: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    return {f"{bench}.{metric}": value for bench, metrics in results.items() for metric, value in metrics.items()}
+
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[Dict[str, Any]]:
+    """Compares timing/throughput metrics; `_seconds` metrics should go down, `_per_second` ones up."""
+    rows = []
+    for key, value in current.items():
+        if key not in baseline or not baseline[key]:
+            continue
+        if key.endswith("_per_second"):
+            change = value / baseline[key] - 1
+        elif key.endswith("_seconds"):
+            change = baseline[key] / value - 1 if value else 0.0
+        else:
+            continue
+        status = "regression" if change < -tolerance else "improvement" if change > tolerance else "unchanged"
+        rows.append({"metric": key, "baseline": baseline[key], "current": value,
+                     "speedup": 1 + change, "status": status})
+    return rows
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="tiny")
+    parser.add_argument("--corpus-mb", type=float, help="override the scale's corpus size")
+    parser.add_argument("--questions", type=int, help="override the scale's question count")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="stub completion latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=4, help="batch_qa max_concurrency")
+    parser.add_argument("--latency-samples", type=int, default=200, help="single queries timed per ranker")
+    parser.add_argument("--rag-samples", type=int, default=20, help="single queries timed through rag_qa")
+    parser.add_argument("--data-dir", default=str(ROOT / ".cache" / "benchmarks"))
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/<scale>.json)")
+    parser.add_argument("--baseline", help="baseline JSON path (default: benchmarks/baselines/<scale>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change treated as noise")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    scale = dict(SCALES[args.scale])
+    if args.corpus_mb:
+        scale["corpus_bytes"] = int(args.corpus_mb * MB)
+    if args.questions:
+        scale["questions"] = args.questions
+
+    texts_path = Path(args.data_dir) / f"corpus_{scale['corpus_bytes']}_{args.seed}"
+    _, generate_seconds = timed(lambda: generate_corpus(str(texts_path), scale["corpus_bytes"], seed=args.seed))
+    questions, answers = generate_questions(str(texts_path), scale["questions"], seed=args.seed)
+    print(f"corpus: {scale['corpus_bytes'] / MB:.0f}MB in {texts_path} ({generate_seconds:.1f}s), "
+          f"{len(questions)} questions")
+
+    results = {}
+    for name in args.only or list(BENCHMARKS):
+        print(f"running {name}...", flush=True)
+        results[name] = BENCHMARKS[name](str(texts_path), questions, answers, args)
+        for metric, value in results[name].items():
+            print(f"  {metric}: {value:.4g}")
+
+    report = {"scale": args.scale, "params": {**scale, "llm_latency": args.llm_latency,
+                                              "concurrency": args.concurrency, "seed": args.seed},
+              "platform": {"python": platform.python_version(), "machine": platform.machine()},
+              "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "metrics": flatten(results)}
+
+    output = Path(args.output or ROOT / "benchmarks" / "results" / f"{args.scale}.json")
+    baseline_path = Path(args.baseline or ROOT / "benchmarks" / "baselines" / f"{args.scale}.json")
+    if baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text())
+        report["comparison"] = compare(report["metrics"], baseline["metrics"], args.tolerance)
+        for row in report["comparison"]:
+            print(f"  {row['status']:>11}  {row['metric']}: {row['baseline']:.4g} -> {row['current']:.4g} "
+                  f"({row['speedup']:.2f}x)")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"results written to {output}")
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2))
+        print(f"baseline saved to {baseline_path}")
+
+    regressions = [row for row in report.get("comparison", []) if row["status"] == "regression"]
+    return 1 if args.fail_on_regression and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
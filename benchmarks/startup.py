@@ -0,0 +1,192 @@
+"""Cold-start benchmark: import, load, instantiate and first execution of every node in src/nodes.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeats 5 --save-baseline
+    python -m benchmarks.startup --only rag_qa --fail-on-regression
+
+Each measurement runs in a fresh interpreter; the median over `--repeats` is reported. Results are
+written as JSON to benchmarks/results/startup.json and compared with benchmarks/baselines/startup.json
+when it exists. LLM calls go to a local stub.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+# only the standard library up here: the child process times the first imports itself
+ROOT = Path(__file__).resolve().parent.parent
+NODES_PATH = ROOT / "src" / "nodes"
+# reported per stage when loaded by then, to catch imports creeping back into start-up
+HEAVY_MODULES = ["hamilton.driver", "hypster", "pandas", "sklearn", "litellm", "mlflow", "streamlit"]
+# per node: instantiates its inputs, yields, then executes it once (on the benchmark corpus, with a stub LLM)
+NODE_RUNS: Dict[str, Callable[..., Iterator[None]]] = {}
+
+
+def node_run(*names: str):
+    def register(func):
+        for name in names:
+            NODE_RUNS[name] = func
+        return func
+    return register
+
+
+@node_run("sklearn_ranker", "bm25_ranker")
+def run_ranker(node, texts_path: str, questions: List[str], answers: List[str]) -> Iterator[None]:
+    from benchmarks.run import load_chunks
+
+    node.instantiate_inputs()
+    yield
+    node.execute(final_vars=["top_k_chunks"], inputs={"text_chunks": load_chunks(texts_path), "query": questions[0]})
+
+
+@node_run("rag_qa")
+def run_rag_qa(node, texts_path: str, questions: List[str], answers: List[str]) -> Iterator[None]:
+    from benchmarks.stub_llm import StubCompletion
+
+    node.instantiate_inputs(selections={"use_llm_cache": False}, overrides={"texts_path": texts_path})
+    yield
+    node = node.with_inputs({"completion_fn": StubCompletion()})
+    node.execute(final_vars=["llm_response"], inputs={"query": questions[0]})
+
+
+@node_run("batch_qa")
+def run_batch_qa(node, texts_path: str, questions: List[str], answers: List[str]) -> Iterator[None]:
+    import pandas as pd
+    from benchmarks.stub_llm import StubCompletion
+
+    node.instantiate_inputs(selections={"rag_qa.use_llm_cache": False},
+                            overrides={"use_mlflow_adapter": False, "texts_path": texts_path})
+    yield
+    rag_qa = node.instantiated_inputs["rag_qa_node"].with_inputs({"completion_fn": StubCompletion()})
+    node.execute(final_vars=["accuracy"], inputs={"rag_qa_node": rag_qa},
+                 overrides={"questions": pd.Series(questions), "answers": pd.Series(answers)})
+
+
+def run_child(node_name: str, texts_path: str, n_questions: int) -> Dict[str, Any]:
+    """One cold start of `node_name`, in this (fresh) process."""
+    seconds, modules = {}, {}
+
+    def stage(name: str, start: float) -> float:
+        now = time.perf_counter()
+        seconds[f"{name}_seconds"] = now - start
+        modules[name] = [m for m in HEAVY_MODULES if m in sys.modules]
+        return now
+
+    start = time.perf_counter()
+    from src.hypernodes import HyperNode, skip_hamilton_autoload
+    # as a serving worker would, before its first node
+    skip_hamilton_autoload()
+    start = stage("import", start)
+    node = HyperNode.load(str(NODES_PATH / node_name), use_cache=False)
+    start = stage("load", start)
+
+    run = NODE_RUNS.get(node_name)
+    if run is None:
+        node.instantiate_inputs()
+        stage("instantiate", start)
+        return {"seconds": seconds, "modules": modules}
+
+    # questions are generated outside the timed stages
+    from benchmarks.synthetic import generate_questions
+    steps = run(node, texts_path, *generate_questions(texts_path, n_questions))
+    start = time.perf_counter()
+    next(steps)
+    stage("instantiate", start)
+    start = time.perf_counter()
+    next(steps, None)
+    stage("first_execute", start)
+    return {"seconds": seconds, "modules": modules}
+
+
+def cold_start(node_name: str, texts_path: str, n_questions: int) -> Dict[str, Any]:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))}
+    env.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child", node_name,
+                                "--texts-path", texts_path, "--questions", str(n_questions)],
+                               cwd=ROOT, env=env, capture_output=True, text=True)
+    process_seconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"Cold start of {node_name} failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["seconds"]["process_seconds"] = process_seconds
+    return result
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", help="nodes to benchmark (default: every node in src/nodes)")
+    parser.add_argument("--repeats", type=int, default=3, help="cold starts per node")
+    parser.add_argument("--corpus-mb", type=float, default=1, help="size of the corpus the nodes run on")
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--data-dir", default=str(ROOT / ".cache" / "benchmarks"))
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/startup.json)")
+    parser.add_argument("--baseline", help="baseline JSON path (default: benchmarks/baselines/startup.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change treated as noise")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--texts-path", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.texts_path, args.questions)))
+        return 0
+
+    sys.path.insert(0, str(ROOT))
+    from benchmarks.run import compare
+    from benchmarks.synthetic import MB, generate_corpus
+
+    corpus_bytes = int(args.corpus_mb * MB)
+    texts_path = Path(args.data_dir) / f"corpus_{corpus_bytes}_{args.seed}"
+    generate_corpus(str(texts_path), corpus_bytes, seed=args.seed)
+
+    nodes = args.only or sorted(p.parent.name for p in NODES_PATH.glob("*/*_metadata.json"))
+    metrics, modules = {}, {}
+    for node_name in nodes:
+        print(f"running {node_name}...", flush=True)
+        runs = [cold_start(node_name, str(texts_path), args.questions) for _ in range(args.repeats)]
+        for metric in runs[0]["seconds"]:
+            metrics[f"{node_name}.{metric}"] = statistics.median(run["seconds"][metric] for run in runs)
+            print(f"  {metric}: {metrics[f'{node_name}.{metric}']:.4g}")
+        modules[node_name] = runs[0]["modules"]
+        for stage, loaded in modules[node_name].items():
+            print(f"  loaded after {stage}: {', '.join(loaded) or '-'}")
+
+    report = {"params": {"repeats": args.repeats, "corpus_bytes": corpus_bytes, "questions": args.questions,
+                         "seed": args.seed},
+              "platform": {"python": platform.python_version(), "machine": platform.machine()},
+              "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "metrics": metrics,
+              "modules": modules}
+
+    output = Path(args.output or ROOT / "benchmarks" / "results" / "startup.json")
+    baseline_path = Path(args.baseline or ROOT / "benchmarks" / "baselines" / "startup.json")
+    if baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text())
+        report["comparison"] = compare(report["metrics"], baseline["metrics"], args.tolerance)
+        for row in report["comparison"]:
+            print(f"  {row['status']:>11}  {row['metric']}: {row['baseline']:.4g} -> {row['current']:.4g} "
+                  f"({row['speedup']:.2f}x)")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"results written to {output}")
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2))
+        print(f"baseline saved to {baseline_path}")
+
+    regressions = [row for row in report.get("comparison", []) if row["status"] == "regression"]
+    return 1 if args.fail_on_regression and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+import time
+from types import SimpleNamespace
+
+from benchmarks.synthetic import PARAGRAPH_ID
+
+
+class StubCompletion:
+    """Deterministic stand-in for `litellm.completion` with a fixed artificial latency.
+
+    It answers with the id of the first synthetic paragraph found in the prompt, i.e. the top-ranked
+    chunk, so batch_qa accuracy on a synthetic corpus is the ranker's recall@1.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, model: str, messages: list, **kwargs) -> SimpleNamespace:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        match = PARAGRAPH_ID.search(messages[-1]["content"])
+        content = match.group(0) if match else ""
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
@@ -0,0 +1,86 @@
+import json
+import re
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+MB = 1024 * 1024
+
+SCALES = {
+    "tiny": {"corpus_bytes": 1 * MB, "questions": 100},
+    "small": {"corpus_bytes": 16 * MB, "questions": 1_000},
+    "medium": {"corpus_bytes": 128 * MB, "questions": 10_000},
+    "large": {"corpus_bytes": 1024 * MB, "questions": 100_000},
+}
+
+# every paragraph starts with a unique id token, so a retrieved chunk can be traced back to its source
+PARAGRAPH_ID = re.compile(r"\bzq\d{11}\b")
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "shi", "ber", "dan", "gel", "fen", "pra", "tor", "qui", "zen"]
+
+
+def paragraph_id(file_index: int, paragraph_index: int) -> str:
+    return f"zq{file_index:05d}{paragraph_index:06d}"
+
+
+def vocabulary(size: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(2, 5, size=size)
+    words = {"".join(rng.choice(_SYLLABLES, size=n)) for n in lengths}
+    return np.array(sorted(words))
+
+
+def generate_corpus(folder: str, corpus_bytes: int, seed: int = 0, file_bytes: int = MB,
+                    questions_pool: int = 10_000) -> Path:
+    """Writes zipf-distributed synthetic paragraphs into `folder` as .txt files.
+
+    Generation is skipped if `folder` already holds a corpus with the same parameters. Alongside
+    the text, a question pool (a few rare words per sampled paragraph plus the paragraph id) is
+    saved for `generate_questions`.
+    """
+    folder = Path(folder)
+    manifest_path = folder / "manifest.json"
+    params = {"corpus_bytes": corpus_bytes, "seed": seed, "file_bytes": file_bytes}
+    if manifest_path.exists() and json.loads(manifest_path.read_text()).get("params") == params:
+        return folder
+
+    folder.mkdir(parents=True, exist_ok=True)
+    for old in folder.glob("*.txt"):
+        old.unlink()
+
+    rng = np.random.default_rng(seed)
+    vocab = vocabulary(50_000, seed)
+    n_files = max(1, corpus_bytes // file_bytes)
+    per_file = corpus_bytes // n_files
+    sample_probability = min(1.0, questions_pool / max(1, corpus_bytes // 400))
+    pool = []
+
+    for file_index in range(n_files):
+        paragraphs, written, paragraph_index = [], 0, 0
+        while written < per_file:
+            n_words = int(rng.integers(40, 120))
+            word_ids = np.minimum(rng.zipf(1.3, size=n_words), len(vocab)) - 1
+            pid = paragraph_id(file_index, paragraph_index)
+            paragraph = pid + " " + " ".join(vocab[word_ids].tolist())
+            paragraphs.append(paragraph)
+            written += len(paragraph) + 2
+            if rng.random() < sample_probability:
+                rare = [vocab[i] for i in sorted(set(word_ids.tolist()), reverse=True)[:3]]
+                pool.append({"id": pid, "words": rare})
+            paragraph_index += 1
+        (folder / f"doc_{file_index:05d}.txt").write_text("\n\n".join(paragraphs), encoding="utf-8")
+
+    manifest_path.write_text(json.dumps({"params": params, "questions_pool": pool}))
+    return folder
+
+
+def generate_questions(folder: str, n_questions: int, seed: int = 0) -> Tuple[List[str], List[str]]:
+    """Questions built from rare words of sampled paragraphs; the answer is that paragraph's id."""
+    pool = json.loads((Path(folder) / "manifest.json").read_text())["questions_pool"]
+    if not pool:
+        raise ValueError(f"No question pool in {folder}, regenerate the corpus")
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.integers(0, len(pool), size=n_questions)
+    questions = [f"which passage talks about {' '.join(pool[i]['words'])}?" for i in picks]
+    answers = [pool[i]["id"] for i in picks]
+    return questions, answers
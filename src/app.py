@@ -2,7 +2,7 @@ import ast
 import os
 import tempfile
 from collections import defaultdict
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 import hypster
 import streamlit as st
@@ -13,7 +13,9 @@ from streamlit_flow.elements import StreamlitFlowEdge, StreamlitFlowNode
 from streamlit_flow.layouts import LayeredLayout, TreeLayout
 from dotenv import load_dotenv
 load_dotenv()
-from src.hypernodes import HyperNode
+from src.fingerprinting import fingerprint
+from src.hypernodes import HyperNode, get_downstream_nodes
+from src.sweep import SharedResults, sharing_results
 
 st.set_page_config(page_title="RAG App Demo")
 
@@ -37,11 +39,16 @@ def parse_hypster_config(modified_source):
             ):
                 method_name = node.func.attr
                 if method_name in ["select", "text_input", "number_input"]:
-                    args = [ast.literal_eval(arg) for arg in node.args]
-                    kwargs = {
-                        kw.arg: ast.literal_eval(kw.value) for kw in node.keywords
-                    }
-                    config_calls.append((method_name, args, kwargs))
+                    try:
+                        args = [ast.literal_eval(arg) for arg in node.args]
+                        kwargs = {
+                            kw.arg: ast.literal_eval(kw.value) for kw in node.keywords
+                        }
+                    except ValueError:
+                        # computed defaults (e.g. a budget looked up from the model) are left to hp_config
+                        pass
+                    else:
+                        config_calls.append((method_name, args, kwargs))
             self.generic_visit(node)
 
     ConfigVisitor().visit(tree)
@@ -83,7 +90,7 @@ def create_streamlit_widget(method_name, args, kwargs):
         return st.number_input(display_name, value=value, key=name)
 
 
-def hamilton_to_streamlit_flow(hamilton_driver: driver.Driver) -> Dict[str, Any]:
+def hamilton_to_streamlit_flow(hamilton_driver: driver.Driver, reused_nodes: Optional[set] = None) -> Dict[str, Any]:
     dag = hamilton_driver.graph
 
     nodes: List[StreamlitFlowNode] = []
@@ -102,9 +109,9 @@ def hamilton_to_streamlit_flow(hamilton_driver: driver.Driver) -> Dict[str, Any]
             continue  # Skip individual input nodes, we'll create grouped ones later
 
         style = {
-            "background": "#FFC857",
+            "background": "#9BC995" if reused_nodes and node_name in reused_nodes else "#FFC857",
             "border": "2px solid #000000",
-        }  # Yellow for non-input nodes
+        }  # Yellow for non-input nodes, green for nodes reused from the previous run
 
         nodes.append(
             StreamlitFlowNode(
@@ -167,7 +174,8 @@ def hamilton_to_streamlit_flow(hamilton_driver: driver.Driver) -> Dict[str, Any]
 
     # Create the Streamlit Flow component
     flow = streamlit_flow(
-        key="hamilton_dag",
+        # the component keeps its nodes per key, so a new set of reused nodes gets a new key
+        key=f"hamilton_dag_{hash(frozenset(reused_nodes or ()))}",
         init_nodes=nodes,
         init_edges=edges,
         layout=LayeredLayout(
@@ -204,6 +212,35 @@ def create_widgets_for_node(config_calls, prefix=""):
         widget_key = f"{prefix}{kwargs.get('name', method_name)}"
         create_streamlit_widget(method_name, args, {**kwargs, 'name': widget_key})
 
+def execute_dirty_nodes(node: HyperNode, final_vars: List[str]) -> Tuple[Dict[str, Any], List[str], List[str]]:
+    """Executes `final_vars`, reusing the previous run's values of the nodes no changed input feeds.
+
+    Returns the results and the names of the reused and recomputed nodes. Nested HyperNode results
+    (e.g. retrieval when only the LLM changed) are shared across runs through a `SharedResults`.
+    """
+    snapshot = {name: fingerprint(value) for name, value in node.instantiated_inputs.items()}
+    graph_nodes = node.driver.graph.nodes
+    last_run = st.session_state.get("last_run")
+    if last_run is None:
+        dirty = set(final_vars)
+    else:
+        # inputs that can't be fingerprinted count as changed
+        changed = {name for name in snapshot.keys() | last_run["snapshot"].keys()
+                   if snapshot.get(name) is None or snapshot.get(name) != last_run["snapshot"].get(name)}
+        dirty = get_downstream_nodes(node.driver, changed) | {name for name in final_vars
+                                                              if name not in last_run["results"]}
+    reused = {name: last_run["results"][name] for name in final_vars
+              if name not in dirty and name in graph_nodes and not graph_nodes[name].user_defined}
+
+    shared = st.session_state.setdefault("shared_results", SharedResults(max_entries=1024))
+    to_execute = [name for name in final_vars if name not in reused]
+    with sharing_results(shared=shared):
+        results = node.execute(final_vars=to_execute, overrides=reused) if to_execute else {}
+    results = {**reused, **results}
+    st.session_state["last_run"] = {"snapshot": snapshot, "results": results}
+    recomputed = [name for name in to_execute if name in graph_nodes and not graph_nodes[name].user_defined]
+    return results, list(reused), recomputed
+
 def main():
     st.title("RAG App Execution")
     
@@ -246,17 +283,29 @@ def main():
         
         # Combine configurations
         combined_config = {**rag_qa_config, **batch_qa_config}
-        
-    # Use Batch QA node for execution (as in the original code)
-    batch_qa_node.instantiate_inputs(overrides=combined_config, return_config_snapshot=True)
-    expanded_config = batch_qa_node._instantiated_inputs
-    batch_qa_node.init_driver()
-    all_nodes = list(batch_qa_node._driver.graph.nodes.keys())
-    flow = hamilton_to_streamlit_flow(batch_qa_node._driver)
+        st.session_state["config"] = combined_config
+    combined_config = st.session_state.get("config", combined_config)
+
+    # the instantiated node (and its driver) is kept until the configuration changes
+    instantiated = st.session_state.get("instantiated")
+    if instantiated is not None and instantiated[0] == combined_config:
+        batch_qa_node = instantiated[1]
+    else:
+        batch_qa_node.instantiate_inputs(overrides=combined_config, return_config_snapshot=True)
+        batch_qa_node.ensure_driver_initialized()
+        st.session_state["instantiated"] = (combined_config, batch_qa_node)
+    expanded_config = dict(batch_qa_node.instantiated_inputs)
+    all_nodes = list(batch_qa_node.driver.graph.nodes.keys())
     if st.session_state.get("execute", 0) > 0:
-        results = batch_qa_node.execute(final_vars=all_nodes, inputs=batch_qa_node._instantiated_inputs)
+        results, reused, recomputed = execute_dirty_nodes(batch_qa_node, all_nodes)
+        st.session_state["reused_nodes"] = set(reused)
         st.write("## Run Executed Successfully with configurations:")
         st.json(expanded_config)
+        st.write(f"**Recomputed:** {', '.join(recomputed) or 'nothing'}")
+        st.write(f"**Reused from the previous run:** {', '.join(reused) or 'nothing'}")
+        shared = st.session_state["shared_results"]
+        st.caption(f"Nested node results shared across runs: {shared.hits} hits, {shared.misses} misses")
+    flow = hamilton_to_streamlit_flow(batch_qa_node.driver, st.session_state.get("reused_nodes"))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,99 @@
+from typing import Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+
+class BM25Index:
+    """Inverted index with precomputed BM25 impacts and MaxScore-style top-k retrieval.
+
+    Each term's postings list holds the (sorted) ids of the chunks it occurs in together with the
+    BM25 contribution of the term to each of them, plus the maximum contribution as an upper
+    bound. Queries only touch the postings of their own terms, and the postings of low-impact
+    terms are only probed for candidates that can still make it into the top k.
+    """
+
+    def __init__(self, term_frequencies: sp.spmatrix, k1: float = 1.5, b: float = 0.75):
+        tf = sp.csc_matrix(term_frequencies, dtype=np.float32)
+        tf.sum_duplicates()
+        tf.sort_indices()
+        n_docs, n_terms = tf.shape
+
+        doc_lengths = np.asarray(tf.sum(axis=1)).ravel()
+        average_length = doc_lengths.mean() if n_docs else 0.0
+        df = np.diff(tf.indptr)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        norms = k1 * (1 - b + b * doc_lengths / average_length) if average_length else np.full(n_docs, k1)
+        terms = np.repeat(np.arange(n_terms), df)
+        self.impacts = (self.idf[terms] * tf.data * (k1 + 1) / (tf.data + norms[tf.indices])).astype(np.float32)
+        self.doc_ids = tf.indices.astype(np.int64)
+        self.indptr = tf.indptr.astype(np.int64)
+        self.upper_bounds = np.zeros(n_terms, dtype=np.float32)
+        nonempty = df > 0
+        self.upper_bounds[nonempty] = np.maximum.reduceat(self.impacts, self.indptr[:-1][nonempty])
+        self.n_docs = n_docs
+
+    def postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[term], self.indptr[term + 1]
+        return self.doc_ids[start:end], self.impacts[start:end]
+
+    def top_k(self, query_terms: sp.spmatrix, top_k: int) -> np.ndarray:
+        """Ids of the `top_k` best chunks for one query, given as a (1 x n_terms) count row."""
+        query_terms = sp.csr_matrix(query_terms)
+        k = min(int(top_k), self.n_docs)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        # scores and bounds are summed in float64: float32 sums of many bounds lose precision, and a
+        # bound rounded below a chunk's score would prune a chunk that belongs in the top k
+        weights = query_terms.data.astype(np.float64)
+        bounds = self.upper_bounds[query_terms.indices] * weights
+        order = np.argsort(-bounds, kind="stable")
+        terms, weights, bounds = query_terms.indices[order], weights[order], bounds[order]
+        # remaining[i]: the most that terms i.. can still add to any chunk's score
+        remaining = np.append(np.cumsum(bounds[::-1])[::-1], 0.0)
+
+        ids = np.empty(0, dtype=np.int64)
+        scores = np.empty(0, dtype=np.float64)
+        i = 0
+        # essential terms: union their postings while an unseen chunk could still reach the top k (or
+        # tie with the k-th, and win the tie on a lower id)
+        while i < len(terms) and (len(ids) < k or remaining[i] >= _kth_largest(scores, k)):
+            term_ids, term_impacts = self.postings(terms[i])
+            ids, scores = _merge(ids, scores, term_ids, term_impacts * weights[i])
+            i += 1
+
+        # non-essential terms: only probe them for candidates that can still reach the threshold
+        for j in range(i, len(terms)):
+            keep = scores + remaining[j] >= _kth_largest(scores, k)
+            ids, scores = ids[keep], scores[keep]
+            term_ids, term_impacts = self.postings(terms[j])
+            positions = np.minimum(np.searchsorted(term_ids, ids), max(len(term_ids) - 1, 0))
+            hits = term_ids[positions] == ids if len(term_ids) else np.zeros(len(ids), dtype=bool)
+            scores[hits] += term_impacts[positions[hits]] * weights[j]
+
+        best = np.lexsort((ids, -scores))[:k]
+        top = ids[best]
+        if len(top) < k:
+            # fewer matching chunks than k: pad with non-matching ones, in chunk order
+            top = np.concatenate([top, np.setdiff1d(np.arange(k), top)[:k - len(top)]])
+        return top
+
+
+def _merge(ids: np.ndarray, scores: np.ndarray, new_ids: np.ndarray,
+           new_scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    all_ids = np.concatenate([ids, new_ids])
+    all_scores = np.concatenate([scores, new_scores])
+    if len(all_ids) == 0:
+        return all_ids, all_scores
+    order = np.argsort(all_ids, kind="stable")
+    all_ids, all_scores = all_ids[order], all_scores[order]
+    starts = np.flatnonzero(np.r_[True, all_ids[1:] != all_ids[:-1]])
+    return all_ids[starts], np.add.reduceat(all_scores, starts)
+
+def _kth_largest(scores: np.ndarray, k: int) -> float:
+    if len(scores) < k:
+        return 0.0
+    return float(np.partition(scores, len(scores) - k)[len(scores) - k])
+
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Collection, Deque, Dict, Iterator, List, Optional
+
+# the capture being filled in; the HyperNode drivers' hook records node inputs into it
+_active_capture: ContextVar[Optional["InputCapture"]] = ContextVar("hypernodes_input_capture", default=None)
+
+
+class _Spilled:
+    """Placeholder for a captured value pickled to disk."""
+    __slots__ = ("path",)
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Any:
+        with open(self.path, "rb") as f:
+            return pickle.load(f)
+
+
+class InputCapture:
+    """The arguments `nodes` were called with during HyperNode executions, to inspect or replay them later.
+
+    `nodes` are node names, optionally qualified by their HyperNode ("rag_qa.llm_response"); the last
+    `max_calls` calls of each are kept under "<hypernode>.<node>". Values are kept by reference, unless
+    `spill_dir` is set: then values that pickle to more than `spill_bytes` are written there (once per
+    distinct content) and read back on `get`.
+    """
+
+    def __init__(self, nodes: Collection[str], spill_dir: Optional[str] = None, spill_bytes: int = 1 << 20,
+                 max_calls: int = 100):
+        self.nodes = frozenset(nodes)
+        self.spill_dir = spill_dir
+        self.spill_bytes = spill_bytes
+        self.max_calls = max_calls
+        self._calls: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def wants(self, hypernode: str, node_name: str) -> bool:
+        return node_name in self.nodes or f"{hypernode}.{node_name}" in self.nodes
+
+    def record(self, hypernode: str, node_name: str, kwargs: Dict[str, Any]) -> None:
+        if self.spill_dir:
+            kwargs = {name: self._maybe_spill(value) for name, value in kwargs.items()}
+        else:
+            kwargs = dict(kwargs)
+        key = f"{hypernode}.{node_name}" if hypernode else node_name
+        with self._lock:
+            calls = self._calls.get(key)
+            if calls is None:
+                calls = self._calls[key] = deque(maxlen=self.max_calls)
+            calls.append(kwargs)
+
+    def _maybe_spill(self, value: Any) -> Any:
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return value
+        if len(data) <= self.spill_bytes:
+            return value
+        path = os.path.join(self.spill_dir, f"{hashlib.sha256(data).hexdigest()}.pkl")
+        if not os.path.exists(path):
+            # written under a temporary name so a concurrent reader never sees half a file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return _Spilled(path)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._calls)
+
+    def count(self, name: str) -> int:
+        with self._lock:
+            return len(self._lookup(name) or ())
+
+    def get(self, name: str, index: int = -1) -> Dict[str, Any]:
+        """The arguments of a captured call of `name` ("node" or "hypernode.node"); the latest by default."""
+        with self._lock:
+            calls = self._lookup(name)
+            if not calls:
+                raise KeyError(f"No captured calls of '{name}'")
+            kwargs = calls[index]
+        return {arg: value.load() if isinstance(value, _Spilled) else value for arg, value in kwargs.items()}
+
+    def _lookup(self, name: str) -> Optional[Deque[Dict[str, Any]]]:
+        calls = self._calls.get(name)
+        if calls is None:
+            matches = [key for key in self._calls if key.endswith(f".{name}")]
+            if len(matches) > 1:
+                raise KeyError(f"'{name}' was captured in several HyperNodes, qualify it: {sorted(matches)}")
+            calls = self._calls[matches[0]] if matches else None
+        return calls
+
+    def save(self, path: str) -> None:
+        """Pickles the capture (spilled values stay in `spill_dir`) so another process can `load` and replay it."""
+        with self._lock:
+            state = {"nodes": sorted(self.nodes), "spill_dir": self.spill_dir, "spill_bytes": self.spill_bytes,
+                     "max_calls": self.max_calls, "calls": {k: list(v) for k, v in self._calls.items()}}
+        with open(path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> "InputCapture":
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        capture = InputCapture(state["nodes"], state["spill_dir"], state["spill_bytes"], state["max_calls"])
+        capture._calls = {k: deque(v, maxlen=capture.max_calls) for k, v in state["calls"].items()}
+        return capture
+
+    def clear(self) -> None:
+        with self._lock:
+            spilled = {value.path for calls in self._calls.values() for kwargs in calls
+                       for value in kwargs.values() if isinstance(value, _Spilled)}
+            self._calls.clear()
+        for path in spilled:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+@contextmanager
+def capturing(nodes: Collection[str], spill_dir: Optional[str] = None, spill_bytes: int = 1 << 20,
+              max_calls: int = 100, capture: Optional[InputCapture] = None) -> Iterator[InputCapture]:
+    """Records the inputs of `nodes` in every HyperNode executed inside the block, including nested ones."""
+    if capture is None:
+        capture = InputCapture(nodes, spill_dir, spill_bytes, max_calls)
+    token = _active_capture.set(capture)
+    try:
+        yield capture
+    finally:
+        _active_capture.reset(token)
+
+
+def active_capture() -> Optional[InputCapture]:
+    return _active_capture.get()
@@ -0,0 +1,53 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+
+class CheckpointLog:
+    """Append-only JSON-lines log of completed work items, for resuming an interrupted run.
+
+    Every `append` is flushed straight away, so whatever completed before a crash is on disk.
+    A partially written last line (the process died mid-write) is dropped when loading.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def load(self) -> Dict[int, Dict[str, Any]]:
+        """The logged records by index; the last one wins if an index was logged twice."""
+        records: Dict[int, Dict[str, Any]] = {}
+        if not os.path.exists(self.path):
+            return records
+        complete = 0
+        with open(self.path, "rb") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.endswith(b"\n"):
+                    break
+                complete += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logging.warning(f"Skipping unreadable line {line_number} of checkpoint {self.path}")
+                    continue
+                records[record["index"]] = record
+        if complete < os.path.getsize(self.path):
+            # drop the torn last line so the next append starts on a line of its own
+            with self._lock, open(self.path, "r+b") as f:
+                f.truncate(complete)
+        return records
+
+    def append(self, index: int, key: Optional[str], response: Any, seconds: float) -> None:
+        line = json.dumps({"index": index, "key": key, "response": response, "seconds": seconds})
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def clear(self) -> None:
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,116 @@
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+Span = Tuple[int, int]
+
+
+class ChunkStore(Sequence):
+    """Chunks of a corpus as (start, end, doc_id) spans over one contiguous text buffer.
+
+    Behaves like a read-only sequence of strings, but a chunk is only materialized as a `str`
+    when it's accessed, so a corpus split into millions of chunks costs one buffer plus three
+    small integers per chunk instead of millions of string objects.
+    """
+
+    def __init__(self, buffer: str, starts: np.ndarray, ends: np.ndarray, doc_ids: np.ndarray):
+        if not len(starts) == len(ends) == len(doc_ids):
+            raise ValueError("starts, ends and doc_ids must have the same length")
+        self.buffer = buffer
+        self.starts = starts
+        self.ends = ends
+        self.doc_ids = doc_ids
+        self._digest: Optional[str] = None
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], spans: Callable[[str], Iterable[Span]]) -> "ChunkStore":
+        """Concatenates `texts` into one buffer and records the spans `spans(text)` yields for each."""
+        parts: List[str] = []
+        starts, ends, doc_ids = array("q"), array("q"), array("i")
+        offset = 0
+        for doc_id, text in enumerate(texts):
+            for start, end in spans(text):
+                starts.append(offset + start)
+                ends.append(offset + end)
+                doc_ids.append(doc_id)
+            parts.append(text)
+            offset += len(text)
+        return cls("".join(parts), np.frombuffer(starts, dtype=np.int64), np.frombuffer(ends, dtype=np.int64),
+                   np.frombuffer(doc_ids, dtype=np.int32))
+
+    @classmethod
+    def from_documents(cls, buffer: str, bounds: Iterable[Span],
+                       spans: Callable[[str], Iterable[Span]]) -> "ChunkStore":
+        """Records the spans `spans(document)` yields for each document at `bounds` of `buffer`, which is shared, not copied."""
+        starts, ends, doc_ids = array("q"), array("q"), array("i")
+        for doc_id, (doc_start, doc_end) in enumerate(bounds):
+            for start, end in spans(buffer[doc_start:doc_end]):
+                starts.append(doc_start + start)
+                ends.append(doc_start + end)
+                doc_ids.append(doc_id)
+        return cls(buffer, np.frombuffer(starts, dtype=np.int64), np.frombuffer(ends, dtype=np.int64),
+                   np.frombuffer(doc_ids, dtype=np.int32))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return ChunkStore(self.buffer, self.starts[i], self.ends[i], self.doc_ids[i])
+        return self.buffer[self.starts[i]:self.ends[i]]
+
+    def __iter__(self) -> Iterator[str]:
+        buffer = self.buffer
+        for start, end in zip(self.starts.tolist(), self.ends.tolist()):
+            yield buffer[start:end]
+
+    def __repr__(self) -> str:
+        return f"ChunkStore({len(self)} chunks, {len(self.buffer)} characters)"
+
+    def span(self, i: int) -> Tuple[int, int, int]:
+        return int(self.starts[i]), int(self.ends[i]), int(self.doc_ids[i])
+
+    def digest(self) -> str:
+        """Content hash of the chunks (the buffer and the spans over it), computed once per store."""
+        if self._digest is None:
+            digest = hashlib.sha256(self.buffer.encode("utf-8", errors="surrogatepass"))
+            for part in (self.starts, self.ends):
+                digest.update(np.ascontiguousarray(part, dtype=np.int64).tobytes())
+            self._digest = digest.hexdigest()
+        return self._digest
+
+
+# digests of plain sequences of chunks, by identity; the sequence is held so its id isn't reused
+_digests: "OrderedDict[int, Tuple[Any, str]]" = OrderedDict()
+_digests_size = 4
+_digests_lock = threading.Lock()
+
+
+def chunks_digest(chunks: Sequence[str]) -> str:
+    """Content hash of a sequence of chunks, computed once per corpus object rather than per call.
+
+    Chunks are treated as read-only: a list mutated in place after it was hashed keeps its old digest.
+    """
+    if isinstance(chunks, ChunkStore):
+        return chunks.digest()
+    with _digests_lock:
+        cached = _digests.get(id(chunks))
+        if cached is not None and cached[0] is chunks:
+            _digests.move_to_end(id(chunks))
+            return cached[1]
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8", errors="surrogatepass"))
+        digest.update(b"\x00")
+    hexdigest = digest.hexdigest()
+    with _digests_lock:
+        _digests[id(chunks)] = (chunks, hexdigest)
+        while len(_digests) > _digests_size:
+            _digests.popitem(last=False)
+    return hexdigest
+
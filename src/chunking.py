@@ -0,0 +1,162 @@
+"""Span-based chunkers: generators of (start, end) offsets into a document, for `ChunkStore`.
+
+They never copy the document, and hold at most a chunk's worth of units (plus the semantic
+chunker's look-ahead window), so memory stays bounded by chunk size rather than document size.
+"""
+import math
+import re
+from collections import Counter, deque
+from typing import Callable, Deque, Iterator, Optional, Tuple
+
+from src.chunk_store import Span
+
+CHUNKERS = ("paragraph", "sentence", "semantic", "text")
+
+_PARAGRAPH_SEPARATOR = "\n\n"
+# sentence ends: terminal punctuation (plus closing quotes/brackets) followed by whitespace, or a blank line
+_SENTENCE_END = re.compile(r"[.!?。]+[\"')\]]*\s+|\n\s*\n")
+_WORD = re.compile(r"\w{3,}")
+
+
+def get_chunker(chunker: str, max_chars: int = 2000, overlap: int = 200,
+                semantic_threshold: float = 0.1, semantic_window: int = 3) -> Callable[[str], Iterator[Span]]:
+    """Returns a function mapping a document to the spans of its chunks."""
+    max_chars, overlap = int(max_chars), int(overlap)
+    if max_chars <= 0:
+        raise ValueError("max_chars must be positive")
+    if not 0 <= overlap < max_chars:
+        raise ValueError("overlap must be non-negative and smaller than max_chars")
+
+    if chunker == "paragraph":
+        return lambda text: paragraph_spans(text, max_chars, overlap)
+    if chunker == "sentence":
+        return lambda text: _pack(text, ((s, e, False) for s, e in sentence_spans(text)), max_chars, overlap)
+    if chunker == "semantic":
+        # topic shifts only end chunks that already hold a quarter of the budget
+        return lambda text: _pack(text, _topic_breaks(text, sentence_spans(text), semantic_threshold,
+                                                      int(semantic_window)), max_chars, overlap, max_chars // 4)
+    if chunker == "text":
+        return lambda text: window_spans(text, 0, len(text), max_chars, overlap)
+    raise ValueError(f"Unknown chunker '{chunker}', expected one of {CHUNKERS}")
+
+
+def paragraph_spans(text: str, max_chars: int, overlap: int) -> Iterator[Span]:
+    """Spans of `text.split("\\n\\n")`; paragraphs longer than `max_chars` are split into windows."""
+    start = 0
+    while True:
+        end = text.find(_PARAGRAPH_SEPARATOR, start)
+        if end == -1:
+            end = len(text)
+        if end - start > max_chars:
+            yield from window_spans(text, start, end, max_chars, overlap)
+        else:
+            yield start, end
+        if end == len(text):
+            return
+        start = end + len(_PARAGRAPH_SEPARATOR)
+
+
+def sentence_spans(text: str) -> Iterator[Span]:
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        span = _strip(text, start, match.end())
+        if span:
+            yield span
+        start = match.end()
+    span = _strip(text, start, len(text))
+    if span:
+        yield span
+
+
+def window_spans(text: str, start: int, end: int, max_chars: int, overlap: int) -> Iterator[Span]:
+    """Splits text[start:end] into windows of at most `max_chars`, preferably at whitespace,
+    each one repeating up to `overlap` characters of the previous one."""
+    while end - start > max_chars:
+        cut = start + max_chars
+        space = _last_space(text, start + max_chars // 2, cut)
+        if space > start:
+            cut = space
+        yield start, cut
+        next_start = max(cut - overlap, start + 1)
+        if overlap:
+            space = _first_space(text, next_start, cut)
+            if space != -1:
+                next_start = space + 1
+        start = next_start
+    yield start, end
+
+
+def _pack(text: str, units: Iterator[Tuple[int, int, bool]], max_chars: int, overlap: int,
+          min_chars: int = 0) -> Iterator[Span]:
+    """Greedily packs consecutive units (sentences) into chunks of at most `max_chars`.
+
+    A chunk of at least `min_chars` also ends before a unit flagged as a break. When a chunk is
+    closed for size, its trailing units spanning at most `overlap` characters are repeated at the
+    start of the next one.
+    """
+    chunk: Deque[Span] = deque()
+    for start, end, is_break in units:
+        is_break = is_break and bool(chunk) and chunk[-1][1] - chunk[0][0] >= min_chars
+        if chunk and (is_break or end - chunk[0][0] > max_chars):
+            yield chunk[0][0], chunk[-1][1]
+            if is_break:
+                chunk.clear()
+            else:
+                while chunk and (chunk[-1][1] - chunk[0][0] > overlap or end - chunk[0][0] > max_chars):
+                    chunk.popleft()
+        if end - start > max_chars:
+            # a single unit over the limit: window it on its own
+            chunk.clear()
+            yield from window_spans(text, start, end, max_chars, overlap)
+            continue
+        chunk.append((start, end))
+    if chunk:
+        yield chunk[0][0], chunk[-1][1]
+
+
+def _topic_breaks(text: str, sentences: Iterator[Span], threshold: float,
+                  window: int) -> Iterator[Tuple[int, int, bool]]:
+    """Flags sentences that start a new topic: those where the lexical cosine similarity between the
+    `window` sentences before and the `window` sentences from there on drops below `threshold`."""
+    window = max(window, 1)
+    before: Deque[Counter] = deque(maxlen=window)
+    ahead: Deque[Tuple[int, int, Counter]] = deque()
+    for start, end in sentences:
+        ahead.append((start, end, Counter(_WORD.findall(text[start:end].lower()))))
+        if len(ahead) >= window:
+            yield _emit_with_break(before, ahead, threshold)
+    while ahead:
+        yield _emit_with_break(before, ahead, threshold)
+
+
+def _emit_with_break(before: Deque[Counter], ahead: Deque[Tuple[int, int, Counter]],
+                     threshold: float) -> Tuple[int, int, bool]:
+    start, end, words = ahead[0]
+    is_break = bool(before) and _cosine(sum(before, Counter()), sum((w for _, _, w in ahead), Counter())) < threshold
+    ahead.popleft()
+    before.append(words)
+    return start, end, is_break
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 1.0
+    dot = sum(count * b[word] for word, count in a.items() if word in b)
+    return dot / math.sqrt(sum(c * c for c in a.values()) * sum(c * c for c in b.values()))
+
+
+def _strip(text: str, start: int, end: int) -> Optional[Span]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if end > start else None
+
+
+def _last_space(text: str, low: int, high: int) -> int:
+    return max(text.rfind(" ", low, high), text.rfind("\n", low, high))
+
+
+def _first_space(text: str, low: int, high: int) -> int:
+    positions = [p for p in (text.find(" ", low, high), text.find("\n", low, high)) if p != -1]
+    return min(positions) if positions else -1
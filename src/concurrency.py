@@ -0,0 +1,102 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Type, Union
+
+# exception types to retry, or a predicate on the raised exception
+RetryOn = Union[Tuple[Type[BaseException], ...], Callable[[BaseException], bool]]
+
+
+class RateLimiter:
+    """Sliding-window limiter on requests and tokens per period (0 disables a limit)."""
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0, period: float = 60.0):
+        self.requests_per_minute = int(requests_per_minute or 0)
+        self.tokens_per_minute = int(tokens_per_minute or 0)
+        self.period = period
+        self._events: deque = deque()
+        self._tokens_in_window = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests_per_minute > 0 or self.tokens_per_minute > 0
+
+    def acquire(self, tokens: int = 0) -> None:
+        if not self.enabled:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._events and now - self._events[0][0] >= self.period:
+                    self._tokens_in_window -= self._events.popleft()[1]
+
+                fits_requests = not self.requests_per_minute or len(self._events) < self.requests_per_minute
+                # a single request larger than the whole budget is let through on an empty window
+                fits_tokens = (not self.tokens_per_minute or not self._events
+                               or self._tokens_in_window + tokens <= self.tokens_per_minute)
+                if fits_requests and fits_tokens:
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+                wait = self.period - (now - self._events[0][0])
+            time.sleep(max(wait, 0.001))
+
+
+def call_with_retries(func: Callable[[], Any],
+                      max_retries: int = 0,
+                      backoff: float = 1.0,
+                      retry_on: RetryOn = (Exception,),
+                      rate_limiter: Optional[RateLimiter] = None,
+                      tokens: int = 0) -> Any:
+    for attempt in range(int(max_retries) + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire(tokens)
+        try:
+            return func()
+        except BaseException as e:
+            retryable = isinstance(e, retry_on) if isinstance(retry_on, tuple) else \
+                isinstance(e, Exception) and retry_on(e)
+            if not retryable or attempt >= max_retries:
+                raise
+            delay = backoff * (2 ** attempt) * (1 + random.random())
+            logging.warning(f"Transient error ({type(e).__name__}: {e}), retrying in {delay:.2f}s "
+                            f"({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+
+
+def map_concurrently(func: Callable[[Any], Any],
+                     items: Iterable[Any],
+                     max_workers: int = 1,
+                     max_retries: int = 0,
+                     backoff: float = 1.0,
+                     retry_on: RetryOn = (Exception,),
+                     rate_limiter: Optional[RateLimiter] = None,
+                     cost: Optional[Callable[[Any], int]] = None) -> List[Any]:
+    """Applies `func` to every item with at most `max_workers` calls in flight.
+
+    Results are returned in the order of `items`.
+    """
+    def call(item: Any) -> Any:
+        tokens = cost(item) if cost is not None else 0
+        return call_with_retries(lambda: func(item), max_retries=max_retries, backoff=backoff,
+                                 retry_on=retry_on, rate_limiter=rate_limiter, tokens=tokens)
+
+    items = list(items)
+    max_workers = max(int(max_workers), 1)
+    if max_workers == 1 or len(items) <= 1:
+        return [call(item) for item in items]
+
+    # each call runs in a copy of the caller's context so context-local state (e.g. profiling) follows it
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, call, item) for item in items]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            # on a failure or an interrupt, don't start the calls still queued
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Sequence
+
+DEFAULT_ENCODING = "cl100k_base"
+_WORD = re.compile(r"\w+")
+
+
+class TokenCounter:
+    """Counts tokens with a local tiktoken encoding, caching the count of every chunk it has seen.
+
+    Counts are keyed by a digest of the text, so the cache doesn't keep the chunks themselves alive.
+    If the encoding can't be loaded, it falls back to a ~4 characters per token estimate.
+    """
+
+    def __init__(self, encoding_name: str = DEFAULT_ENCODING, cache_size: int = 100_000):
+        self.encoding_name = encoding_name
+        self.cache_size = cache_size
+        self._encoding = _load_encoding(encoding_name)
+        self._counts: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str) -> int:
+        key = hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+                self.hits += 1
+                return count
+        count = self._count(text)
+        with self._lock:
+            self.misses += 1
+            self._counts[key] = count
+            while len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return count
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self._encoding is None:
+            return text[:max_tokens * 4]
+        tokens = self._encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else self._encoding.decode(tokens[:max_tokens])
+
+    def _count(self, text: str) -> int:
+        if self._encoding is None:
+            return (len(text) + 3) // 4
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model: str) -> TokenCounter:
+    """A shared counter using `model`'s encoding (cl100k_base for models tiktoken doesn't know)."""
+    encoding_name = _encoding_name_for_model(model)
+    with _counters_lock:
+        if encoding_name not in _counters:
+            _counters[encoding_name] = TokenCounter(encoding_name)
+        return _counters[encoding_name]
+
+
+def build_context(chunks: Sequence[str], token_budget: int, counter: TokenCounter,
+                  separator: str = ", ", dedup_threshold: Optional[float] = None) -> List[str]:
+    """Picks chunks in rank order while they fit in `token_budget`.
+
+    Chunks that don't fit are skipped in favour of smaller, lower-ranked ones; if not even the top
+    chunk fits, it's truncated to the budget. With `dedup_threshold`, a chunk whose word-shingle
+    Jaccard similarity to an already picked chunk reaches the threshold is dropped.
+    """
+    separator_tokens = counter.count(separator) if separator else 0
+    picked: List[str] = []
+    picked_shingles: List[FrozenSet[int]] = []
+    remaining = int(token_budget)
+    for chunk in chunks:
+        if remaining <= 0:
+            break
+        if dedup_threshold is not None:
+            shingles = _shingles(chunk)
+            if any(_jaccard(shingles, other) >= dedup_threshold for other in picked_shingles):
+                continue
+        cost = counter.count(chunk) + (separator_tokens if picked else 0)
+        if cost > remaining:
+            continue
+        picked.append(chunk)
+        remaining -= cost
+        if dedup_threshold is not None:
+            picked_shingles.append(shingles)
+
+    if not picked and len(chunks) and token_budget > 0:
+        picked.append(counter.truncate(chunks[0], int(token_budget)))
+    return picked
+
+
+def _shingles(text: str, size: int = 3) -> FrozenSet[int]:
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return frozenset([hash(tuple(words))])
+    return frozenset(hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1))
+
+
+def _jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _encoding_name_for_model(model: str) -> str:
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_name_for_model(model.split("/")[-1])
+    except KeyError:
+        return DEFAULT_ENCODING
+
+
+def _load_encoding(encoding_name: str):
+    # tiktoken reads encodings from its cache and downloads them on first use; offline hosts point
+    # TIKTOKEN_CACHE_DIR at a cache directory prepared beforehand
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logging.warning(f"Couldn't load tokenizer {encoding_name} ({e}), estimating token counts")
+        return None
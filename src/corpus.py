@@ -0,0 +1,220 @@
+import codecs
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.chunk_store import ChunkStore, Span
+
+READ_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class FileEntry(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+class CorpusChanges(NamedTuple):
+    added: List[str]
+    changed: List[str]
+    removed: List[str]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+class Corpus:
+    """One version of a loaded folder: its documents, in path order, laid end to end in one buffer.
+
+    Chunk stores are built over that buffer without copying it, and kept per chunker (up to
+    `max_chunkings`), so chunking the same corpus again is a lookup. The loader hands out the
+    same `Corpus` until the folder changes.
+    """
+
+    def __init__(self, buffer: str, paths: List[str], bounds: List[Span], digest: str, max_chunkings: int = 4):
+        self.buffer = buffer
+        self.paths = paths
+        self.bounds = bounds
+        self.digest = digest
+        self.max_chunkings = max_chunkings
+        self._chunk_stores: "OrderedDict[Hashable, ChunkStore]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __repr__(self) -> str:
+        return f"Corpus({len(self)} documents, {len(self.buffer)} characters)"
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # pickled (e.g. in a saved capture or for a worker process) without its chunkings and lock
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
+
+    def text(self, i: int) -> str:
+        start, end = self.bounds[i]
+        return self.buffer[start:end]
+
+    def chunks(self, key: Hashable, spans: Callable[[str], Iterable[Span]]) -> ChunkStore:
+        """The documents split by `spans`, built on first use; `key` identifies the chunker and its parameters."""
+        # held while building, so concurrent callers wait for one build rather than each doing their own
+        with self._lock:
+            chunk_store = self._chunk_stores.get(key)
+            if chunk_store is None:
+                chunk_store = self._chunk_stores[key] = ChunkStore.from_documents(self.buffer, self.bounds, spans)
+                while len(self._chunk_stores) > max(int(self.max_chunkings), 1):
+                    self._chunk_stores.popitem(last=False)
+            else:
+                self._chunk_stores.move_to_end(key)
+            return chunk_store
+
+
+class CorpusLoader:
+    """Loads the `.txt` files of a folder and keeps them in sync incrementally.
+
+    A manifest of (path, size, mtime, content hash) is kept per file; `refresh` only re-reads
+    files whose size or mtime changed (or that are new) and reads them in parallel. The text is
+    kept once, as the buffer of the current `Corpus`, which is rebuilt when files change.
+    """
+
+    def __init__(self, folder: str, suffix: str = ".txt", max_workers: int = 8):
+        self.folder = folder
+        self.suffix = suffix
+        self.max_workers = max_workers
+        self.manifest: Dict[str, FileEntry] = {}
+        self._corpus = Corpus("", [], [], hashlib.sha256().hexdigest())
+        self._lock = threading.Lock()
+
+    def refresh(self) -> CorpusChanges:
+        with self._lock:
+            stats = self._scan()
+            removed = sorted(set(self.manifest) - set(stats))
+            to_read = [path for path, stat in stats.items()
+                       if path not in self.manifest
+                       or (self.manifest[path].size, self.manifest[path].mtime_ns) != (stat.st_size, stat.st_mtime_ns)]
+
+            added, changed, texts = [], [], {}
+            for path, result in zip(to_read, self._read_all(to_read)):
+                if result is None:
+                    # unreadable: drop it rather than serving stale text
+                    if path in self.manifest:
+                        removed.append(path)
+                        del self.manifest[path]
+                    continue
+                text, sha256 = result
+                stat = stats[path]
+                previous = self.manifest.get(path)
+                self.manifest[path] = FileEntry(path, stat.st_size, stat.st_mtime_ns, sha256)
+                if previous is None:
+                    added.append(path)
+                elif previous.sha256 != sha256:
+                    changed.append(path)
+                texts[path] = text
+
+            for path in removed:
+                self.manifest.pop(path, None)
+            changes = CorpusChanges(sorted(added), sorted(changed), sorted(removed))
+            if changes:
+                self._corpus = self._build_corpus(texts)
+            return changes
+
+    def _build_corpus(self, texts: Dict[str, str]) -> Corpus:
+        # unchanged documents are copied over from the previous buffer, one at a time
+        previous = self._corpus
+        previous_bounds = dict(zip(previous.paths, previous.bounds))
+        paths = sorted(self.manifest)
+        parts, bounds, offset = [], [], 0
+        digest = hashlib.sha256()
+        for path in paths:
+            text = texts.get(path)
+            if text is None:
+                start, end = previous_bounds[path]
+                text = previous.buffer[start:end]
+            parts.append(text)
+            bounds.append((offset, offset + len(text)))
+            offset += len(text)
+            digest.update(f"{os.path.relpath(path, self.folder)}\x00{self.manifest[path].sha256}\x00".encode())
+        return Corpus("".join(parts), paths, bounds, digest.hexdigest())
+
+    def corpus(self) -> Corpus:
+        with self._lock:
+            return self._corpus
+
+    def documents(self) -> List[Tuple[str, str]]:
+        corpus = self.corpus()
+        return [(path, corpus.text(i)) for i, path in enumerate(corpus.paths)]
+
+    def texts(self) -> List[str]:
+        corpus = self.corpus()
+        return [corpus.text(i) for i in range(len(corpus))]
+
+    def _scan(self) -> Dict[str, os.stat_result]:
+        stats = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.name.endswith(self.suffix) and entry.is_file():
+                    stats[os.path.join(self.folder, entry.name)] = entry.stat()
+        return stats
+
+    def _read_all(self, paths: List[str]) -> List[Optional[Tuple[str, str]]]:
+        if len(paths) <= 1 or self.max_workers <= 1:
+            return [read_text_file(path) for path in paths]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(paths))) as executor:
+            return list(executor.map(read_text_file, paths))
+
+
+def read_text_file(path: str, block_size: int = READ_BLOCK_SIZE) -> Optional[Tuple[str, str]]:
+    """Streams a file in blocks, returning its decoded text and the sha256 of its bytes."""
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts = []
+    try:
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                digest.update(block)
+                parts.append(decoder.decode(block))
+        parts.append(decoder.decode(b"", final=True))
+    except OSError as e:
+        logging.error(f"Error reading file {path}: {e}")
+        return None
+
+    text = "".join(parts)
+    if "�" in text:
+        logging.warning(f"Replaced undecodable bytes in file {os.path.basename(path)}")
+    return text, digest.hexdigest()
+
+
+_loaders: Dict[Tuple[str, str], CorpusLoader] = {}
+_loaders_lock = threading.Lock()
+
+
+def get_loader(folder: str, suffix: str = ".txt", max_workers: int = 8) -> CorpusLoader:
+    key = (os.path.abspath(folder), suffix)
+    with _loaders_lock:
+        if key not in _loaders:
+            _loaders[key] = CorpusLoader(key[0], suffix=suffix, max_workers=max_workers)
+        loader = _loaders[key]
+    loader.max_workers = max_workers
+    return loader
+
+
+def load_texts(folder: str, max_workers: int = 8) -> List[str]:
+    loader = get_loader(folder, max_workers=max_workers)
+    loader.refresh()
+    return loader.texts()
+
+
+def load_corpus(folder: str, max_workers: int = 8) -> Corpus:
+    loader = get_loader(folder, max_workers=max_workers)
+    loader.refresh()
+    return loader.corpus()
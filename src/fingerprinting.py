@@ -0,0 +1,150 @@
+import hashlib
+import pickle
+import sys
+from collections.abc import Mapping
+from typing import Any, Optional
+
+
+class Unfingerprintable(Exception):
+    pass
+
+
+def fingerprint(value: Any) -> Optional[str]:
+    """Content hash of `value`, or None if it holds something we can't hash deterministically."""
+    digest = hashlib.sha256()
+    try:
+        _update(digest, value)
+    except Unfingerprintable:
+        return None
+    return digest.hexdigest()
+
+
+def params_digest(estimator: Any, *extra: Any) -> "hashlib._Hash":
+    """sha256 of a scikit-learn estimator's params (and `extra`), left open for callers to extend."""
+    params = sorted((k, repr(v)) for k, v in estimator.get_params().items())
+    return hashlib.sha256(repr((params, *extra) if extra else params).encode("utf-8"))
+
+
+def _tag(digest, tag: str, *parts: Any) -> None:
+    digest.update(f"{tag}:{':'.join(str(p) for p in parts)};".encode())
+
+
+def _update(digest, value: Any) -> None:
+    from src.hypernodes import HyperNode
+
+    if value is None or isinstance(value, (bool, int, float, complex)):
+        _tag(digest, type(value).__name__, repr(value))
+    elif isinstance(value, str):
+        data = value.encode("utf-8", errors="surrogatepass")
+        _tag(digest, "str", len(data))
+        digest.update(data)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        data = bytes(value)
+        _tag(digest, "bytes", len(data))
+        digest.update(data)
+    elif isinstance(value, (list, tuple)):
+        _tag(digest, type(value).__name__, len(value))
+        for item in value:
+            _update(digest, item)
+    elif isinstance(value, Mapping):
+        _tag(digest, "mapping", len(value))
+        for key in sorted(value, key=repr):
+            _update(digest, key)
+            _update(digest, value[key])
+    elif isinstance(value, (set, frozenset)):
+        _tag(digest, "set", len(value))
+        for item_hash in sorted(fingerprint(item) or "" for item in value):
+            if not item_hash:
+                raise Unfingerprintable(value)
+            digest.update(item_hash.encode())
+    elif isinstance(value, HyperNode):
+        _update_hypernode(digest, value)
+    elif _is_execution_plumbing(value):
+        # builders and adapters change how a node runs, not what it returns
+        _tag(digest, "plumbing", type(value).__qualname__)
+    elif _update_corpus(digest, value):
+        pass
+    elif _update_array_like(digest, value):
+        pass
+    elif callable(value) and hasattr(value, "__qualname__"):
+        qualname = value.__qualname__
+        if "<locals>" in qualname or "<lambda>" in qualname:
+            raise Unfingerprintable(value)
+        _tag(digest, "callable", getattr(value, "__module__", ""), qualname)
+    else:
+        try:
+            data = pickle.dumps(value, protocol=4)
+        except Exception as e:
+            raise Unfingerprintable(value) from e
+        _tag(digest, "pickle", type(value).__module__, type(value).__qualname__, len(data))
+        digest.update(data)
+
+
+def _update_hypernode(digest, node: Any) -> None:
+    _tag(digest, "hypernode", node.name, node.source_hash())
+    inputs = node.instantiated_inputs or {}
+    _update(digest, {k: v for k, v in inputs.items() if not _is_execution_plumbing(v)})
+
+
+def _update_corpus(digest, value: Any) -> bool:
+    # corpora (hashed from their files' hashes) and chunk stores (hashed once per store) carry their
+    # own digests, rather than being pickled each time
+    chunk_store = sys.modules.get("src.chunk_store")
+    if chunk_store is not None and isinstance(value, chunk_store.ChunkStore):
+        _tag(digest, "chunk_store", len(value))
+        digest.update(value.digest().encode())
+        return True
+    corpus = sys.modules.get("src.corpus")
+    if corpus is not None and isinstance(value, corpus.Corpus):
+        _tag(digest, "corpus", len(value))
+        digest.update(value.digest.encode())
+        return True
+    return False
+
+
+def _update_array_like(digest, value: Any) -> bool:
+    # only look at libraries that are already imported; a value can't come from one that isn't
+    np = sys.modules.get("numpy")
+    sparse = sys.modules.get("scipy.sparse")
+    pd = sys.modules.get("pandas")
+
+    if sparse is not None and sparse.issparse(value):
+        csr = sparse.csr_matrix(value)
+        _tag(digest, "sparse", csr.shape, csr.dtype)
+        for part in (csr.data, csr.indices, csr.indptr):
+            digest.update(np.ascontiguousarray(part).tobytes())
+        return True
+    if np is not None and isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            _tag(digest, "ndarray[object]", value.shape)
+            for item in value.ravel().tolist():
+                _update(digest, item)
+        else:
+            _tag(digest, "ndarray", value.shape, value.dtype.str)
+            digest.update(np.ascontiguousarray(value).tobytes())
+        return True
+    if pd is not None and isinstance(value, (pd.Series, pd.DataFrame, pd.Index)):
+        _tag(digest, type(value).__name__, value.shape)
+        if isinstance(value, pd.DataFrame):
+            _update(digest, [str(c) for c in value.columns])
+            _update(digest, [str(t) for t in value.dtypes])
+        else:
+            _update(digest, [str(value.name), str(value.dtype)])
+        try:
+            hashed = pd.util.hash_pandas_object(value, index=not isinstance(value, pd.Index))
+        except TypeError as e:
+            raise Unfingerprintable(value) from e
+        digest.update(np.ascontiguousarray(hashed.values).tobytes())
+        return True
+    return False
+
+
+def _is_execution_plumbing(value: Any) -> bool:
+    from hamilton.driver import Builder
+    from hamilton.lifecycle.base import LifecycleAdapter
+
+    if isinstance(value, (Builder, LifecycleAdapter)):
+        return True
+    if isinstance(value, (list, tuple)) and value:
+        return all(isinstance(v, LifecycleAdapter) for v in value)
+    return False
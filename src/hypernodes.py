@@ -1,15 +1,93 @@
+import os
 import sys
 import inspect
 from pathlib import Path
 import json
 import importlib
-from typing import Union, Any, Dict, List, Optional, Callable
+from typing import TYPE_CHECKING, Union, Any, Dict, List, Optional, Callable, Mapping, Tuple
 from pathlib import Path
-from hamilton.driver import Builder, Driver
-import hypster
 import importlib
 import inspect
 import logging
+import threading
+import hashlib
+import copy
+import pickle
+from collections import ChainMap, OrderedDict
+from contextvars import ContextVar
+from types import MappingProxyType
+from hamilton import registry as hamilton_registry
+from hamilton.lifecycle import NodeExecutionHook
+from src.profiling import ProfileReport, active_report, hypernode_scope, node_finished, node_started, profiling
+from src.sweep import active_shared_results, share_result
+from src.capture import InputCapture, active_capture
+
+if TYPE_CHECKING:
+    # hamilton's driver and hypster are imported when a node is first built or loaded, not with this module
+    from hamilton.driver import Builder, Driver
+
+_driver_init_lock = threading.Lock()
+
+# process-wide caches: loaded nodes keyed by folder (validated against file content hashes)
+# and built drivers keyed by dag modules (and their hashes) plus the builder config
+_load_cache: Dict[str, tuple] = {}
+_driver_cache: "OrderedDict[tuple, Driver]" = OrderedDict()
+_driver_cache_size = 32
+# fingerprints of node inputs checked against precomputed artifacts, by identity; each value is held
+# so its id can't be reused meanwhile
+_input_fingerprints: "OrderedDict[int, Tuple[Any, Optional[str]]]" = OrderedDict()
+_input_fingerprints_size = 64
+_cache_lock = threading.RLock()
+
+# recorded for precomputed artifacts whose upstream input wasn't provided when they were saved
+_MISSING_INPUT = "<missing>"
+
+# what the HyperNode executing has its nodes report to: (its name, profiling?, sharing results?, capture),
+# or None when no profiling, sharing_results or capturing block is active around it
+_node_scopes: ContextVar[Optional[Tuple[str, bool, bool, Optional[InputCapture]]]] = \
+    ContextVar("hypernodes_node_scopes", default=None)
+
+
+class _NodeScopesHook(NodeExecutionHook):
+    """Attached to every HyperNode driver: hands each node execution to the scopes active around
+    its HyperNode, so nodes only pay one context lookup when there are none."""
+
+    def run_before_node_execution(self, *, node_name: str, node_kwargs: Dict[str, Any],
+                                  **future_kwargs: Any) -> None:
+        scopes = _node_scopes.get()
+        if scopes is None:
+            return
+        hypernode, profiled, _, capture = scopes
+        if profiled:
+            node_started(node_name)
+        if capture is not None and capture.wants(hypernode, node_name):
+            capture.record(hypernode, node_name, node_kwargs)
+
+    def run_after_node_execution(self, *, node_name: str, result: Any, success: bool = True,
+                                 **future_kwargs: Any) -> None:
+        scopes = _node_scopes.get()
+        if scopes is None:
+            return
+        _, profiled, shared, _ = scopes
+        if profiled:
+            node_finished(node_name)
+        if shared and success:
+            share_result(node_name, result)
+
+
+_node_scopes_hook = _NodeScopesHook()
+
+def skip_hamilton_autoload() -> None:
+    """Opts out of hamilton's extension autoload, for serving workers and batch jobs that start often.
+
+    On first use hamilton imports an extension for every installed library it knows (sklearn, mlflow,
+    polars...), seconds of start-up; the nodes that need one import it themselves (e.g. batch_qa's
+    pandas extension). Call it before the first node is built. It goes through hamilton's own switch,
+    so worker processes started afterwards skip the autoload too, and leaves an explicit
+    HAMILTON_AUTOLOAD_EXTENSIONS setting (in the environment or ~/.hamilton.conf) alone.
+    """
+    if hamilton_registry.HAMILTON_AUTOLOAD_ENV not in os.environ:
+        hamilton_registry.disable_autoload()
 
 class HyperNode:
     def __init__(
@@ -22,17 +100,38 @@ class HyperNode:
         self.dag_modules = dag_modules
         self.hp_config = hp_config
         self._instantiated_inputs: Optional[Dict[str, Any]] = None
-        self._driver: Optional[Driver] = None
+        self._driver: Optional["Driver"] = None
+        # precomputed node outputs shipped with a saved bundle: name -> (value, input fingerprints)
+        self._artifacts: Dict[str, Tuple[Any, Dict[str, str]]] = {}
+        # folder the node was loaded from, so worker processes can load it again
+        self._folder: Optional[str] = None
 
     @property
-    def instantiated_inputs(self) -> Optional[Dict[str, Any]]:
-        return self._instantiated_inputs
+    def instantiated_inputs(self) -> Optional[Mapping[str, Any]]:
+        # read-only view: per-call inputs are layered on top in `execute`, never written back
+        if self._instantiated_inputs is None:
+            return None
+        return MappingProxyType(self._instantiated_inputs)
 
     @property
-    def driver(self) -> Optional[Driver]:
+    def driver(self) -> Optional["Driver"]:
         return self._driver
 
-    def save(self, folder: str):
+    def source_hash(self) -> str:
+        return _hash_bytes("".join(_module_source_hash(m) for m in self.dag_modules).encode())
+
+    @property
+    def artifacts(self) -> Mapping[str, Any]:
+        return MappingProxyType({name: value for name, (value, _) in self._artifacts.items()})
+
+    def save(self, folder: str, artifacts: Union[Mapping[str, Any], List[str], None] = None,
+             inputs: Optional[Mapping[str, Any]] = None):
+        """Saves the node's source, config and metadata to `folder`.
+
+        `artifacts` are precomputed node outputs to ship with the bundle (or node names to compute
+        now, with `inputs`). They're stored with content hashes and the fingerprints of the inputs
+        they were computed from; `load` injects them as overrides while those still match.
+        """
         folder_path = Path(folder)
         folder_path.mkdir(parents=True, exist_ok=True)
 
@@ -51,6 +150,7 @@ class HyperNode:
         hp_config_path = None
         if self.hp_config:
             hp_config_path = folder_path / f"{self.name}_hp_config.py"
+            import hypster
             hypster.save(self.hp_config, str(hp_config_path))
             hp_config_path = str(hp_config_path.relative_to(folder_path))
 
@@ -60,18 +160,118 @@ class HyperNode:
             "dag_module_paths": dag_module_paths,
             "hp_config_path": hp_config_path
         }
+        if artifacts:
+            metadata["artifacts"] = self._save_artifacts(folder_path, artifacts, inputs)
         metadata_path = folder_path / f"{self.name}_metadata.json"
         with open(metadata_path, 'w') as f:
             json.dump(metadata, f)
 
+    def _save_artifacts(self, folder_path: Path, artifacts: Union[Mapping[str, Any], List[str]],
+                        inputs: Optional[Mapping[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        if not isinstance(artifacts, Mapping):
+            artifacts = self.execute(final_vars=list(artifacts), inputs=inputs)
+        self.ensure_driver_initialized()
+        run_inputs = self._overlay_inputs(inputs)
+
+        artifacts_path = folder_path / "artifacts"
+        artifacts_path.mkdir(exist_ok=True)
+        entries = {}
+        for name, value in artifacts.items():
+            if name not in self._driver.graph.nodes:
+                raise ValueError(f"{self.name} has no node named '{name}'")
+            input_fingerprints = {}
+            for input_name in sorted(get_upstream_inputs(self._driver, name)):
+                input_fingerprint = self._fingerprint_input(input_name, run_inputs)
+                if input_fingerprint is None:
+                    raise ValueError(f"Can't save '{name}': its input '{input_name}' can't be fingerprinted")
+                input_fingerprints[input_name] = input_fingerprint
+
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            path = artifacts_path / f"{name}.pkl"
+            with open(path, 'wb') as f:
+                f.write(data)
+            entries[name] = {"path": str(path.relative_to(folder_path)),
+                             "sha256": _hash_bytes(data),
+                             "source_hash": self.source_hash(),
+                             "inputs": input_fingerprints}
+        return entries
+
+    def _fingerprint_input(self, name: str, run_inputs: Mapping[str, Any]) -> Optional[str]:
+        from src.fingerprinting import fingerprint
+
+        if name not in run_inputs:
+            return _MISSING_INPUT
+        value = run_inputs[name]
+        base = self._instantiated_inputs or {}
+        # inputs are read-only (as for chunks_digest: a list mutated in place keeps its old fingerprint),
+        # so containers and other objects (e.g. a text_chunks list) are fingerprinted once per object;
+        # per-call scalars are cheap to hash, and hashed every time rather than crowding the cache
+        if isinstance(value, _SCALAR_TYPES) and (name not in base or base[name] is not value):
+            return fingerprint(value)
+        with _cache_lock:
+            cached = _input_fingerprints.get(id(value))
+            if cached is not None and cached[0] is value:
+                _input_fingerprints.move_to_end(id(value))
+                return cached[1]
+        value_fingerprint = fingerprint(value)
+        with _cache_lock:
+            _input_fingerprints[id(value)] = (value, value_fingerprint)
+            while len(_input_fingerprints) > _input_fingerprints_size:
+                _input_fingerprints.popitem(last=False)
+        return value_fingerprint
+
+    def _artifact_overrides(self, run_inputs: Mapping[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+        valid = {}
+        for name, (value, input_fingerprints) in self._artifacts.items():
+            if name in overrides:
+                continue
+            if all(self._fingerprint_input(input_name, run_inputs) == input_fingerprint
+                   for input_name, input_fingerprint in input_fingerprints.items()):
+                valid[name] = value
+        return {**valid, **overrides} if valid else overrides
+
     @staticmethod
-    def load(folder: str):
+    def _load_artifacts(folder_path: Path, entries: Dict[str, Dict[str, Any]],
+                        source_hash: str) -> Dict[str, Tuple[Any, Dict[str, str]]]:
+        artifacts = {}
+        for name, entry in entries.items():
+            if entry["source_hash"] != source_hash:
+                logging.warning(f"Ignoring precomputed '{name}': the DAG source changed since it was saved")
+                continue
+            with open(folder_path / entry["path"], 'rb') as f:
+                data = f.read()
+            if _hash_bytes(data) != entry["sha256"]:
+                logging.warning(f"Ignoring precomputed '{name}': content hash mismatch")
+                continue
+            artifacts[name] = (pickle.loads(data), entry["inputs"])
+        return artifacts
+
+    @staticmethod
+    def load(folder: str, use_cache: bool = True):
         folder_path = Path(folder)
         
         # Load metadata
         metadata_path = next(folder_path.glob("*_metadata.json"))
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
+        with open(metadata_path, 'rb') as f:
+            metadata_bytes = f.read()
+        metadata = json.loads(metadata_bytes)
+
+        file_hashes = {str(metadata_path.name): _hash_bytes(metadata_bytes)}
+        for relative_path in [*metadata['dag_module_paths'], metadata['hp_config_path']]:
+            if relative_path:
+                file_hashes[relative_path] = _hash_file(folder_path / relative_path)
+        content_key = _hash_bytes(json.dumps(file_hashes, sort_keys=True).encode())
+
+        cache_key = str(folder_path.resolve())
+        if use_cache:
+            with _cache_lock:
+                cached = _load_cache.get(cache_key)
+            if cached is not None and cached[0] == content_key:
+                _, name, dag_modules, hp_config, artifacts = cached
+                node = HyperNode(name, list(dag_modules), hp_config)
+                node._artifacts = dict(artifacts)
+                node._folder = str(folder_path)
+                return node
         
         # Load DAG modules
         dag_modules = []
@@ -82,6 +282,7 @@ class HyperNode:
             module = importlib.util.module_from_spec(spec)
             spec.loader.exec_module(module)
             module.__name__ = module_name
+            module._hypernode_source_hash = file_hashes[module_path]
             sys.modules[module_name] = module
             dag_modules.append(module)
         
@@ -89,9 +290,27 @@ class HyperNode:
         hp_config = None
         if metadata['hp_config_path']:
             hp_config_path = folder_path / metadata['hp_config_path']
+            import hypster
             hp_config = hypster.load(str(hp_config_path))
+
+        node = HyperNode(metadata['name'], dag_modules, hp_config)
+        if metadata.get('artifacts'):
+            node._artifacts = HyperNode._load_artifacts(folder_path, metadata['artifacts'], node.source_hash())
+        node._folder = str(folder_path)
+
+        if use_cache:
+            with _cache_lock:
+                _load_cache[cache_key] = (content_key, metadata['name'], tuple(dag_modules), hp_config,
+                                          dict(node._artifacts))
         
-        return HyperNode(metadata['name'], dag_modules, hp_config)
+        return node
+
+    @staticmethod
+    def clear_cache() -> None:
+        with _cache_lock:
+            _load_cache.clear()
+            _driver_cache.clear()
+            _input_fingerprints.clear()
     
     def instantiate_inputs(self, selections: Dict[str, Any] = {}, overrides: Dict[str, Any] = {}, return_config_snapshot=False) -> None:
         if return_config_snapshot: #TODO: fix this :)
@@ -100,52 +319,368 @@ class HyperNode:
         else:
             self._instantiated_inputs = self.hp_config(selections=selections, overrides=overrides, return_config_snapshot=False)
 
+    def with_inputs(self, inputs: Mapping[str, Any]) -> "HyperNode":
+        """A copy of this node whose instantiated inputs are extended with `inputs`; the driver is shared."""
+        node = copy.copy(self)
+        node._instantiated_inputs = {**(self._instantiated_inputs or {}), **inputs}
+        return node
+
     def init_driver(self) -> None:
         if self._instantiated_inputs is None:
             raise ValueError("You must instantiate inputs before initializing the driver")
         
-        builder = self._instantiated_inputs.get("builder", Builder())
+        from hamilton.driver import Builder
+
+        builder = self._instantiated_inputs.get("builder") or Builder()
+
+        cache_key = _driver_cache_key(self.dag_modules, builder)
+        if cache_key is not None:
+            with _cache_lock:
+                if cache_key in _driver_cache:
+                    _driver_cache.move_to_end(cache_key)
+                    self._driver = _driver_cache[cache_key]
+                    return
         
+        # build from a copy so the instantiated builder can be reused, and add the hook serving
+        # profiling, result sharing and input capture
+        builder = copy.copy(builder)
+        builder.modules = list(builder.modules)
+        builder.adapters = [*builder.adapters, _node_scopes_hook]
         try:
             self._driver = builder.with_modules(*self.dag_modules).build()
         except Exception as e:
             logging.error(f"Failed to build driver: {e}")
             raise RuntimeError(f"Failed to build driver: {e}")
 
+        if cache_key is not None:
+            with _cache_lock:
+                _driver_cache[cache_key] = self._driver
+                while len(_driver_cache) > _driver_cache_size:
+                    _driver_cache.popitem(last=False)
+
     def ensure_driver_initialized(self) -> None:
-        if self._driver is None:
-            try:
-                self.init_driver()
-            except Exception as e:
-                logging.error(f"Failed to initialize driver: {e}")
-                raise RuntimeError(f"Failed to initialize driver: {e}")
-            
-    def execute(self, final_vars: List[Any] = [], inputs: Dict[str, Any] = {}) -> Dict[str, Any]:
+        if self._driver is not None:
+            return
+        with _driver_init_lock:
+            if self._driver is None:
+                try:
+                    self.init_driver()
+                except Exception as e:
+                    logging.error(f"Failed to initialize driver: {e}")
+                    raise RuntimeError(f"Failed to initialize driver: {e}")
+
+    def execute(self, final_vars: List[Any] = [], inputs: Optional[Mapping[str, Any]] = None,
+                overrides: Dict[str, Any] = {}) -> Dict[str, Any]:
         self.ensure_driver_initialized()
         
         if self._driver is None:
             raise RuntimeError("Driver initialization failed")
         
+        run_inputs = self._overlay_inputs(inputs)
+        if getattr(self, "_artifacts", None):
+            overrides = self._artifact_overrides(run_inputs, overrides)
+        profiled, shared_results, capture = active_report() is not None, active_shared_results(), active_capture()
+        scopes = (self.name, profiled, shared_results is not None, capture) \
+            if profiled or shared_results is not None or capture is not None else None
+        token = _node_scopes.set(scopes)
+        try:
+            with hypernode_scope(self.name):
+                if shared_results is not None:
+                    return shared_results.execute(self, final_vars, run_inputs, overrides)
+                return self._driver.execute(final_vars=final_vars, inputs=run_inputs, overrides=overrides)
+        finally:
+            _node_scopes.reset(token)
+
+    def profile(self, final_vars: List[Any] = [], inputs: Optional[Mapping[str, Any]] = None,
+                overrides: Dict[str, Any] = {}, track_memory: bool = False) -> Tuple[Dict[str, Any], ProfileReport]:
+        with profiling(track_memory=track_memory) as report:
+            results = self.execute(final_vars=final_vars, inputs=inputs, overrides=overrides)
+        return results, report
+
+    def _overlay_inputs(self, inputs: Optional[Mapping[str, Any]] = None) -> Mapping[str, Any]:
+        # per-call inputs shadow the instantiated inputs without copying or mutating either of them
+        base = self._instantiated_inputs if self._instantiated_inputs is not None else {}
+        if inputs is None or inputs is base:
+            overlay = ChainMap(base)
+        else:
+            overlay = ChainMap(inputs, base)
+
         #TODO: remove this in the future:
-        inputs = inputs.copy()
-        {k:inputs.pop(k) for k in self._driver.config}
-        
-        return self._driver.execute(final_vars=final_vars, inputs=inputs)
+        config = self._driver.config
+        if any(k in overlay for k in config):
+            return {k: v for k, v in overlay.items() if k not in config}
+        return overlay
+
+    def execute_batch(self, final_vars: List[Any], rows: List[Mapping[str, Any]], inputs: Optional[Mapping[str, Any]] = None,
+                      overrides: Dict[str, Any] = {}, max_workers: int = 1) -> List[Dict[str, Any]]:
+        """Executes `final_vars` once per row of dynamic inputs, returning one result per row in order.
+
+        Inputs that are identical across rows, and every node that doesn't depend on a row-varying
+        input (e.g. corpus loading and indexing), are computed once and shared by all rows. Row-varying
+        nodes with a batch counterpart (e.g. top_k_chunks and batch_top_k_chunks, see
+        `get_batched_nodes`) are computed for all rows in one call of it.
+        """
+        from src.concurrency import map_concurrently
+
+        self.ensure_driver_initialized()
+
+        if not rows:
+            return []
+
+        shared_inputs = dict(inputs or {})
+        varying = set()
+        for key in set().union(*rows):
+            values = [row.get(key) for row in rows]
+            if _all_equal(values):
+                shared_inputs[key] = values[0]
+            else:
+                varying.add(key)
+
+        if not varying:
+            results = self.execute(final_vars=final_vars, inputs=shared_inputs, overrides=overrides)
+            return [dict(results) for _ in rows]
+
+        shared_nodes = get_shared_upstream_nodes(self._driver, final_vars, varying, overrides)
+        shared_overrides = dict(overrides)
+        if shared_nodes:
+            shared_overrides.update(self.execute(final_vars=shared_nodes, inputs=shared_inputs, overrides=overrides))
+
+        batched = get_batched_nodes(self._driver, final_vars, varying, shared_overrides)
+        batched_results = {}
+        if batched:
+            list_inputs = {list_input: [row.get(k) for row in rows]
+                           for _, lists in batched.values() for k, list_input in lists.items()}
+            results = self.execute(final_vars=sorted({batch_node for batch_node, _ in batched.values()}),
+                                   inputs=ChainMap(list_inputs, shared_inputs), overrides=shared_overrides)
+            batched_results = {name: results[batch_node] for name, (batch_node, _) in batched.items()}
+
+        def execute_row(i_row):
+            i, row = i_row
+            row_inputs = ChainMap({k: row.get(k) for k in varying}, shared_inputs)
+            row_overrides = {**shared_overrides, **{name: values[i] for name, values in batched_results.items()}}
+            return self.execute(final_vars=final_vars, inputs=row_inputs, overrides=row_overrides)
+
+        return map_concurrently(execute_row, list(enumerate(rows)), max_workers=max_workers)
     
-    def get_node_inputs(self, node_name: str) -> Dict[str, Any]:
+    def sweep(self, grid: Mapping[str, List[Any]], final_vars: List[str], selections: Dict[str, Any] = {},
+              overrides: Dict[str, Any] = {}, inputs: Optional[Mapping[str, Any]] = None,
+              max_workers: int = 1, max_shared_results: int = 64) -> List["SweepRun"]:
+        """Executes `final_vars` for every combination of the hp_config values in `grid`, e.g.
+        {"rag_qa.chunker": ["paragraph", "sentence"], "rag_qa.llm_model": ["mini", "haiku"]}.
+
+        Each distinct upstream result (chunks, indexes, retrieved chunks...) is computed once and
+        shared by the configs that only differ downstream of it; see `src.sweep`.
+        """
+        from src.sweep import run_sweep
+        return run_sweep(self, grid, final_vars, selections=selections, overrides=overrides, inputs=inputs,
+                         max_workers=max_workers, max_shared_results=max_shared_results)
+
+    def get_node_inputs(self, node_name: str, capture: Optional[InputCapture] = None, index: int = -1) -> Dict[str, Any]:
+        """The arguments `node_name` is called with.
+
+        Taken from `capture` (or the active `capturing` block) when it recorded a call of the node in
+        this HyperNode, e.g. during a production run; otherwise its upstream is executed to compute them.
+        """
         self.ensure_driver_initialized()
         
         if self._driver is None:
             raise RuntimeError("Driver initialization failed")
+
+        capture = capture if capture is not None else active_capture()
+        if capture is not None and capture.count(f"{self.name}.{node_name}"):
+            return capture.get(f"{self.name}.{node_name}", index)
         
-        upstream_args = get_upstream_args(self._driver, node_name)
-        return self.execute(final_vars=upstream_args, inputs=self._instantiated_inputs)
+        # optional inputs that aren't provided are left to the node's defaults, as in a real run
+        nodes = self._driver.graph.nodes
+        run_inputs = self._overlay_inputs()
+        upstream_args = [arg for arg in get_upstream_args(self._driver, node_name)
+                         if not (nodes[arg].user_defined and arg not in run_inputs
+                                 and arg in nodes[node_name].default_parameter_values)]
+        return self.execute(final_vars=upstream_args)
+
+    def replay(self, node_name: str, inputs: Optional[Mapping[str, Any]] = None,
+               capture: Optional[InputCapture] = None, index: int = -1) -> Any:
+        """Calls `node_name` alone on `inputs`, by default its captured inputs (see `get_node_inputs`)."""
+        self.ensure_driver_initialized()
+        if inputs is None:
+            inputs = self.get_node_inputs(node_name, capture=capture, index=index)
+        return self._driver.graph.nodes[node_name].callable(**inputs)
+
+def _varying_checker(driver: "Driver", varying_inputs: set, overrides: Dict[str, Any]) -> Callable[[str], bool]:
+    """Whether a node (or input) transitively depends on `varying_inputs`, memoized."""
+    nodes = driver.graph.nodes
+    depends_on_varying: Dict[str, bool] = {}
+
+    def is_varying(name: str) -> bool:
+        if name not in depends_on_varying:
+            node = nodes.get(name)
+            if name in varying_inputs:
+                depends_on_varying[name] = True
+            elif node is None or node.user_defined or name in overrides:
+                depends_on_varying[name] = False
+            else:
+                depends_on_varying[name] = any(is_varying(dep.name) for dep in node.dependencies)
+        return depends_on_varying[name]
+
+    return is_varying
+
+def get_shared_upstream_nodes(driver: "Driver", final_vars: List[str], varying_inputs: set, overrides: Dict[str, Any] = {}) -> List[str]:
+    """Nodes needed for `final_vars` that don't depend on `varying_inputs` and feed a node that does."""
+    nodes = driver.graph.nodes
+    is_varying = _varying_checker(driver, varying_inputs, overrides)
+
+    shared, seen, stack = [], set(), list(final_vars)
+    while stack:
+        name = stack.pop()
+        if name in seen or name in overrides or name not in nodes or nodes[name].user_defined:
+            continue
+        seen.add(name)
+        if not is_varying(name):
+            shared.append(name)
+            continue
+        stack.extend(dep.name for dep in nodes[name].dependencies)
+    return shared
+
+def get_batched_nodes(driver: "Driver", final_vars: List[str], varying_inputs: set,
+                      overrides: Dict[str, Any] = {}) -> Dict[str, Tuple[str, Dict[str, str]]]:
+    """Row-varying nodes needed for `final_vars` that have a batch counterpart in the DAG, e.g.
+    `top_k_chunks(ranker, text_chunks, query)` and `batch_top_k_chunks(ranker, text_chunks, queries)`.
+
+    A counterpart is named `batch_<node>` and takes the same arguments, except that the node's one
+    row-varying input is replaced by a list input (one value per row); it returns one result per row.
+    Maps each node to its counterpart and {varying input: list input}; nodes upstream of a batched
+    node aren't visited.
+    """
+    nodes = driver.graph.nodes
+    is_varying = _varying_checker(driver, varying_inputs, overrides)
+
+    def batch_counterpart(name: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        batch_node = nodes.get(f"batch_{name}")
+        if batch_node is None or batch_node.user_defined:
+            return None
+        deps = [dep.name for dep in nodes[name].dependencies]
+        row_inputs = [dep for dep in deps if dep in varying_inputs]
+        # a node varying through another node (or through several inputs) can't be batched this way
+        if len(row_inputs) != 1 or any(is_varying(dep) for dep in deps if dep not in row_inputs):
+            return None
+        list_inputs = [dep for dep in batch_node.dependencies if dep.name not in deps]
+        if len(list_inputs) != 1 or not list_inputs[0].user_defined \
+                or {dep.name for dep in batch_node.dependencies} != set(deps) - set(row_inputs) | {list_inputs[0].name}:
+            return None
+        return batch_node.name, {row_inputs[0]: list_inputs[0].name}
+
+    batched, seen, stack = {}, set(), list(final_vars)
+    while stack:
+        name = stack.pop()
+        if name in seen or name in overrides or name not in nodes or nodes[name].user_defined:
+            continue
+        seen.add(name)
+        if not is_varying(name):
+            continue
+        counterpart = batch_counterpart(name)
+        if counterpart is not None:
+            batched[name] = counterpart
+            continue
+        stack.extend(dep.name for dep in nodes[name].dependencies)
+    return batched
+
+def get_upstream_inputs(driver: "Driver", node_name: str) -> set:
+    """Names of the user-provided inputs `node_name` transitively depends on."""
+    nodes = driver.graph.nodes
+    inputs, seen, stack = set(), set(), [node_name]
+    while stack:
+        name = stack.pop()
+        if name in seen or name not in nodes:
+            continue
+        seen.add(name)
+        if nodes[name].user_defined:
+            inputs.add(name)
+        else:
+            stack.extend(dep.name for dep in nodes[name].dependencies)
+    return inputs
+
+def get_downstream_nodes(driver: "Driver", names: set) -> set:
+    """Names of the nodes that transitively depend on any of `names` (inputs or nodes)."""
+    nodes = driver.graph.nodes
+    downstream, stack = set(), [name for name in names if name in nodes]
+    while stack:
+        for consumer in nodes[stack.pop()].depended_on_by:
+            if consumer.name not in downstream:
+                downstream.add(consumer.name)
+                stack.append(consumer.name)
+    return downstream
+
+def _all_equal(values: List[Any]) -> bool:
+    first = values[0]
+    try:
+        return all(value is first or bool(value == first) for value in values[1:])
+    except (ValueError, TypeError):
+        from src.fingerprinting import fingerprint
+        first_hash = fingerprint(first)
+        return first_hash is not None and all(fingerprint(value) == first_hash for value in values[1:])
 
 def get_func_arg_list(func: Callable) -> List[str]:
     import inspect
     return inspect.getfullargspec(func).args
 
-def get_upstream_args(driver: Driver, node_name: str) -> List[str]:
-    func = driver.graph.nodes[node_name].callable
-    upstream_args = get_func_arg_list(func)
-    return [arg for arg in upstream_args if not arg.startswith(node_name)]
\ No newline at end of file
+def get_upstream_args(driver: "Driver", node_name: str) -> List[str]:
+    # the graph already knows the node's parameters, no need to inspect its callable
+    upstream_args = list(driver.graph.nodes[node_name].input_types)
+    return [arg for arg in upstream_args if not arg.startswith(node_name)]
+
+def _hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _hash_file(path: Path) -> str:
+    with open(path, 'rb') as f:
+        return _hash_bytes(f.read())
+
+def _module_source_hash(module: Any) -> str:
+    source_hash = getattr(module, "_hypernode_source_hash", None)
+    if source_hash is None:
+        source_hash = _hash_bytes(inspect.getsource(module).encode())
+    return source_hash
+
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+class _Held:
+    """Keeps a value alive inside a cache key without taking part in the key's hash or equality."""
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, _Held)
+
+    def __hash__(self) -> int:
+        return 0
+
+def _builder_fingerprint(builder: "Builder") -> Optional[str]:
+    """Returns a stable description of the builder, or None if it holds state we can't compare."""
+    # executors and materializers are opaque objects, don't share drivers built with them
+    if builder.materializers or builder.execution_manager or builder.local_executor \
+            or builder.remote_executor or builder.grouping_strategy or builder.legacy_graph_adapter:
+        return None
+
+    fingerprint = repr((sorted(builder.config.items(), key=str), builder.v2_executor,
+                        builder._allow_module_overrides, [_module_source_hash(m) for m in builder.modules]))
+    # reprs with memory addresses are not stable across builds
+    if " at 0x" in fingerprint:
+        return None
+    return fingerprint
+
+def _driver_cache_key(dag_modules: List[Any], builder: "Builder") -> Optional[tuple]:
+    try:
+        builder_fingerprint = _builder_fingerprint(builder)
+        if builder_fingerprint is None:
+            return None
+        # the module objects themselves are part of the key (hashed by identity): a driver runs their
+        # functions and module state, so separately loaded copies of the same source get their own
+        modules = tuple((m.__name__, _module_source_hash(m), m) for m in dag_modules)
+        # so are the adapters, by id since they may not be hashable: their state can't be compared, so
+        # two instances never share a driver. The key holds them too, so an id can't be reused meanwhile
+        adapters = tuple((id(a), _Held(a)) for a in builder.adapters)
+        return (modules, builder_fingerprint, adapters)
+    except (OSError, TypeError):
+        return None
@@ -0,0 +1,241 @@
+import hashlib
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+
+class IncrementalTfidfIndex:
+    """TF-IDF index that supports adding, replacing and removing documents without a full refit.
+
+    Raw term counts are kept per chunk row together with per-term document frequencies, so an
+    update only tokenizes the new chunks; IDF weights and normalized vectors are re-derived from
+    the stored counts. Removed rows and terms that no longer occur are left in place until
+    `compact` (or a full `refit`) drops them.
+    """
+
+    def __init__(self, vectorizer: TfidfVectorizer):
+        params = vectorizer.get_params()
+        if params["min_df"] != 1 or params["max_df"] != 1.0 or params["max_features"] is not None \
+                or params["vocabulary"] is not None:
+            raise ValueError("Incremental indexing doesn't support min_df, max_df, max_features or a fixed vocabulary")
+        self.vectorizer = vectorizer
+        self._analyze = vectorizer.build_analyzer()
+        self.lock = threading.RLock()
+        self.corpus_key: Optional[str] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.vocabulary_: Dict[str, int] = {}
+        self._df = np.zeros(0, dtype=np.int64)
+        self._counts = sp.csr_matrix((0, 0), dtype=np.float64)
+        self._pending: List[sp.csr_matrix] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._row_chunks: List[str] = []
+        self._doc_rows: Dict[str, np.ndarray] = {}
+        self._snapshot: Optional[Tuple[Any, List[str], "TfidfSnapshot"]] = None
+
+    # ---- updates
+
+    def upsert(self, doc_id: str, chunks: List[str]) -> None:
+        with self.lock:
+            self._update({doc_id: list(chunks)}, [doc_id])
+
+    def remove(self, doc_id: str) -> None:
+        with self.lock:
+            self._update({}, [doc_id])
+
+    def sync(self, documents: Dict[str, List[str]]) -> Tuple[List[str], List[str], List[str]]:
+        """Makes the index hold exactly `documents` (doc_id -> chunks), touching only what differs."""
+        with self.lock:
+            added, replaced, changed = [], [], {}
+            removed = [doc_id for doc_id in self._doc_rows if doc_id not in documents]
+            for doc_id, chunks in documents.items():
+                rows = self._doc_rows.get(doc_id)
+                if rows is None:
+                    added.append(doc_id)
+                elif [self._row_chunks[i] for i in rows] != list(chunks):
+                    replaced.append(doc_id)
+                else:
+                    continue
+                changed[doc_id] = list(chunks)
+            self._update(changed, removed + replaced)
+            return added, replaced, removed
+
+    def sync_chunks(self, chunks: Iterable[str]) -> Tuple[List[str], List[str], List[str]]:
+        """`sync` for a flat chunk list: every distinct chunk is its own document, keyed by content."""
+        documents = {}
+        for chunk in chunks:
+            documents.setdefault(_chunk_id(chunk), [chunk])
+        return self.sync(documents)
+
+    def _update(self, documents: Dict[str, List[str]], removed: List[str]) -> None:
+        # all removed rows go in one pass over the counts, and all new chunks in one block, so a sync
+        # costs the same however many documents it touches
+        rows = [self._doc_rows.pop(doc_id) for doc_id in removed if doc_id in self._doc_rows]
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        if len(rows):
+            counts = self._merged_counts()[rows]
+            self._df[:counts.shape[1]] -= np.bincount(counts.indices, minlength=counts.shape[1])
+            self._alive[rows] = False
+            self._snapshot = None
+
+        if documents:
+            rows = self._append([chunk for chunks in documents.values() for chunk in chunks])
+            bounds = np.cumsum([0, *(len(chunks) for chunks in documents.values())])
+            for doc_id, start, end in zip(documents, bounds[:-1], bounds[1:]):
+                self._doc_rows[doc_id] = rows[start:end]
+
+    def _append(self, chunks: List[str]) -> np.ndarray:
+        indptr, indices, data = [0], [], []
+        for chunk in chunks:
+            for term, count in Counter(self._analyze(chunk)).items():
+                term_id = self.vocabulary_.get(term)
+                if term_id is None:
+                    term_id = self.vocabulary_[term] = len(self.vocabulary_)
+                indices.append(term_id)
+                data.append(count)
+            indptr.append(len(indices))
+
+        n_terms = len(self.vocabulary_)
+        block = _csr(data, indices, indptr, (len(chunks), n_terms))
+        if len(self._df) < n_terms:
+            self._df = np.concatenate([self._df, np.zeros(n_terms - len(self._df), dtype=np.int64)])
+        self._df += np.bincount(block.indices, minlength=n_terms)
+
+        start = len(self._row_chunks)
+        self._pending.append(block)
+        self._row_chunks.extend(chunks)
+        self._alive = np.concatenate([self._alive, np.ones(len(chunks), dtype=bool)])
+        self._snapshot = None
+        return np.arange(start, start + len(chunks))
+
+    def _merged_counts(self) -> sp.csr_matrix:
+        n_terms = len(self.vocabulary_)
+        if self._pending or self._counts.shape[1] != n_terms:
+            blocks = [self._counts, *self._pending]
+            blocks = [sp.csr_matrix((b.data, b.indices, b.indptr), shape=(b.shape[0], n_terms)) for b in blocks]
+            self._counts = sp.vstack(blocks, format="csr")
+            self._pending = []
+        return self._counts
+
+    # ---- maintenance
+
+    @property
+    def n_documents(self) -> int:
+        return len(self._doc_rows)
+
+    @property
+    def drift(self) -> float:
+        """Share of stored rows and terms that are dead weight (removed rows, terms with df == 0)."""
+        rows, terms = len(self._alive), len(self._df)
+        dead = (rows - int(self._alive.sum())) + int((self._df == 0).sum())
+        return dead / max(1, rows + terms)
+
+    def compact(self) -> None:
+        """Physically drops removed rows and unused terms (no re-tokenization)."""
+        with self.lock:
+            counts = self._merged_counts()
+            alive_rows = np.flatnonzero(self._alive)
+            used_terms = np.flatnonzero(self._df > 0)
+
+            row_map = np.full(len(self._alive), -1, dtype=np.int64)
+            row_map[alive_rows] = np.arange(len(alive_rows))
+            term_map = np.full(len(self._df), -1, dtype=np.int64)
+            term_map[used_terms] = np.arange(len(used_terms))
+
+            self._counts = counts[alive_rows][:, used_terms].tocsr()
+            self._df = self._df[used_terms]
+            self.vocabulary_ = {t: int(term_map[i]) for t, i in self.vocabulary_.items() if term_map[i] >= 0}
+            self._row_chunks = [self._row_chunks[i] for i in alive_rows]
+            self._alive = np.ones(len(alive_rows), dtype=bool)
+            self._doc_rows = {doc_id: row_map[rows] for doc_id, rows in self._doc_rows.items()}
+            self._snapshot = None
+
+    def refit(self) -> None:
+        """Rebuilds the index from scratch from the documents it currently holds."""
+        with self.lock:
+            documents = {doc_id: [self._row_chunks[i] for i in rows] for doc_id, rows in self._doc_rows.items()}
+            corpus_key = self.corpus_key
+            self._reset()
+            self._update(documents, [])
+            self.corpus_key = corpus_key
+
+    # ---- scoring
+
+    def _idf(self, n_rows: int) -> np.ndarray:
+        # terms that only occurred in removed rows get a zero weight, as if they weren't in the vocabulary
+        df = self._df.astype(np.float64)
+        if not self.vectorizer.use_idf:
+            idf = np.ones(len(df))
+        elif self.vectorizer.smooth_idf:
+            idf = np.log((1 + n_rows) / (1 + df)) + 1
+        else:
+            idf = np.log(n_rows / np.maximum(df, 1)) + 1
+        return np.where(df > 0, idf, 0.0)
+
+    def snapshot(self) -> Tuple[Any, List[str], "TfidfSnapshot"]:
+        """(normalized tf-idf matrix, chunks, query transformer) over the live rows, in row order.
+
+        Snapshots are immutable, so they stay consistent while the index keeps being updated.
+        """
+        with self.lock:
+            if self._snapshot is None:
+                alive_rows = np.flatnonzero(self._alive)
+                transformer = TfidfSnapshot(self.vectorizer, self._analyze, self.vocabulary_,
+                                            self._idf(len(alive_rows)))
+                matrix = transformer.weight(self._merged_counts()[alive_rows])
+                self._snapshot = (matrix, [self._row_chunks[i] for i in alive_rows], transformer)
+            return self._snapshot
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        return self.snapshot()[2].transform(texts)
+
+
+class TfidfSnapshot:
+    """Vectorizes queries against the vocabulary and IDF weights of one index snapshot."""
+
+    def __init__(self, vectorizer: TfidfVectorizer, analyze: Callable[[str], List[str]],
+                 vocabulary: Dict[str, int], idf: np.ndarray):
+        self.vectorizer = vectorizer
+        self.analyze = analyze
+        # anything with a dict-like `.get`; the index only appends to its vocabulary (compaction
+        # swaps in a new dict), so ids past len(idf) belong to later updates and are ignored here
+        self.vocabulary = vocabulary
+        self.idf = idf
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        n_terms = len(self.idf)
+        indptr, indices, data = [0], [], []
+        for text in texts:
+            for term, count in Counter(self.analyze(text)).items():
+                term_id = self.vocabulary.get(term)
+                if term_id is not None and term_id < n_terms:
+                    indices.append(term_id)
+                    data.append(count)
+            indptr.append(len(indices))
+        return self.weight(_csr(data, indices, indptr, (len(texts), n_terms)))
+
+    def weight(self, counts: sp.csr_matrix) -> sp.csr_matrix:
+        counts = counts.astype(self.vectorizer.dtype, copy=True)
+        if self.vectorizer.binary:
+            counts.data[:] = 1
+        if self.vectorizer.sublinear_tf:
+            np.log(counts.data, counts.data)
+            counts.data += 1
+        counts.data *= self.idf[counts.indices]
+        counts.eliminate_zeros()
+        return normalize(counts, norm=self.vectorizer.norm) if self.vectorizer.norm else counts
+
+
+def _csr(data: List[int], indices: List[int], indptr: List[int], shape: Tuple[int, int]) -> sp.csr_matrix:
+    return sp.csr_matrix((np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int64),
+                          np.asarray(indptr, dtype=np.int64)), shape=shape)
+
+
+def _chunk_id(chunk: str) -> str:
+    return hashlib.sha1(chunk.encode("utf-8", errors="surrogatepass")).hexdigest()
@@ -0,0 +1,184 @@
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.fingerprinting import params_digest
+from src.incremental_index import TfidfSnapshot
+
+FORMAT = "hypernodes-tfidf-index"
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+
+class StringTable(Sequence):
+    """Read-only sequence of strings stored as one UTF-8 blob plus an offsets array.
+
+    Both files are memory-mapped; strings are only decoded when accessed.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.raw(i).decode("utf-8", errors="surrogatepass")
+
+    def raw(self, i: int) -> bytes:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    @staticmethod
+    def write(strings: Sequence, blob_path: Path, offsets_path: Path) -> None:
+        offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        with open(blob_path, "wb") as f:
+            for i, string in enumerate(strings):
+                encoded = string.encode("utf-8", errors="surrogatepass")
+                f.write(encoded)
+                offsets[i + 1] = offsets[i] + len(encoded)
+        offsets.tofile(offsets_path)
+
+
+class Vocabulary:
+    """term -> column lookup over a sorted, memory-mapped `StringTable` (binary search, no dict)."""
+
+    def __init__(self, terms: StringTable, columns: np.ndarray):
+        self.terms = terms
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def get(self, term: str, default: Optional[int] = None) -> Optional[int]:
+        key = term.encode("utf-8", errors="surrogatepass")
+        low, high = 0, len(self.terms)
+        while low < high:
+            mid = (low + high) // 2
+            if self.terms.raw(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(self.terms) and self.terms.raw(low) == key:
+            return int(self.columns[low])
+        return default
+
+
+def vectorizer_fingerprint(vectorizer: TfidfVectorizer) -> str:
+    return params_digest(vectorizer).hexdigest()
+
+
+def save_tfidf_index(path: str, fitted_vectorizer: TfidfVectorizer, vectorized_texts: Any,
+                     text_chunks: Sequence) -> None:
+    """Writes a fitted index as flat files under `path`.
+
+    The files are written to a temporary directory that is then renamed to `path`, so readers find
+    either a complete index or, for the moment between moving an old index aside and renaming the
+    new one in, none (and fall back to fitting).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=path.parent, prefix=f".{path.name}."))
+    try:
+        matrix = sp.csr_matrix(vectorized_texts)
+        matrix.sort_indices()
+        index_dtype = np.int32 if max(matrix.nnz, matrix.shape[1]) < np.iinfo(np.int32).max else np.int64
+        matrix.data.tofile(tmp / "data.bin")
+        matrix.indices.astype(index_dtype).tofile(tmp / "indices.bin")
+        matrix.indptr.astype(index_dtype).tofile(tmp / "indptr.bin")
+        fitted_vectorizer.idf_.astype(np.float64).tofile(tmp / "idf.bin")
+
+        vocabulary = sorted(fitted_vectorizer.vocabulary_.items(),
+                            key=lambda item: item[0].encode("utf-8", errors="surrogatepass"))
+        StringTable.write([term for term, _ in vocabulary], tmp / "terms.bin", tmp / "term_offsets.bin")
+        np.array([column for _, column in vocabulary], dtype=np.int64).tofile(tmp / "term_columns.bin")
+        StringTable.write(text_chunks, tmp / "chunks.bin", tmp / "chunk_offsets.bin")
+
+        meta = {"format": FORMAT, "version": FORMAT_VERSION,
+                "vectorizer": vectorizer_fingerprint(fitted_vectorizer),
+                "shape": list(matrix.shape), "nnz": int(matrix.nnz),
+                "data_dtype": matrix.data.dtype.str, "index_dtype": np.dtype(index_dtype).str,
+                "n_terms": len(vocabulary), "n_chunks": len(text_chunks)}
+        (tmp / META_FILE).write_text(json.dumps(meta))
+
+        # an existing index is renamed aside, not deleted, before the new one takes its place, so
+        # `path` never holds a partly deleted or partly written index
+        old = tmp.with_name(f"{tmp.name}.old")
+        try:
+            os.replace(path, old)
+        except FileNotFoundError:
+            pass
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            if not (path / META_FILE).exists():
+                raise
+            # another worker wrote the same index in the meantime
+            shutil.rmtree(tmp, ignore_errors=True)
+        # readers that mapped the old files keep them until they unmap them
+        shutil.rmtree(old, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load_tfidf_index(path: str, vectorizer: TfidfVectorizer) -> Optional[Tuple[TfidfSnapshot, Any, StringTable]]:
+    """Memory-maps an index written by `save_tfidf_index`.
+
+    Returns None if there is no index at `path`, or if it was written in another format version
+    or for a vectorizer with different params.
+    """
+    path = Path(path)
+    try:
+        meta = json.loads((path / META_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != FORMAT or meta.get("version") != FORMAT_VERSION \
+            or meta.get("vectorizer") != vectorizer_fingerprint(vectorizer):
+        return None
+
+    n_rows, n_cols = meta["shape"]
+    index_dtype = np.dtype(meta["index_dtype"])
+    try:
+        data = _memmap(path / "data.bin", meta["data_dtype"], meta["nnz"])
+        indices = _memmap(path / "indices.bin", index_dtype, meta["nnz"])
+        indptr = _memmap(path / "indptr.bin", index_dtype, n_rows + 1)
+        idf = _memmap(path / "idf.bin", np.float64, n_cols)
+        terms = StringTable(_memmap(path / "terms.bin", np.uint8),
+                            _memmap(path / "term_offsets.bin", np.int64, meta["n_terms"] + 1))
+        columns = _memmap(path / "term_columns.bin", np.int64, meta["n_terms"])
+        chunks = StringTable(_memmap(path / "chunks.bin", np.uint8),
+                             _memmap(path / "chunk_offsets.bin", np.int64, meta["n_chunks"] + 1))
+    except (OSError, ValueError):
+        return None
+
+    matrix = sp.csr_matrix((n_rows, n_cols), dtype=data.dtype)
+    # assigned directly so scipy doesn't copy the mapped arrays while validating them
+    matrix.data, matrix.indices, matrix.indptr = data, indices, indptr
+    matrix.has_sorted_indices = True
+    transformer = TfidfSnapshot(vectorizer, vectorizer.build_analyzer(), Vocabulary(terms, columns), idf)
+    return transformer, matrix, chunks
+
+
+def _memmap(path: Path, dtype, count: Optional[int] = None) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    size = path.stat().st_size
+    if count is not None and size != count * dtype.itemsize:
+        raise ValueError(f"{path} holds {size} bytes, expected {count * dtype.itemsize}")
+    if size == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats (id, hits, misses) VALUES (0, 0, 0);
+"""
+
+# last-access times are only rewritten when older than this, so hits rarely need a write
+_TOUCH_INTERVAL = 60.0
+_EVICTION_INTERVAL = 100
+
+
+class LLMResponseCache:
+    """On-disk LLM response cache in SQLite, shared by threads and processes.
+
+    Entries are keyed on the model, messages and completion params. They expire after `ttl_seconds`
+    (0: never), and the least recently used ones are evicted beyond `max_entries`. Hit/miss counts
+    are kept per instance and accumulated in the database across processes.
+    """
+
+    def __init__(self, path: str = ".cache/llm_cache.sqlite", ttl_seconds: float = 0,
+                 max_entries: int = 100_000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._unsaved = [0, 0]
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connection() as connection:
+            connection.executescript(_SCHEMA)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"path": self.path, "ttl_seconds": self.ttl_seconds, "max_entries": self.max_entries}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any], namespace: str = "") -> str:
+        payload = json.dumps([namespace, model, messages, params], sort_keys=True, default=repr)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute("SELECT response, created_at, accessed_at FROM responses WHERE key = ?",
+                                 (key,)).fetchone()
+        if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+            with connection:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                self._unsaved[1] += 1
+            else:
+                self.hits += 1
+                self._unsaved[0] += 1
+            flush = sum(self._unsaved) >= _EVICTION_INTERVAL
+        if row is not None and now - row[2] > _TOUCH_INTERVAL:
+            with connection:
+                connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        if flush:
+            with connection:
+                self._flush_stats(connection)
+        return None if row is None else row[0]
+
+    def set(self, key: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % _EVICTION_INTERVAL == 1
+        connection = self._connection()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) "
+                               "VALUES (?, ?, ?, ?)", (key, response, now, now))
+            self._flush_stats(connection)
+        if evict:
+            self.evict()
+
+    def _flush_stats(self, connection: sqlite3.Connection) -> None:
+        with self._lock:
+            hits, misses = self._unsaved
+            self._unsaved = [0, 0]
+        if hits or misses:
+            connection.execute("UPDATE stats SET hits = hits + ?, misses = misses + ? WHERE id = 0",
+                               (hits, misses))
+
+    def evict(self) -> int:
+        """Drops expired entries and the least recently used ones beyond `max_entries`."""
+        connection = self._connection()
+        with connection:
+            removed = 0
+            if self.ttl_seconds:
+                removed += connection.execute("DELETE FROM responses WHERE created_at < ?",
+                                              (time.time() - self.ttl_seconds,)).rowcount
+            excess = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - int(self.max_entries)
+            if excess > 0:
+                removed += connection.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)", (excess,)).rowcount
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            hits, misses = self._unsaved
+        connection = self._connection()
+        entries = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total_hits, total_misses = connection.execute("SELECT hits, misses FROM stats WHERE id = 0").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries,
+                "total_hits": total_hits + hits, "total_misses": total_misses + misses}
+
+    def clear(self) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM responses")
+            connection.execute("UPDATE stats SET hits = 0, misses = 0 WHERE id = 0")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections can't be shared between threads, so each thread opens its own
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+
+_caches: Dict[Tuple[str, float, int], LLMResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(path: str, ttl_seconds: float = 0, max_entries: int = 100_000) -> LLMResponseCache:
+    key = (os.path.abspath(path), float(ttl_seconds), int(max_entries))
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = LLMResponseCache(path, ttl_seconds=ttl_seconds, max_entries=max_entries)
+        return _caches[key]
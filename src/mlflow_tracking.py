@@ -0,0 +1,264 @@
+import atexit
+import json
+import logging
+import os
+import pickle
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+
+from hamilton.lifecycle import GraphConstructionHook, GraphExecutionHook, NodeExecutionHook
+
+# MLflow's limits on params (and tags) per log_batch call and on param values
+_MAX_PARAMS_TAGS_PER_BATCH = 100
+_MAX_PARAM_VALUE_LENGTH = 6000
+
+_trackers: "weakref.WeakSet[AsyncMLFlowTracker]" = weakref.WeakSet()
+
+
+class AsyncMLFlowTracker(NodeExecutionHook, GraphExecutionHook, GraphConstructionHook):
+    """Drop-in for Hamilton's `MLFlowTracker` that logs from a background thread.
+
+    The hooks only enqueue references to what they'd log (tags, config and inputs as params,
+    the graph, final vars as metrics or artifacts); a writer thread formats and sends them with
+    `log_batch`, up to `batch_size` metrics at a time or every `flush_interval` seconds. The
+    queue holds at most `max_queue_size` items, then the hooks wait for the writer, so memory
+    stays bounded. Each run is flushed as soon as it ends, and everything is flushed on
+    interpreter exit. Unlike `MLFlowTracker`, it doesn't make the run mlflow's active run.
+
+    The writer exits once it has had nothing to do for `idle_timeout` seconds, or on `close`,
+    and is started again by the next hook call. A batch `log_batch` keeps failing on is dropped
+    after `max_send_attempts` attempts.
+    """
+
+    def __init__(self, experiment_name: str = "Hamilton", tracking_uri: Optional[str] = None,
+                 run_name: Optional[str] = None, run_tags: Optional[Dict[str, Any]] = None,
+                 batch_size: int = 100, flush_interval: float = 1.0, max_queue_size: int = 10_000,
+                 idle_timeout: float = 30.0, max_send_attempts: int = 3):
+        self.experiment_name = experiment_name
+        self.tracking_uri = tracking_uri
+        self.run_name = run_name
+        self.run_tags = run_tags or {}
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.idle_timeout = idle_timeout
+        self.max_send_attempts = max_send_attempts
+        self.config: Dict[str, Any] = {}
+        self._runs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # guards the writer: the queue, and the pid of the process it runs in (None when it isn't running)
+        self._writer_lock = threading.Lock()
+        self._pid: Optional[int] = None
+        _trackers.add(self)
+
+    # hooks, called on the execution thread: they only enqueue
+
+    def run_after_graph_construction(self, *, config: Dict[str, Any], **future_kwargs: Any) -> None:
+        self.config = config
+
+    def run_before_graph_execution(self, *, run_id: str, final_vars: List[str], inputs: Dict[str, Any],
+                                   graph: Any, **future_kwargs: Any) -> None:
+        run = {"final_vars": set(final_vars), "mlflow_run_id": None}
+        with self._lock:
+            self._runs[run_id] = run
+        # graph.version hashes every node's source, so it's left to the writer too
+        tags = {**self.run_tags, "hamilton_run_id": run_id}
+        self._put(("start", run, tags, self.run_name, dict(self.config), dict(inputs), graph))
+
+    def run_before_node_execution(self, **future_kwargs: Any) -> None:
+        pass
+
+    def run_after_node_execution(self, *, node_name: str, node_return_type: type, result: Any,
+                                 run_id: Optional[str] = None, success: bool = True, **future_kwargs: Any) -> None:
+        run = self._runs.get(run_id)
+        if run is None or not success or node_name not in run["final_vars"]:
+            return
+        self._put(("result", run, node_name, node_return_type, result))
+
+    def run_after_graph_execution(self, *, success: bool, run_id: Optional[str] = None,
+                                  **future_kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is not None:
+            self._put(("end", run, "FINISHED" if success else "FAILED"))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until everything enqueued so far is logged; False if `timeout` ran out first."""
+        return self._signal_writer("flush", timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Logs everything enqueued so far, then stops the writer; False if `timeout` ran out first."""
+        return self._signal_writer("stop", timeout)
+
+    def _signal_writer(self, kind: str, timeout: Optional[float]) -> bool:
+        done = threading.Event()
+        with self._writer_lock:
+            if self._pid != os.getpid():
+                return True  # no writer, so nothing pending
+            self._queue.put((kind, done))
+            if kind == "stop":
+                self._pid = None
+        return done.wait(timeout)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # the writer thread and its queue belong to this process; a copy starts its own
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**{k: v for k, v in state.items() if k != "config"})
+        self.config = state.get("config", {})
+
+    def _put(self, item: tuple) -> None:
+        # started lazily, again after it exited, and in a forked process (e.g. a sweep worker), which has
+        # no writer thread; enqueued under the lock so an idle writer can't exit in between
+        with self._writer_lock:
+            if self._pid != os.getpid():
+                self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=self.max_queue_size)
+                threading.Thread(target=self._write_loop, args=(self._queue,), name="mlflow-tracker",
+                                 daemon=True).start()
+                self._pid = os.getpid()
+            self._queue.put(item)
+
+    def _exit_if_idle(self, items: "queue.Queue[tuple]") -> bool:
+        # non-blocking: a hook holding the lock may be waiting for room in a full queue
+        if not self._writer_lock.acquire(blocking=False):
+            return False
+        try:
+            if self._queue is not items or not items.empty():
+                return False
+            self._pid = None
+            return True
+        finally:
+            self._writer_lock.release()
+
+    # writer thread
+
+    def _write_loop(self, items: "queue.Queue[tuple]") -> None:
+        import mlflow
+
+        client = mlflow.MlflowClient(self.tracking_uri)
+        experiment_id = None
+        pending: Dict[str, Dict[str, Any]] = {}
+        idle_since = time.monotonic()
+        while True:
+            try:
+                item = items.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._send(client, pending)
+                if not pending and time.monotonic() - idle_since >= self.idle_timeout and self._exit_if_idle(items):
+                    return
+                continue
+            idle_since = time.monotonic()
+            try:
+                kind = item[0]
+                if kind in ("flush", "stop"):
+                    self._send(client, pending)
+                    item[1].set()
+                    if kind == "stop":
+                        return
+                    continue
+                run = item[1]
+                if kind == "start":
+                    if experiment_id is None:
+                        experiment_id = self._experiment_id(client)
+                    self._start_run(client, experiment_id, pending, *item[1:])
+                elif run["mlflow_run_id"] is None:
+                    continue  # the run couldn't be created
+                elif kind == "result":
+                    self._log_result(client, pending, *item[1:])
+                elif kind == "end":
+                    self._send(client, pending)
+                    client.set_terminated(run["mlflow_run_id"], status=item[2])
+                if sum(len(batch["metrics"]) for batch in pending.values()) >= self.batch_size:
+                    self._send(client, pending)
+            except Exception as e:
+                # tracking must never take the pipeline down
+                logging.warning(f"MLflow tracking failed ({type(e).__name__}: {e})")
+
+    def _experiment_id(self, client: Any) -> str:
+        experiment = client.get_experiment_by_name(self.experiment_name)
+        if experiment is not None:
+            return experiment.experiment_id
+        return client.create_experiment(self.experiment_name)
+
+    def _start_run(self, client: Any, experiment_id: str, pending: Dict[str, Dict[str, list]], run: Dict[str, Any],
+                   tags: Dict[str, Any], run_name: Optional[str], config: Dict[str, Any], inputs: Dict[str, Any],
+                   graph: Any) -> None:
+        from mlflow.entities import Param
+
+        tags = {**tags, "code_version": graph.version}
+        mlflow_run = client.create_run(experiment_id, tags={k: str(v) for k, v in tags.items()}, run_name=run_name)
+        run_id = run["mlflow_run_id"] = mlflow_run.info.run_id
+        self._log_file(client, run_id, "config.json", lambda f: json.dump(config, f, indent=2, default=str))
+        graph_dict = {n.name: n.as_dict() for n in graph.nodes}
+        self._log_file(client, run_id, "hamilton_graph.json", lambda f: json.dump(graph_dict, f, indent=2, default=str))
+        params = {**config, **inputs}
+        self._pending_batch(pending, run_id)["params"].extend(
+            Param(name, str(value)[:_MAX_PARAM_VALUE_LENGTH]) for name, value in params.items())
+
+    def _log_result(self, client: Any, pending: Dict[str, Dict[str, list]], run: Dict[str, Any], node_name: str,
+                    node_return_type: type, result: Any) -> None:
+        from mlflow.entities import Metric
+
+        run_id = run["mlflow_run_id"]
+        if node_return_type in (float, int) or isinstance(result, (float, int)) and not isinstance(result, bool):
+            metric = Metric(node_name, float(result), int(time.time() * 1000), 0)
+            self._pending_batch(pending, run_id)["metrics"].append(metric)
+        elif isinstance(result, str):
+            self._log_file(client, run_id, f"{node_name}.txt", lambda f: f.write(result))
+        else:
+            if isinstance(result, dict):
+                try:
+                    text = json.dumps(result, indent=2)
+                    self._log_file(client, run_id, f"{node_name}.json", lambda f: f.write(text))
+                    return
+                except TypeError:
+                    pass
+            self._log_file(client, run_id, f"{node_name}.pickle", lambda f: pickle.dump(result, f), mode="wb")
+
+    @staticmethod
+    def _log_file(client: Any, run_id: str, file_name: str, write: Callable[[Any], Any], mode: str = "w") -> None:
+        # staged in a scratch directory rather than the working directory; not a TemporaryDirectory,
+        # whose exit-time cleanup could pull files from under a flush still running in atexit
+        scratch = tempfile.mkdtemp()
+        try:
+            path = os.path.join(scratch, file_name)
+            with open(path, mode) as f:
+                write(f)
+            client.log_artifact(run_id, path)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    @staticmethod
+    def _pending_batch(pending: Dict[str, Dict[str, Any]], run_id: str) -> Dict[str, Any]:
+        return pending.setdefault(run_id, {"metrics": [], "params": [], "attempts": 0})
+
+    def _send(self, client: Any, pending: Dict[str, Dict[str, Any]]) -> None:
+        for run_id, batch in list(pending.items()):
+            metrics, params = batch["metrics"], batch["params"]
+            try:
+                # what was sent is removed as it goes, so a retry only sends the rest
+                while metrics or params:
+                    client.log_batch(run_id, metrics=metrics[:_MAX_PARAMS_TAGS_PER_BATCH],
+                                     params=params[:_MAX_PARAMS_TAGS_PER_BATCH])
+                    del metrics[:_MAX_PARAMS_TAGS_PER_BATCH], params[:_MAX_PARAMS_TAGS_PER_BATCH]
+            except Exception as e:
+                batch["attempts"] += 1
+                if batch["attempts"] < self.max_send_attempts:
+                    logging.warning(f"MLflow log_batch failed ({type(e).__name__}: {e}), will retry")
+                    continue
+                logging.warning(f"Dropping {len(metrics)} metrics and {len(params)} params of MLflow run {run_id} "
+                                f"after {batch['attempts']} failed attempts ({type(e).__name__}: {e})")
+            del pending[run_id]
+
+
+@atexit.register
+def _flush_all() -> None:
+    for tracker in list(_trackers):
+        if not tracker.flush(timeout=30):
+            logging.warning(f"Gave up flushing MLflow tracking for experiment {tracker.experiment_name}")
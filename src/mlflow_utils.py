@@ -1,34 +1,96 @@
+import logging
+import time
 import mlflow
+from src.hypernodes import HyperNode, get_upstream_inputs
 
 class HyperNodeMLFlow(mlflow.pyfunc.PythonModel):
-    def __init__(self, node, final_vars, overrides={}):
+    def __init__(self, node, final_vars, overrides={}, max_concurrency=1,
+                 warm_start=False, warmup_nodes=[], warmup_inputs={}, bundle_artifact=None):
         self.node = node
         self.final_vars = [final_vars] if isinstance(final_vars, str) else final_vars
         self.overrides = overrides
+        self.max_concurrency = max_concurrency
+        # warm_start builds the driver in load_context and pre-executes warmup_nodes (e.g. text_chunks,
+        # top_k_chunks with a dummy query in warmup_inputs) so the first request doesn't pay for them
+        self.warm_start = warm_start
+        self.warmup_nodes = [warmup_nodes] if isinstance(warmup_nodes, str) else list(warmup_nodes)
+        self.warmup_inputs = warmup_inputs
+        # name of a logged artifact holding a `HyperNode.save` bundle; load_context serves from it, so
+        # outputs precomputed into the bundle (e.g. the ranker index) aren't rebuilt on first request
+        self.bundle_artifact = bundle_artifact
+        self.warmup_timings = {}
+        self._pinned_results = {}
         self.context_loaded = False
+
+    def __getstate__(self):
+        # pinned results are rebuilt by load_context, don't ship them inside the pickled model
+        state = self.__dict__.copy()
+        state["_pinned_results"] = {}
+        state["warmup_timings"] = {}
+        return state
         
     def load_context(self, context):
         #TODO: loadenv
+        start = time.perf_counter()
         
         overrides = self.overrides.copy()
+        bundle_artifact = getattr(self, "bundle_artifact", None)
         for k, v in context.artifacts.items():
-            overrides[k] = v
+            if k == bundle_artifact:
+                self.node = HyperNode.load(v)
+            else:
+                overrides[k] = v
         
         self.node.instantiate_inputs(overrides=overrides)
+        self.warmup_timings = {"instantiate_seconds": time.perf_counter() - start}
+        if getattr(self, "warm_start", False):
+            self.warm_up()
+        self.warmup_timings["total_seconds"] = time.perf_counter() - start
         self.context_loaded = True
+
+    def warm_up(self):
+        start = time.perf_counter()
+        self.node.ensure_driver_initialized()
+        self.warmup_timings["driver_seconds"] = time.perf_counter() - start
+
+        self._pinned_results = {}
+        if self.warmup_nodes:
+            start = time.perf_counter()
+            results = self.node.execute(final_vars=self.warmup_nodes, inputs=self.warmup_inputs)
+            self.warmup_timings["warmup_nodes_seconds"] = time.perf_counter() - start
+            # nodes computed from the dummy warm-up inputs only warm caches, the rest are reused by predict
+            warmup_keys = set(self.warmup_inputs)
+            self._pinned_results = {name: value for name, value in results.items()
+                                    if not get_upstream_inputs(self.node.driver, name) & warmup_keys}
+        logging.info(f"{self.node.name} warmed up in {sum(self.warmup_timings.values()):.2f}s "
+                     f"(pinned: {sorted(self._pinned_results)}): {self.warmup_timings}")
+
+    def _pinned_overrides(self, rows):
+        pinned = getattr(self, "_pinned_results", {})
+        if not pinned:
+            return {}
+        request_keys = set().union(*rows)
+        return {name: value for name, value in pinned.items()
+                if not get_upstream_inputs(self.node.driver, name) & request_keys}
         
     def predict(self, context, model_input, params=None):
         if not self.context_loaded:
             self.load_context(context)
             
-        inputs = self.node._instantiated_inputs
-        dynamic_inputs = model_input.to_dict(orient="records")[0]
-        inputs.update(dynamic_inputs)
-        
-        results = self.node.execute(final_vars=self.final_vars, inputs=inputs)
-        
+        rows = model_input.to_dict(orient="records")
+        overrides = self._pinned_overrides(rows)
+        if len(rows) == 1:
+            results = self.node.execute(final_vars=self.final_vars, inputs=rows[0], overrides=overrides)
+            if len(self.final_vars) == 1:
+                results = results[self.final_vars[0]]
+            return results
+
+        # upstream work shared by all rows (e.g. corpus loading, indexing) runs once for the batch
+        max_concurrency = getattr(self, "max_concurrency", 1)
+        results = self.node.execute_batch(final_vars=self.final_vars, rows=rows, overrides=overrides,
+                                          max_workers=max_concurrency)
         if len(self.final_vars) == 1:
-            results = results[self.final_vars[0]]
+            results = [result[self.final_vars[0]] for result in results]
         
         return results
     
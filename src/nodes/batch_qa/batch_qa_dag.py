@@ -1,20 +1,90 @@
 
+import logging
+import os
+import sys
+import time
 import pandas as pd
-from typing import List
+from typing import List, Optional
 from src.hypernodes import HyperNode
+from src.checkpoint import CheckpointLog
+from src.concurrency import RateLimiter, map_concurrently
+from src.fingerprinting import fingerprint
 from hamilton.function_modifiers import extract_columns
+# registers pandas for @extract_columns when hamilton's autoload is off (src.hypernodes.skip_hamilton_autoload)
+from hamilton.plugins import pandas_extensions  # noqa: F401
+
+def _is_transient_error(error: BaseException) -> bool:
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # litellm takes seconds to import; if it raised the error, it's imported already
+    litellm = sys.modules.get("litellm")
+    return litellm is not None and isinstance(error, (litellm.RateLimitError, litellm.APIConnectionError,
+                                                       litellm.Timeout, litellm.ServiceUnavailableError,
+                                                       litellm.InternalServerError))
 
 @extract_columns("questions", "answers")
 def user_queries(queries_path: str) -> pd.DataFrame:
     return pd.read_excel(queries_path)
 
-def llm_responses(questions: pd.Series, texts_path: str, rag_qa_node: HyperNode) -> List[str]:
-    responses = []
-    inputs = rag_qa_node._instantiated_inputs
-    for question in questions:
-        inputs.update({"query" : question, "texts_path" : texts_path})
-        res = rag_qa_node.execute(final_vars=["llm_response"], inputs=inputs)
-        responses.append(res["llm_response"])
+def questions_top_k_chunks(questions: pd.Series, texts_path: str, rag_qa_node: HyperNode) -> List[List[str]]:
+    inputs = {"queries" : list(questions), "texts_path" : texts_path}
+    res = rag_qa_node.execute(final_vars=["batch_top_k_chunks"], inputs=inputs)
+    return res["batch_top_k_chunks"]
+
+def rate_limiter(requests_per_minute: int, tokens_per_minute: int) -> RateLimiter:
+    return RateLimiter(requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute)
+
+def checkpoint_log(questions: pd.Series, rag_qa_node: HyperNode, checkpoint_dir: str = "") -> Optional[CheckpointLog]:
+    if not checkpoint_dir:
+        return None
+    # one log per (rag_qa config, question set), so a rerun with the same config picks up where it stopped
+    run_key = fingerprint([rag_qa_node, list(questions)])
+    if run_key is None:
+        logging.warning("rag_qa_node's inputs can't be fingerprinted, running without a checkpoint")
+        return None
+    return CheckpointLog(os.path.join(checkpoint_dir, f"{run_key[:32]}.jsonl"))
+
+def llm_responses(questions: pd.Series, questions_top_k_chunks: List[List[str]], rag_qa_node: HyperNode,
+                  rate_limiter: RateLimiter, max_concurrency: int, max_retries: int, retry_backoff: float,
+                  checkpoint_log: Optional[CheckpointLog]) -> List[str]:
+    max_tokens = rag_qa_node.instantiated_inputs.get("llm_config", {}).get("max_tokens", 0)
+    items = [(i, question, top_k_chunks, fingerprint([question, top_k_chunks]) if checkpoint_log else None)
+             for i, (question, top_k_chunks) in enumerate(zip(questions, questions_top_k_chunks))]
+
+    responses = [None] * len(items)
+    pending = items
+    if checkpoint_log is not None:
+        # answers logged by an earlier run are reused as long as their question and chunks match
+        done = checkpoint_log.load()
+        pending = []
+        for item in items:
+            record = done.get(item[0])
+            if record is not None and record["key"] == item[3]:
+                responses[item[0]] = record["response"]
+            else:
+                pending.append(item)
+        if len(pending) < len(items):
+            logging.info(f"Resuming from {checkpoint_log.path}: {len(items) - len(pending)} of {len(items)} "
+                         f"questions already answered")
+
+    def answer(item):
+        i, question, top_k_chunks, key = item
+        start = time.perf_counter()
+        res = rag_qa_node.execute(final_vars=["llm_response"], inputs={"query" : question},
+                                  overrides={"top_k_chunks" : top_k_chunks})
+        if checkpoint_log is not None:
+            checkpoint_log.append(i, key, res["llm_response"], time.perf_counter() - start)
+        return res["llm_response"]
+
+    def estimated_tokens(item):
+        _, question, top_k_chunks, _ = item
+        return (len(question) + sum(len(chunk) for chunk in top_k_chunks)) // 4 + int(max_tokens)
+
+    answered = map_concurrently(answer, pending,
+                                max_workers=max_concurrency, max_retries=max_retries, backoff=retry_backoff,
+                                retry_on=_is_transient_error, rate_limiter=rate_limiter, cost=estimated_tokens)
+    for item, response in zip(pending, answered):
+        responses[item[0]] = response
     return responses
 
 def accuracy(llm_responses: List[str], answers: pd.Series) -> float:
@@ -5,11 +5,18 @@ def hp_config(hp: HP):
     base_path = 'src/nodes'
     rag_qa_node = HyperNode.load(f'{base_path}/rag_qa')
     rag_qa_node._instantiated_inputs = hp.propagate(rag_qa_node.hp_config, 'rag_qa')
-    from hamilton.plugins.h_mlflow import MLFlowTracker
+    max_concurrency = hp.number_input(4)
+    requests_per_minute = hp.number_input(0)
+    tokens_per_minute = hp.number_input(0)
+    max_retries = hp.number_input(3)
+    retry_backoff = hp.number_input(1.0)
+    if hp.select([False, True], name='use_checkpoint', default=False):
+        checkpoint_dir = hp.text_input('.cache/batch_qa_checkpoints')
+    from src.mlflow_tracking import AsyncMLFlowTracker
     from hamilton.driver import Builder
     adapters = []
     if hp.select([True, False], name='use_mlflow_adapter', default=True):
         mlflow_experiment_name = hp.text_input('hypernodes')
-        mlflow_adapter = MLFlowTracker(experiment_name=mlflow_experiment_name)
+        mlflow_adapter = AsyncMLFlowTracker(experiment_name=mlflow_experiment_name)
         adapters.append(mlflow_adapter)
     builder = Builder().with_adapters(*adapters)
\ No newline at end of file
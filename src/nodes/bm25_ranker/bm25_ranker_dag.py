@@ -0,0 +1,51 @@
+from typing import List, Any
+from collections.abc import Sequence
+from collections import OrderedDict
+import threading
+from sklearn.base import clone
+from sklearn.feature_extraction.text import CountVectorizer
+from src.bm25 import BM25Index
+from src.chunk_store import chunks_digest
+from src.fingerprinting import params_digest
+
+# (fitted vectorizer, BM25 index) pairs, keyed by index_key, least recently used first
+_index_cache: "OrderedDict[str, Any]" = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+def index_key(vectorizer: CountVectorizer, text_chunks: Sequence[str], k1: float, b: float) -> str:
+    digest = params_digest(vectorizer, float(k1), float(b))
+    # the corpus is hashed once per text_chunks object, so repeat queries don't pay for it
+    digest.update(chunks_digest(text_chunks).encode())
+    return digest.hexdigest()
+
+def bm25_index(vectorizer: CountVectorizer, text_chunks: Sequence[str], k1: float, b: float, index_key: str,
+               index_cache_size: int = 4) -> Any:
+    with _index_cache_lock:
+        if index_key in _index_cache:
+            _index_cache.move_to_end(index_key)
+            return _index_cache[index_key]
+
+    fitted = clone(vectorizer)
+    index = (fitted, BM25Index(fitted.fit_transform(text_chunks), k1=k1, b=b))
+
+    with _index_cache_lock:
+        _index_cache[index_key] = index
+        while len(_index_cache) > max(int(index_cache_size), 1):
+            _index_cache.popitem(last=False)
+    return index
+
+def top_k_indices(bm25_index: Any, query: str, top_k: int) -> List[int]:
+    fitted, index = bm25_index
+    return index.top_k(fitted.transform([query]), top_k).tolist()
+
+def top_k_chunks(text_chunks: Sequence[str], top_k_indices: List[int]) -> List[str]:
+    return [text_chunks[i] for i in top_k_indices]
+
+def batch_top_k_indices(bm25_index: Any, queries: List[str], top_k: int) -> List[List[int]]:
+    # every query only touches the postings of its own terms, so there is nothing to share across the batch
+    fitted, index = bm25_index
+    query_terms = fitted.transform(queries)
+    return [index.top_k(query_terms[i], top_k).tolist() for i in range(query_terms.shape[0])]
+
+def batch_top_k_chunks(text_chunks: Sequence[str], batch_top_k_indices: List[List[int]]) -> List[List[str]]:
+    return [[text_chunks[i] for i in indices] for indices in batch_top_k_indices]
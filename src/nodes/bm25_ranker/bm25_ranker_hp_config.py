@@ -0,0 +1,16 @@
+def hp_config(hp: HP):
+    from sklearn.feature_extraction.text import CountVectorizer
+    top_k = hp.number_input(20)
+    ngram_range = hp.select({'unigram': (1, 1), 'bigram': (1, 2)}, default='unigram')
+    vectorizer = CountVectorizer(ngram_range=ngram_range, lowercase=True)
+    k1 = hp.number_input(1.5)
+    b = hp.number_input(0.75)
+    index_cache_size = hp.number_input(4)
+    from hamilton.driver import Builder
+    adapters = []
+    if hp.select([False, True], name='use_result_cache', default=False):
+        from src.result_cache import ResultCacheAdapter
+        result_cache_dir = hp.text_input('.cache/hypernodes')
+        result_cache_max_mb = hp.number_input(1024)
+        adapters.append(ResultCacheAdapter(result_cache_dir, max_size_mb=result_cache_max_mb, nodes=['bm25_index']))
+    builder = Builder().with_adapters(*adapters)
\ No newline at end of file
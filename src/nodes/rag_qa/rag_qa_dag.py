@@ -1,56 +1,72 @@
-
 from src.hypernodes import HyperNode
-from litellm import completion
-import litellm
-from typing import List
-import os
-
-litellm.enable_cache()
-
-import os
-from typing import List
-import streamlit as st
-
-def texts(texts_path: str) -> List[str]:
-    text_files = [f for f in os.listdir(texts_path) if f.endswith('.txt')]
-    texts = []
-    for file in text_files:
-        full_path = os.path.join(texts_path, file)
-        try:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                lines = []
-                for line in f:
-                    try:
-                        lines.append(line)
-                    except UnicodeDecodeError:
-                        st.warning(f"Skipped a line in file {file} due to encoding issues.")
-                texts.append(''.join(lines))
-        except Exception as e:
-            st.error(f"Error reading file {file}: {str(e)}")
-    return texts
-
-def text_chunks(texts: List[str], chunker: str) -> List[str]:
-    if chunker == "paragraph":
-        return [chunk for text in texts for chunk in text.split("\n\n")]
-    return texts
-
-def top_k_chunks(ranker: HyperNode, text_chunks: List[str], query: str) -> List[str]:
-    inputs = ranker._instantiated_inputs
-    inputs.update({"text_chunks" : text_chunks, "query" : query})
+from typing import List, Optional
+from collections.abc import Callable, Sequence
+from src.corpus import Corpus, load_corpus
+from src.chunking import get_chunker
+from src.context_builder import build_context, get_token_counter
+from src.llm_cache import LLMResponseCache, get_llm_cache
+
+def corpus(texts_path: str, loader_workers: int = 8) -> Corpus:
+    # only files added or changed since the last call are re-read, in parallel; the same corpus
+    # (one buffer) is returned until the folder changes
+    return load_corpus(texts_path, max_workers=loader_workers)
+
+def text_chunks(corpus: Corpus, chunker: str, max_chunk_chars: int = 2000, chunk_overlap: int = 200,
+                semantic_threshold: float = 0.1) -> Sequence[str]:
+    # chunkers yield spans document by document over the corpus buffer, once per corpus version and
+    # chunker; rankers index into it and only the returned chunks become strings
+    spans = get_chunker(chunker, max_chars=max_chunk_chars, overlap=chunk_overlap,
+                        semantic_threshold=semantic_threshold)
+    return corpus.chunks((chunker, max_chunk_chars, chunk_overlap, semantic_threshold), spans)
+
+def top_k_chunks(ranker: HyperNode, text_chunks: Sequence[str], query: str) -> List[str]:
+    inputs = {"text_chunks" : text_chunks, "query" : query}
     res = ranker.execute(final_vars=["top_k_chunks"], inputs=inputs)
     return res["top_k_chunks"]
 
-def query_with_context(query: str, top_k_chunks: List[str]) -> str:
+def batch_top_k_chunks(ranker: HyperNode, text_chunks: Sequence[str], queries: List[str]) -> List[List[str]]:
+    inputs = {"text_chunks" : text_chunks, "queries" : queries}
+    res = ranker.execute(final_vars=["batch_top_k_chunks"], inputs=inputs)
+    return res["batch_top_k_chunks"]
+
+def context_chunks(top_k_chunks: List[str], llm_model: str, context_token_budget: int,
+                   context_dedup_threshold: Optional[float] = None) -> List[str]:
+    # in rank order, as many chunks as fit the model's budget; token counts are cached per chunk
+    return build_context(top_k_chunks, context_token_budget, get_token_counter(llm_model),
+                         separator=", ", dedup_threshold=context_dedup_threshold)
+
+def query_with_context(query: str, context_chunks: List[str]) -> str:
     return (
         "Here's the user query: \n"
         + query
         + "\n and here are the top k chunks: \n"
-        + ", ".join(top_k_chunks)
+        + ", ".join(context_chunks)
     )
 
-def llm_response(query_with_context: str, llm_model: str, llm_config: dict, system_prompt: str) -> str:
+def llm_cache(llm_cache_path: str = "", llm_cache_ttl_hours: float = 0,
+              llm_cache_max_entries: int = 100_000) -> Optional[LLMResponseCache]:
+    if not llm_cache_path:
+        return None
+    return get_llm_cache(llm_cache_path, ttl_seconds=llm_cache_ttl_hours * 3600, max_entries=llm_cache_max_entries)
+
+def llm_response(query_with_context: str, llm_model: str, llm_config: dict, system_prompt: str,
+                 llm_cache: Optional[LLMResponseCache], completion_fn: Optional[Callable] = None) -> str:
+    # litellm's completion by default; imported here as it takes seconds to import
     messages=[{"role": "system", "content": system_prompt},
               {"role": "user", "content": query_with_context}]
-    return completion(model=llm_model,
-                      messages=messages,
-                      **llm_config).choices[0].message.content
+    if llm_cache is not None:
+        # responses of other completion functions (e.g. test stubs) are kept apart from litellm's
+        namespace = "" if completion_fn is None else \
+            f"{getattr(completion_fn, '__module__', '')}.{getattr(completion_fn, '__qualname__', type(completion_fn).__qualname__)}"
+        key = llm_cache.make_key(llm_model, messages, llm_config, namespace=namespace)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+    if completion_fn is None:
+        from litellm import completion as completion_fn
+    response = completion_fn(model=llm_model,
+                             messages=messages,
+                             **llm_config).choices[0].message.content
+    if llm_cache is not None and response is not None:
+        llm_cache.set(key, response)
+    return response
@@ -1,12 +1,30 @@
 def hp_config(hp: HP):
-    chunker = hp.select(['paragraph', 'semantic', 'text'], default='paragraph')
-    ranker_type = hp.select(['sklearn_ranker'], default='sklearn_ranker')
+    chunker = hp.select(['paragraph', 'semantic', 'sentence', 'text'], default='paragraph')
+    max_chunk_chars = hp.number_input(2000)
+    chunk_overlap = hp.number_input(200)
+    ranker_type = hp.select(['sklearn_ranker', 'bm25_ranker'], default='sklearn_ranker')
     llm_model = hp.select({'mini': 'gpt-4o-mini', 'haiku': 'claude-3-haiku-20240307', 'sonnet': 'claude-3-5-sonnet-20240620'}, default='mini')
     llm_config = {'temperature': hp.number_input(0), 'max_tokens': hp.number_input(64)}
+    context_token_budgets = {'gpt-4o-mini': 4000, 'claude-3-haiku-20240307': 4000, 'claude-3-5-sonnet-20240620': 8000}
+    context_token_budget = hp.number_input(context_token_budgets.get(llm_model, 4000))
+    if hp.select([False, True], name='dedup_context', default=False):
+        context_dedup_threshold = hp.number_input(0.9)
     system_prompt = hp.text_input('Answer with one word only')
+    if hp.select([False, True], name='use_llm_cache', default=False):
+        llm_cache_path = hp.text_input('.cache/llm_cache.sqlite')
+        llm_cache_ttl_hours = hp.number_input(168.0)
+        llm_cache_max_entries = hp.number_input(100000)
     texts_path = hp.text_input('data/raw')
     query = hp.text_input("what's the document about?")
     from src.hypernodes import HyperNode
     base_path = 'src/nodes'
     ranker = HyperNode.load(f'{base_path}/{ranker_type}')
-    ranker._instantiated_inputs = hp.propagate(ranker.hp_config, 'ranker')
\ No newline at end of file
+    ranker._instantiated_inputs = hp.propagate(ranker.hp_config, 'ranker')
+    from hamilton.driver import Builder
+    adapters = []
+    if hp.select([False, True], name='use_result_cache', default=False):
+        from src.result_cache import ResultCacheAdapter
+        result_cache_dir = hp.text_input('.cache/hypernodes')
+        result_cache_max_mb = hp.number_input(1024)
+        adapters.append(ResultCacheAdapter(result_cache_dir, max_size_mb=result_cache_max_mb, nodes=['text_chunks', 'top_k_chunks', 'batch_top_k_chunks']))
+    builder = Builder().with_adapters(*adapters)
\ No newline at end of file
@@ -1,23 +1,122 @@
 
-from typing import List, Callable, Any, Union
+from typing import List, Any, Tuple
+from collections.abc import Sequence
+from collections import OrderedDict
+import os
+import threading
+from sklearn.base import clone
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 import numpy as np
 
-def fitted_vectorizer(vectorizer: TfidfVectorizer, text_chunks: List[str]) -> TfidfVectorizer:
-    return vectorizer.fit(text_chunks)
+from src.chunk_store import chunks_digest
+from src.fingerprinting import params_digest
+from src.incremental_index import IncrementalTfidfIndex
+from src.index_store import load_tfidf_index, save_tfidf_index
 
-def vectorized_texts(fitted_vectorizer: TfidfVectorizer, text_chunks: List[str]) -> Any:
-    return fitted_vectorizer.transform(text_chunks)
+# fitted (vectorizer, vectorized_texts, chunks) triples, keyed by index_key, least recently used first
+_index_cache: "OrderedDict[str, Tuple[Any, Any, Sequence[str]]]" = OrderedDict()
+# incremental indexes, keyed by vectorizer params; they follow the corpus instead of being keyed by it
+_incremental_indexes: "OrderedDict[str, IncrementalTfidfIndex]" = OrderedDict()
+_index_cache_lock = threading.Lock()
 
-def vectorized_query(fitted_vectorizer: TfidfVectorizer, query: str) -> Any:
-    return fitted_vectorizer.transform([query])
+def index_key(vectorizer: TfidfVectorizer, text_chunks: Sequence[str]) -> str:
+    # the corpus is hashed once per text_chunks object, so repeat queries don't pay for it
+    digest = params_digest(vectorizer)
+    digest.update(chunks_digest(text_chunks).encode())
+    return digest.hexdigest()
+
+def fitted_index(vectorizer: TfidfVectorizer, text_chunks: Sequence[str], index_key: str, index_mode: str = "full",
+                 index_cache_size: int = 4, index_max_drift: float = 0.5, index_dir: str = "") -> Tuple[Any, Any, Sequence[str]]:
+    if index_mode == "incremental":
+        return _incremental_fitted_index(vectorizer, text_chunks, index_key, index_cache_size, index_max_drift)
+
+    with _index_cache_lock:
+        if index_key in _index_cache:
+            _index_cache.move_to_end(index_key)
+            return _index_cache[index_key]
+
+    index = None
+    if index_dir:
+        index_path = os.path.join(index_dir, index_key)
+        index = load_tfidf_index(index_path, vectorizer)
+    if index is None:
+        fitted = clone(vectorizer).fit(text_chunks)
+        index = (fitted, normalize(fitted.transform(text_chunks)), text_chunks)
+        if index_dir:
+            save_tfidf_index(index_path, *index)
+            # serve the mapped copy, so this process shares the page cache with the other workers
+            index = load_tfidf_index(index_path, vectorizer) or index
+
+    with _index_cache_lock:
+        _index_cache[index_key] = index
+        while len(_index_cache) > max(int(index_cache_size), 1):
+            _index_cache.popitem(last=False)
+    return index
+
+def _incremental_fitted_index(vectorizer: TfidfVectorizer, text_chunks: Sequence[str], index_key: str,
+                              index_cache_size: int, index_max_drift: float) -> Tuple[Any, Any, Sequence[str]]:
+    params_key = params_digest(vectorizer).hexdigest()
+    with _index_cache_lock:
+        index = _incremental_indexes.get(params_key)
+        if index is None:
+            index = _incremental_indexes[params_key] = IncrementalTfidfIndex(clone(vectorizer))
+        _incremental_indexes.move_to_end(params_key)
+        while len(_incremental_indexes) > max(int(index_cache_size), 1):
+            _incremental_indexes.popitem(last=False)
+
+    with index.lock:
+        if index.corpus_key != index_key:
+            # only chunks that appeared since the last sync are tokenized, vanished ones are dropped
+            index.sync_chunks(text_chunks)
+            if index.drift > index_max_drift:
+                index.compact()
+            index.corpus_key = index_key
+        vectorized, chunks, transformer = index.snapshot()
+    return transformer, vectorized, chunks
+
+def fitted_vectorizer(fitted_index: Tuple[Any, Any, Sequence[str]]) -> Any:
+    return fitted_index[0]
+
+def vectorized_texts(fitted_index: Tuple[Any, Any, Sequence[str]]) -> Any:
+    return fitted_index[1]
+
+def indexed_chunks(fitted_index: Tuple[Any, Any, Sequence[str]]) -> Sequence[str]:
+    # row order of vectorized_texts; the incremental index keeps its own (deduplicated) order
+    return fitted_index[2]
+
+def vectorized_query(fitted_vectorizer: Any, query: str) -> Any:
+    return normalize(fitted_vectorizer.transform([query]))
 
 def similarities(vectorized_query: Any, vectorized_texts: Any) -> Any:
-    cosine_similarities = cosine_similarity(vectorized_query, vectorized_texts)
-    return cosine_similarities
+    # both sides are L2-normalized, so the dot product is the cosine similarity; the product stays
+    # sparse until the one column of scores is densified
+    cosine_similarities = (vectorized_texts @ vectorized_query.T).toarray().ravel()
+    return cosine_similarities[np.newaxis, :]
+
+def top_k_chunks(indexed_chunks: Sequence[str], similarities: Any, top_k: int) -> List[str]:
+    top_k_indices = _top_k_indices(similarities, top_k)[0]
+    return [indexed_chunks[i] for i in top_k_indices]
+
+def vectorized_queries(fitted_vectorizer: Any, queries: List[str]) -> Any:
+    return normalize(fitted_vectorizer.transform(queries))
+
+def batch_top_k_chunks(indexed_chunks: Sequence[str], vectorized_queries: Any, vectorized_texts: Any, top_k: int,
+                       batch_block_size: int = 256) -> List[List[str]]:
+    # scored one block of queries at a time, so at most batch_block_size x n_chunks scores (sparse
+    # or dense) exist at once, however many queries there are
+    results = []
+    for start in range(0, vectorized_queries.shape[0], batch_block_size):
+        block = (vectorized_texts @ vectorized_queries[start:start + batch_block_size].T).T.toarray()
+        for top_k_indices in _top_k_indices(block, top_k):
+            results.append([indexed_chunks[i] for i in top_k_indices])
+    return results
 
-def top_k_chunks(text_chunks: List[str], similarities: Any, top_k: int) -> List[str]:
-    sorted_indices = np.argsort(similarities[0])[::-1]
-    top_k_indices = sorted_indices[:top_k]
-    return [text_chunks[i] for i in top_k_indices] 
+def _top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    scores = np.asarray(scores)
+    k = min(int(top_k), scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=int)
+    partitioned = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, partitioned, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(partitioned, order, axis=1)
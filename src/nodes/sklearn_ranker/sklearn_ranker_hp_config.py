@@ -3,4 +3,16 @@ def hp_config(hp: HP):
     top_k = hp.number_input(20)
     ngram_range = hp.select({'basic': (1, 3), 'expanded': (3, 8)}, default='basic')
     analyzer = hp.select(['word', 'char'], default='word')
-    vectorizer = TfidfVectorizer(ngram_range=ngram_range, analyzer=analyzer, lowercase=True)
\ No newline at end of file
+    vectorizer = TfidfVectorizer(ngram_range=ngram_range, analyzer=analyzer, lowercase=True)
+    index_mode = hp.select(['full', 'incremental'], default='full')
+    index_cache_size = hp.number_input(4)
+    if hp.select([False, True], name='persist_index', default=False):
+        index_dir = hp.text_input('.cache/indexes')
+    from hamilton.driver import Builder
+    adapters = []
+    if hp.select([False, True], name='use_result_cache', default=False):
+        from src.result_cache import ResultCacheAdapter
+        result_cache_dir = hp.text_input('.cache/hypernodes')
+        result_cache_max_mb = hp.number_input(1024)
+        adapters.append(ResultCacheAdapter(result_cache_dir, max_size_mb=result_cache_max_mb, nodes=['fitted_index']))
+    builder = Builder().with_adapters(*adapters)
\ No newline at end of file
@@ -0,0 +1,174 @@
+import json
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+# the report being filled in, and the path of the node/HyperNode currently running,
+# e.g. "batch_qa.llm_responses/rag_qa.llm_response"
+_active_report: ContextVar[Optional["ProfileReport"]] = ContextVar("hypernodes_profile_report", default=None)
+_current_path: ContextVar[str] = ContextVar("hypernodes_profile_path", default="")
+
+
+class ProfileReport:
+    def __init__(self, track_memory: bool = False):
+        self.track_memory = track_memory
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self.wall_time = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, path: str, seconds: float, memory_delta: Optional[int] = None) -> None:
+        with self._lock:
+            stats = self.stats.setdefault(path, {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["calls"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            if memory_delta is not None:
+                stats["peak_memory_delta_bytes"] = max(stats.get("peak_memory_delta_bytes", 0), memory_delta)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"wall_time_seconds": self.wall_time,
+                    "nodes": {path: dict(stats) for path, stats in self.stats.items()}}
+
+    def to_json(self, path: Optional[str] = None, indent: int = 2) -> str:
+        dumped = json.dumps(self.to_dict(), indent=indent)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(dumped)
+        return dumped
+
+    def to_metrics(self, prefix: str = "profile") -> Dict[str, float]:
+        metrics = {f"{prefix}/wall_time_seconds": self.wall_time}
+        for path, stats in self.to_dict()["nodes"].items():
+            for name, value in stats.items():
+                metrics[f"{prefix}/{path}/{name}"] = float(value)
+        return metrics
+
+    def log_to_mlflow(self, run_id: Optional[str] = None, prefix: str = "profile") -> None:
+        import mlflow
+
+        metrics = self.to_metrics(prefix)
+        if run_id is None:
+            mlflow.log_metrics(metrics)
+        else:
+            client = mlflow.MlflowClient()
+            for key, value in metrics.items():
+                client.log_metric(run_id, key, value)
+
+    def slowest(self, n: int = 10) -> List[tuple]:
+        stats = self.to_dict()["nodes"]
+        return sorted(((p, s["total_seconds"]) for p, s in stats.items()), key=lambda x: -x[1])[:n]
+
+
+@contextmanager
+def profiling(track_memory: bool = False, sample_rate: float = 1.0) -> Iterator[Optional[ProfileReport]]:
+    """Profiles every HyperNode executed inside the block, including nested ones.
+
+    Yields None when this block isn't sampled, so it can stay on in production with a low `sample_rate`.
+    """
+    if _active_report.get() is not None or random.random() >= sample_rate:
+        yield None
+        return
+
+    report = ProfileReport(track_memory=track_memory)
+    started_tracing = track_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    report_token = _active_report.set(report)
+    path_token = _current_path.set("")
+    start = time.perf_counter()
+    try:
+        yield report
+    finally:
+        report.wall_time = time.perf_counter() - start
+        _current_path.reset(path_token)
+        _active_report.reset(report_token)
+        if started_tracing:
+            tracemalloc.stop()
+
+
+class _Frame:
+    __slots__ = ("report", "path", "path_token", "start", "memory_start", "memory_peak")
+
+    def __init__(self, report: ProfileReport, path: str):
+        self.report = report
+        self.path = path
+        self.path_token = _current_path.set(path)
+        self.memory_start = self.memory_peak = 0
+        if report.track_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            parent = _frames()[-1] if _frames() else None
+            if parent is not None:
+                parent.memory_peak = max(parent.memory_peak, peak)
+            tracemalloc.reset_peak()
+            self.memory_start = self.memory_peak = current
+        self.start = time.perf_counter()
+
+    def close(self) -> None:
+        seconds = time.perf_counter() - self.start
+        memory_delta = None
+        if self.report.track_memory and tracemalloc.is_tracing():
+            self.memory_peak = max(self.memory_peak, tracemalloc.get_traced_memory()[1])
+            memory_delta = self.memory_peak - self.memory_start
+        _current_path.reset(self.path_token)
+        self.report.record(self.path, seconds, memory_delta)
+        frames = _frames()
+        if len(frames) > 1:
+            frames[-2].memory_peak = max(frames[-2].memory_peak, self.memory_peak)
+
+
+_thread_state = threading.local()
+
+
+def _frames() -> List[_Frame]:
+    frames = getattr(_thread_state, "frames", None)
+    if frames is None:
+        frames = _thread_state.frames = []
+    return frames
+
+
+def _push(segment: str, separator: str) -> bool:
+    report = _active_report.get()
+    if report is None:
+        return False
+    parent = _current_path.get()
+    path = f"{parent}{separator}{segment}" if parent else segment
+    _frames().append(_Frame(report, path))
+    return True
+
+
+def _pop() -> None:
+    frames = _frames()
+    if frames:
+        frames[-1].close()
+        frames.pop()
+
+
+@contextmanager
+def hypernode_scope(name: str) -> Iterator[None]:
+    """Records one HyperNode execution; its nodes are recorded underneath it."""
+    pushed = _push(name, "/")
+    try:
+        yield
+    finally:
+        if pushed:
+            _pop()
+
+
+def active_report() -> Optional[ProfileReport]:
+    return _active_report.get()
+
+
+def node_started(node_name: str) -> None:
+    """Starts timing a node of the HyperNode executing; called by the HyperNode drivers' hook."""
+    _push(node_name, ".")
+
+
+def node_finished(node_name: str) -> None:
+    frames = _frames()
+    if frames and frames[-1].path.endswith(f".{node_name}"):
+        _pop()
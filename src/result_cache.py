@@ -0,0 +1,157 @@
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from hamilton.lifecycle import NodeExecutionMethod
+
+from src.fingerprinting import fingerprint
+
+
+class ResultCacheAdapter(NodeExecutionMethod):
+    """Disk-backed memoization of node results, keyed by node source and input fingerprints.
+
+    Attach it through the builder an hp_config returns. Only the nodes listed in `nodes` are
+    cached (all nodes if None); entries are evicted least-recently-used first once the cache
+    directory grows past `max_size_mb`. The last `memory_size` results read or written are also kept
+    in memory, so repeated hits return the same object instead of unpickling a copy each time (which
+    would also defeat the per-object caches downstream, e.g. chunks_digest).
+    """
+
+    def __init__(self, cache_dir: str = ".cache/hypernodes", max_size_mb: float = 1024,
+                 nodes: Optional[List[str]] = None, memory_size: int = 8):
+        self.cache_dir = str(cache_dir)
+        self.max_size_mb = max_size_mb
+        self.nodes = list(nodes) if nodes is not None else None
+        self.memory_size = memory_size
+        self._source_hashes: Dict[Any, str] = {}
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run_to_execute_node(self, *, node_name: str, node_tags: Dict[str, Any], node_callable: Any,
+                            node_kwargs: Dict[str, Any], task_id: Optional[str], **future_kwargs: Any) -> Any:
+        if self.nodes is not None and node_name not in self.nodes:
+            return node_callable(**node_kwargs)
+
+        key = self.cache_key(node_name, node_callable, node_kwargs)
+        if key is None:
+            return node_callable(**node_kwargs)
+
+        hit, value = self._read(key)
+        if hit:
+            logging.debug(f"Result cache hit for {node_name}")
+            return value
+
+        value = node_callable(**node_kwargs)
+        self._write(key, value)
+        return value
+
+    def cache_key(self, node_name: str, node_callable: Any, node_kwargs: Dict[str, Any]) -> Optional[str]:
+        source_hash = self._source_hash(node_callable)
+        inputs_hash = fingerprint(node_kwargs)
+        if source_hash is None or inputs_hash is None:
+            logging.debug(f"Result cache skipped for {node_name}: inputs can't be fingerprinted")
+            return None
+        return hashlib.sha256(f"{node_name}:{source_hash}:{inputs_hash}".encode()).hexdigest()
+
+    def _source_hash(self, node_callable: Any) -> Optional[str]:
+        with self._lock:
+            if node_callable in self._source_hashes:
+                return self._source_hashes[node_callable]
+        try:
+            source = inspect.getsource(node_callable)
+        except (OSError, TypeError):
+            return None
+        source_hash = hashlib.sha256(source.encode()).hexdigest()
+        with self._lock:
+            self._source_hashes[node_callable] = source_hash
+        return source_hash
+
+    def _path(self, key: str) -> Path:
+        return Path(self.cache_dir) / f"{key}.pkl"
+
+    def _remember(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > max(int(self.memory_size), 0):
+                self._memory.popitem(last=False)
+
+    def _read(self, key: str) -> Tuple[bool, Any]:
+        path = self._path(key)
+        with self._lock:
+            hit = key in self._memory
+            if hit:
+                self._memory.move_to_end(key)
+                value = self._memory[key]
+        if not hit:
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+            except FileNotFoundError:
+                return False, None
+            except Exception as e:
+                logging.warning(f"Discarding unreadable result cache entry {path}: {e}")
+                path.unlink(missing_ok=True)
+                return False, None
+            self._remember(key, value)
+        # the mtime doubles as the last-access time for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True, value
+
+    def _write(self, key: str, value: Any) -> None:
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logging.debug(f"Result not cached, it can't be pickled: {e}")
+            return
+
+        self._remember(key, value)
+        max_bytes = self.max_size_mb * 1024 * 1024
+        if len(data) > max_bytes:
+            return
+
+        cache_dir = Path(self.cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # write-then-rename so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logging.warning(f"Failed to write result cache entry: {e}")
+            Path(tmp_path).unlink(missing_ok=True)
+            return
+        self._evict(max_bytes)
+
+    def _evict(self, max_bytes: float) -> None:
+        entries = []
+        for path in Path(self.cache_dir).glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        for path in Path(self.cache_dir).glob("*.pkl"):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,437 @@
+"""Hyperparameter sweeps over a HyperNode that compute each distinct upstream result once.
+
+While `sharing_results()` is active, every HyperNode execution (nested ones included) memoizes its
+intermediate results under the fingerprints of the inputs they actually depend on, so configs that
+only differ downstream of a node reuse its result instead of recomputing it.
+"""
+import ast
+import copy
+import functools
+import inspect
+import itertools
+import logging
+import pickle
+import textwrap
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Collection, Dict, FrozenSet, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from src.fingerprinting import fingerprint
+
+_active_results: ContextVar[Optional["SharedResults"]] = ContextVar("hypernodes_shared_results", default=None)
+# node name -> key, for the results the driver execution in progress should hand to `_active_results`
+_pending_results: ContextVar[Optional[Dict[str, str]]] = ContextVar("hypernodes_pending_results", default=None)
+
+_MISSING = "<missing>"
+# values hashed by content on every lookup rather than remembered by identity
+_PLAIN_TYPES = (str, bytes, int, float, bool, type(None), list, tuple, dict)
+# a node's sources: input or overridden node -> the outputs executed on it if it's a HyperNode (None: any)
+_Sources = Dict[str, Optional[FrozenSet[str]]]
+
+
+class SharedResults:
+    """Node results shared between HyperNode executions, least recently used evicted first.
+
+    A node's key is its HyperNode's source plus the fingerprints of the inputs and overridden nodes
+    upstream of it; a nested HyperNode its nodes only execute given outputs of (e.g. rag_qa's
+    retrieval) counts with just the inputs those outputs depend on. Only results worth sharing are
+    kept: requested outputs, and nodes feeding a node that depends on more inputs than they do (e.g.
+    an index reused across `top_k` values), except those named in `skip` as "<hypernode>.<node>"
+    (e.g. per-question results in a sweep where every config changes them). Non-plain values are
+    fingerprinted once by identity, so inputs mustn't be mutated in place.
+    """
+
+    def __init__(self, max_entries: int = 64, skip: Collection[str] = ()):
+        self.max_entries = max_entries
+        self.skip = frozenset(skip)
+        self.hits = 0
+        self.misses = 0
+        self._results: "OrderedDict[str, Any]" = OrderedDict()
+        self._fingerprints: "OrderedDict[Tuple[int, Optional[FrozenSet[str]]], Tuple[Any, Optional[str]]]" = \
+            OrderedDict()
+        self._graphs: Dict[Tuple[int, FrozenSet[str]], Tuple[Any, Dict[str, _Sources], set]] = {}
+        self._lock = threading.RLock()
+
+    def execute(self, node: Any, final_vars: List[Any], run_inputs: Mapping[str, Any],
+                overrides: Dict[str, Any]) -> Dict[str, Any]:
+        driver = node.driver
+        if not all(isinstance(var, str) for var in final_vars):
+            return driver.execute(final_vars=final_vars, inputs=run_inputs, overrides=overrides)
+
+        nodes = driver.graph.nodes
+        sources, boundary = self._graph(driver, overrides)
+        scope = f"{node.name}:{node.source_hash()}"
+        hits, to_store = {}, {}
+        stack, seen = list(final_vars), set()
+        while stack:
+            name = stack.pop()
+            if name in seen or name in overrides or name not in nodes or nodes[name].user_defined:
+                continue
+            seen.add(name)
+            key = self._key(scope, name, sources[name], run_inputs, overrides)
+            if key is not None:
+                with self._lock:
+                    if key in self._results:
+                        self._results.move_to_end(key)
+                        hits[name] = self._results[key]
+                        self.hits += 1
+                        continue
+                    self.misses += 1
+                if (name in final_vars or name in boundary) and f"{node.name}.{name}" not in self.skip:
+                    to_store[name] = key
+            stack.extend(dep.name for dep in nodes[name].dependencies)
+
+        if all(var in hits for var in final_vars):
+            return {var: hits[var] for var in final_vars}
+        # intermediate results are handed to `share_result` by the driver's hook as they're computed
+        token = _pending_results.set(to_store)
+        try:
+            return driver.execute(final_vars=final_vars, inputs=run_inputs, overrides={**overrides, **hits})
+        finally:
+            _pending_results.reset(token)
+
+    def store(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._results[key] = value
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def dump_results(self) -> Dict[str, bytes]:
+        """The results that pickle, pickled, e.g. to start worker processes from; see `load_results`."""
+        with self._lock:
+            results = list(self._results.items())
+        dumped = {}
+        for key, value in results:
+            try:
+                dumped[key] = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                continue
+        return dumped
+
+    def load_results(self, dumped: Mapping[str, bytes]) -> None:
+        for key, data in dumped.items():
+            self.store(key, pickle.loads(data))
+
+    def _graph(self, driver: Any, overrides: Mapping[str, Any]) -> Tuple[Dict[str, _Sources], set]:
+        """Per node, the inputs and overridden nodes it depends on (with the outputs executed on them, if
+        they're HyperNodes), and the nodes worth keeping."""
+        graph_key = (id(driver), frozenset(overrides))
+        with self._lock:
+            cached = self._graphs.get(graph_key)
+        if cached is not None and cached[0] is driver:
+            return cached[1], cached[2]
+
+        nodes = driver.graph.nodes
+        sources: Dict[str, _Sources] = {}
+
+        def sources_of(name: str) -> _Sources:
+            if name not in sources:
+                node = nodes[name]
+                if name in overrides or node.user_defined:
+                    sources[name] = {name: None}
+                    return sources[name]
+                merged: _Sources = {}
+                for dep in node.dependencies:
+                    if dep.name in overrides or dep.user_defined:
+                        dep_sources = {dep.name: _hypernode_outputs_used(node.callable, dep.name)}
+                    else:
+                        dep_sources = sources_of(dep.name)
+                    for source, outputs in dep_sources.items():
+                        known = merged.get(source, frozenset())
+                        merged[source] = None if outputs is None or known is None else known | outputs
+                sources[name] = merged
+            return sources[name]
+
+        for name in nodes:
+            sources_of(name)
+        boundary = {name for name, node in nodes.items()
+                    if any(sources[consumer.name].keys() > sources[name].keys() for consumer in node.depended_on_by)}
+        with self._lock:
+            self._graphs[graph_key] = (driver, sources, boundary)
+        return sources, boundary
+
+    def _key(self, scope: str, name: str, sources: _Sources, run_inputs: Mapping[str, Any],
+             overrides: Mapping[str, Any]) -> Optional[str]:
+        parts = [scope, name]
+        for source in sorted(sources):
+            value = overrides[source] if source in overrides else run_inputs.get(source, _MISSING)
+            value_fingerprint = self._fingerprint(value, sources[source])
+            if value_fingerprint is None:
+                return None
+            parts += [source, value_fingerprint]
+        return fingerprint(parts)
+
+    def _fingerprint(self, value: Any, outputs: Optional[FrozenSet[str]] = None) -> Optional[str]:
+        from src.hypernodes import HyperNode, get_upstream_inputs
+
+        if isinstance(value, _PLAIN_TYPES):
+            return fingerprint(value)
+        if not isinstance(value, HyperNode):
+            outputs = None
+        cache_key = (id(value), outputs)
+        with self._lock:
+            cached = self._fingerprints.get(cache_key)
+            if cached is not None and cached[0] is value:
+                self._fingerprints.move_to_end(cache_key)
+                return cached[1]
+        if outputs is None:
+            value_fingerprint = fingerprint(value)
+        else:
+            value.ensure_driver_initialized()
+            upstream = set().union(*(get_upstream_inputs(value.driver, output) for output in outputs))
+            inputs = value.instantiated_inputs or {}
+            value_fingerprint = fingerprint(["hypernode", value.name, value.source_hash(),
+                                             {name: inputs[name] for name in upstream if name in inputs}])
+        with self._lock:
+            # the value is kept alive with its fingerprint so its id can't be reused meanwhile
+            self._fingerprints[cache_key] = (value, value_fingerprint)
+            while len(self._fingerprints) > 1024:
+                self._fingerprints.popitem(last=False)
+        return value_fingerprint
+
+
+def share_result(node_name: str, result: Any) -> None:
+    """Keeps a node's result if the driver execution in progress was asked to; called by the HyperNode drivers' hook."""
+    pending = _pending_results.get()
+    if pending and node_name in pending:
+        shared = _active_results.get()
+        if shared is not None:
+            shared.store(pending[node_name], result)
+
+
+def active_shared_results() -> Optional[SharedResults]:
+    return _active_results.get()
+
+
+@contextmanager
+def sharing_results(max_entries: int = 64, skip: Collection[str] = (),
+                    shared: Optional[SharedResults] = None) -> Iterator[SharedResults]:
+    """Shares node results between all HyperNode executions inside the block.
+
+    Pass `shared` to keep using the results of earlier blocks, e.g. across reruns of an app.
+    """
+    if _active_results.get() is not None:
+        yield _active_results.get()
+        return
+    if shared is None:
+        shared = SharedResults(max_entries, skip)
+    token = _active_results.set(shared)
+    try:
+        yield shared
+    finally:
+        _active_results.reset(token)
+
+
+class SweepPlan(NamedTuple):
+    # swept parameters, the ones affecting the most nodes first; configs vary the last ones fastest
+    params: List[str]
+    configs: List[Dict[str, Any]]
+    # parameter -> the nodes it affects as "<hypernode>.<node>", e.g. "sklearn_ranker.fitted_index"
+    affected_nodes: Dict[str, List[str]]
+    # indexes into `configs`, one group per worker task
+    groups: List[List[int]]
+
+
+class SweepRun(NamedTuple):
+    config: Dict[str, Any]
+    results: Dict[str, Any]
+    seconds: float
+
+
+def plan_sweep(node: Any, grid: Mapping[str, Sequence[Any]], selections: Dict[str, Any] = {},
+               overrides: Dict[str, Any] = {}, max_workers: int = 1) -> SweepPlan:
+    """Works out which nodes each parameter of `grid` affects and orders the configs accordingly.
+
+    Parameters affecting more nodes vary slowest, so consecutive configs share as much upstream work
+    as possible; groups split the configs on those parameters, one group per worker process.
+    """
+    grid = {name: list(values) for name, values in grid.items()}
+    if not grid or any(not values for values in grid.values()):
+        raise ValueError("grid must map each parameter to a non-empty list of values")
+
+    base_config = {name: values[0] for name, values in grid.items()}
+    base_inputs = _instantiate(node, selections, {**overrides, **base_config})
+    affected = {}
+    for name, values in grid.items():
+        nodes = set()
+        for value in values[1:]:
+            other_inputs = _instantiate(node, selections, {**overrides, **base_config, name: value})
+            nodes |= _affected_nodes(node, base_inputs, other_inputs)
+        affected[name] = sorted(nodes)
+
+    params = sorted(grid, key=lambda name: -len(affected[name]))
+    configs = [dict(zip(params, values)) for values in itertools.product(*(grid[name] for name in params))]
+
+    groups = [list(range(len(configs)))]
+    for depth in range(1, len(params) + 1):
+        if len(groups) >= max_workers:
+            break
+        by_prefix: Dict[tuple, List[int]] = OrderedDict()
+        for i, config in enumerate(configs):
+            by_prefix.setdefault(tuple(repr(config[name]) for name in params[:depth]), []).append(i)
+        groups = list(by_prefix.values())
+    return SweepPlan(params, configs, affected, groups)
+
+
+def run_sweep(node: Any, grid: Mapping[str, Sequence[Any]], final_vars: List[str],
+              selections: Dict[str, Any] = {}, overrides: Dict[str, Any] = {},
+              inputs: Optional[Mapping[str, Any]] = None, max_workers: int = 1,
+              max_shared_results: int = 64) -> List[SweepRun]:
+    """Executes `final_vars` for every combination of `grid` (hp_config overrides), sharing upstream work.
+
+    With `max_workers` > 1 the config groups of the plan run in a process pool, each worker reloading
+    the node from its folder. The first config runs in this process beforehand, and every worker starts
+    from the results it shared, so work no grouping parameter changes (e.g. retrieval) is done once.
+    Each config is logged to MLflow by the node's own (Async)MLFlowTracker, if its hp_config adds one,
+    with the swept values as `sweep.<param>` run tags.
+    """
+    plan = plan_sweep(node, grid, selections, overrides, max_workers)
+    sweep_id = uuid.uuid4().hex[:12]
+    # results every swept parameter changes (e.g. per-question answers) are never shared, don't keep them
+    skip = set.intersection(*(set(nodes) for nodes in plan.affected_nodes.values()))
+    if max_workers <= 1 or len(plan.groups) <= 1:
+        return _run_configs(node, plan.configs, final_vars, selections, overrides, inputs, sweep_id,
+                            max_shared_results, skip)
+
+    runs: List[Optional[SweepRun]] = [None] * len(plan.configs)
+    folder = getattr(node, "_folder", None)
+    if folder is None:
+        raise ValueError("Sweeping across processes needs a node loaded with HyperNode.load")
+    first = plan.groups[0][0]
+    with sharing_results(max_shared_results, skip) as shared:
+        runs[first] = _run_configs(node, [plan.configs[first]], final_vars, selections, overrides, inputs,
+                                   sweep_id, max_shared_results, skip)[0]
+        dumped = shared.dump_results()
+    groups = [[i for i in group if i != first] for group in plan.groups]
+    groups = [group for group in groups if group]
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(groups))) as executor:
+        futures = [executor.submit(_run_group, folder, [plan.configs[i] for i in group], final_vars,
+                                   selections, overrides, inputs, sweep_id, max_shared_results, skip, dumped)
+                   for group in groups]
+        for group, future in zip(groups, futures):
+            for i, run in zip(group, future.result()):
+                runs[i] = run
+    return runs
+
+
+def _run_group(folder: str, configs: List[Dict[str, Any]], final_vars: List[str], selections: Dict[str, Any],
+               overrides: Dict[str, Any], inputs: Optional[Mapping[str, Any]], sweep_id: str,
+               max_shared_results: int, skip: Collection[str], dumped: Mapping[str, bytes]) -> List[SweepRun]:
+    from src.hypernodes import HyperNode
+
+    node = HyperNode.load(folder)
+    shared = SharedResults(max_shared_results, skip)
+    shared.load_results(dumped)
+    with sharing_results(shared=shared):
+        return _run_configs(node, configs, final_vars, selections, overrides, inputs, sweep_id,
+                            max_shared_results, skip)
+
+
+def _run_configs(node: Any, configs: List[Dict[str, Any]], final_vars: List[str], selections: Dict[str, Any],
+                 overrides: Dict[str, Any], inputs: Optional[Mapping[str, Any]], sweep_id: str,
+                 max_shared_results: int, skip: Collection[str]) -> List[SweepRun]:
+    runs = []
+    with sharing_results(max_shared_results, skip) as shared:
+        for config in configs:
+            config_node = copy.copy(node)
+            config_node._driver = None
+            config_node.instantiate_inputs(selections=selections, overrides={**overrides, **config})
+            _tag_trackers(config_node._instantiated_inputs, config, sweep_id)
+            start = time.perf_counter()
+            results = config_node.execute(final_vars=final_vars, inputs=inputs)
+            runs.append(SweepRun(config, dict(results), time.perf_counter() - start))
+            logging.info(f"Sweep {sweep_id}: {config} done in {runs[-1].seconds:.2f}s "
+                         f"(shared results: {shared.hits} hits, {shared.misses} misses)")
+    return runs
+
+
+def _instantiate(node: Any, selections: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    return node.hp_config(selections=selections, overrides=overrides, return_config_snapshot=False)
+
+
+def _affected_nodes(node: Any, inputs: Mapping[str, Any], other_inputs: Mapping[str, Any]) -> set:
+    from src.hypernodes import HyperNode, _all_equal, get_downstream_nodes
+
+    config_node = copy.copy(node)
+    config_node._instantiated_inputs = dict(inputs)
+    config_node._driver = None
+    config_node.ensure_driver_initialized()
+    nodes = config_node.driver.graph.nodes
+
+    affected, changed = set(), set()
+    for name in set(inputs) | set(other_inputs):
+        value, other = inputs.get(name, _MISSING), other_inputs.get(name, _MISSING)
+        value_fingerprint = fingerprint(value)
+        if value_fingerprint is not None and value_fingerprint == fingerprint(other):
+            continue
+        if value_fingerprint is None and _all_equal([value, other]):
+            continue
+        if isinstance(value, HyperNode) and isinstance(other, HyperNode) and value.name == other.name \
+                and name in nodes:
+            nested = _affected_nodes(value, value.instantiated_inputs or {}, other.instantiated_inputs or {})
+            affected |= nested
+            # a node only executing outputs of the nested node that don't change isn't affected itself
+            prefix = f"{value.name}."
+            nested_outputs = {nested_name[len(prefix):] for nested_name in nested if nested_name.startswith(prefix)}
+            for consumer in nodes[name].depended_on_by:
+                used = _hypernode_outputs_used(consumer.callable, name)
+                if used is None or used & nested_outputs:
+                    changed.add(consumer.name)
+            continue
+        changed.add(name)
+    changed_nodes = {name for name in changed if name in nodes and not nodes[name].user_defined}
+    affected |= {f"{node.name}.{consumer}"
+                 for consumer in changed_nodes | get_downstream_nodes(config_node.driver, changed)}
+    return affected
+
+
+@functools.lru_cache(maxsize=256)
+def _hypernode_outputs_used(func: Any, param: str) -> Optional[FrozenSet[str]]:
+    """The outputs `func` executes on the HyperNode passed as `param`, read from its source; None unless
+    `param` is only used as `param.execute(final_vars=[...])` with literal names."""
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(func)))
+    except (OSError, TypeError, SyntaxError):
+        return None
+    # the source of a wrapper (e.g. of a decorated node) tells nothing about how its arguments are used
+    function = tree.body[0] if tree.body else None
+    if not isinstance(function, ast.FunctionDef) \
+            or param not in [arg.arg for arg in function.args.args + function.args.kwonlyargs]:
+        return None
+    calls = {}
+    for call in ast.walk(tree):
+        if isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute) and call.func.attr == "execute" \
+                and isinstance(call.func.value, ast.Name) and call.func.value.id == param:
+            calls[id(call.func.value)] = call
+    used = set()
+    for name in ast.walk(tree):
+        if not isinstance(name, ast.Name) or name.id != param:
+            continue
+        call = calls.get(id(name))
+        if call is None:
+            return None
+        final_vars = next((kw.value for kw in call.keywords if kw.arg == "final_vars"),
+                          call.args[0] if call.args else None)
+        if not isinstance(final_vars, (ast.List, ast.Tuple)) \
+                or not all(isinstance(var, ast.Constant) and isinstance(var.value, str) for var in final_vars.elts):
+            return None
+        used |= {var.value for var in final_vars.elts}
+    return frozenset(used)
+
+
+def _tag_trackers(inputs: Dict[str, Any], config: Dict[str, Any], sweep_id: str) -> None:
+    try:
+        from hamilton.plugins.h_mlflow import MLFlowTracker
+        from src.mlflow_tracking import AsyncMLFlowTracker
+    except ImportError:
+        return
+    builder = inputs.get("builder")
+    for adapter in getattr(builder, "adapters", []):
+        if isinstance(adapter, (MLFlowTracker, AsyncMLFlowTracker)):
+            adapter.run_tags = {**(adapter.run_tags or {}), "hypernodes.sweep": sweep_id,
+                                **{f"sweep.{name}": str(value) for name, value in config.items()}}
@@ -0,0 +1,62 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("streamlit_flow")
+
+import src.app
+from src.app import execute_dirty_nodes
+from src.hypernodes import HyperNode
+from src.profiling import profiling
+
+ROOT = Path(__file__).resolve().parent.parent
+FINAL_VARS = ["text_chunks", "top_k_chunks", "context_chunks", "query_with_context", "llm_response"]
+
+
+def echo_completion(model: str, messages: list, **kwargs) -> SimpleNamespace:
+    content = f"{messages[0]['content']}: {messages[-1]['content']}"
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture
+def instantiate(tmp_path, monkeypatch):
+    # node folders in the hp configs are relative to the repository root
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setattr(src.app, "st", SimpleNamespace(session_state={}))
+    (tmp_path / "a.txt").write_text("alpha is the first letter.\n\nbeta is the second letter.\n")
+    node = HyperNode.load(str(ROOT / "src" / "nodes" / "rag_qa"))
+
+    def instantiate(**overrides) -> HyperNode:
+        node.instantiate_inputs(overrides={"texts_path": str(tmp_path), "query": "what is beta?", **overrides})
+        instantiated = node.with_inputs({"completion_fn": echo_completion})
+        instantiated.ensure_driver_initialized()
+        return instantiated
+
+    return instantiate
+
+
+def test_only_nodes_downstream_of_changed_inputs_are_recomputed(instantiate):
+    results, reused, recomputed = execute_dirty_nodes(instantiate(system_prompt="Be brief"), FINAL_VARS)
+    assert reused == [] and recomputed == FINAL_VARS
+    assert results["llm_response"].startswith("Be brief: ")
+
+    with profiling() as report:
+        results, reused, recomputed = execute_dirty_nodes(instantiate(system_prompt="Be precise"), FINAL_VARS)
+    assert recomputed == ["llm_response"]
+    assert sorted(reused) == sorted(FINAL_VARS[:-1])
+    assert results["llm_response"].startswith("Be precise: ")
+    executed = set(report.to_dict()["nodes"])
+    assert "rag_qa.llm_response" in executed
+    assert executed.isdisjoint(f"rag_qa.{name}" for name in ["corpus", *FINAL_VARS[:-1]])
+
+    # a changed chunk overlap invalidates everything from the chunks on
+    results, reused, recomputed = execute_dirty_nodes(instantiate(system_prompt="Be precise", chunk_overlap=0),
+                                                      FINAL_VARS)
+    assert reused == [] and recomputed == FINAL_VARS
+
+    # nothing changed: every result is reused
+    results, reused, recomputed = execute_dirty_nodes(instantiate(system_prompt="Be precise", chunk_overlap=0),
+                                                      FINAL_VARS)
+    assert sorted(reused) == sorted(FINAL_VARS) and recomputed == []
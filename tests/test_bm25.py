@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from src.bm25 import BM25Index
+
+
+def exhaustive_top_k(index: BM25Index, query_terms: sp.csr_matrix, top_k: int) -> np.ndarray:
+    impacts = sp.csc_matrix((index.impacts.astype(np.float64), index.doc_ids, index.indptr),
+                            shape=(index.n_docs, len(index.indptr) - 1))
+    scores = (impacts @ query_terms.T.astype(np.float64)).toarray().ravel()
+    # best first, ties by lower chunk id
+    return np.lexsort((np.arange(index.n_docs), -scores))[:top_k]
+
+
+def random_term_frequencies(rng: np.random.Generator, n_docs: int, n_terms: int) -> sp.csr_matrix:
+    tf = sp.random(n_docs, n_terms, density=rng.uniform(0.01, 0.2), format="csr", random_state=rng,
+                   data_rvs=lambda n: rng.integers(1, 4, n))
+    # duplicated chunks score exactly the same, so ties have to be broken by id
+    duplicates = rng.integers(0, n_docs, n_docs // 4)
+    return sp.vstack([tf, tf[duplicates]], format="csr")
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_top_k_matches_exhaustive_scoring(seed):
+    rng = np.random.default_rng(seed)
+    n_docs, n_terms = int(rng.integers(1, 300)), int(rng.integers(5, 200))
+    tf = random_term_frequencies(rng, n_docs, n_terms)
+    index = BM25Index(tf, k1=float(rng.uniform(0.5, 2.0)), b=float(rng.uniform(0, 1)))
+
+    queries = [tf[int(rng.integers(0, tf.shape[0]))],  # a chunk as the query: every term is known
+               sp.random(1, n_terms, density=0.05, format="csr", random_state=rng),
+               sp.csr_matrix((1, n_terms))]  # no known terms
+    for query in queries:
+        query = sp.csr_matrix(query)
+        for top_k in (1, 5, 20, tf.shape[0], tf.shape[0] + 10):
+            expected = exhaustive_top_k(index, query, top_k)
+            np.testing.assert_array_equal(index.top_k(query, top_k), expected)
+
+
+def test_queries_without_known_terms_return_the_first_chunks():
+    index = BM25Index(sp.csr_matrix(np.array([[1, 0], [0, 2], [1, 1]])))
+    np.testing.assert_array_equal(index.top_k(sp.csr_matrix((1, 2)), 2), [0, 1])
+    np.testing.assert_array_equal(index.top_k(sp.csr_matrix(np.array([[0, 1]])), 10), [1, 2, 0])
+    assert len(index.top_k(sp.csr_matrix(np.array([[0, 1]])), 0)) == 0
@@ -0,0 +1,56 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from src.capture import InputCapture, capturing
+from src.hypernodes import HyperNode
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def echo_completion(model: str, messages: list, **kwargs) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=messages[-1]["content"]))])
+
+
+@pytest.fixture
+def rag_qa(tmp_path, monkeypatch):
+    # node folders in the hp configs are relative to the repository root
+    monkeypatch.chdir(ROOT)
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "a.txt").write_text("alpha is the first letter.\n\nbeta is the second letter.\n")
+    node = HyperNode.load(str(ROOT / "src" / "nodes" / "rag_qa"))
+    node.instantiate_inputs(selections={"use_llm_cache": False}, overrides={"texts_path": str(corpus)})
+    return node
+
+
+def test_captured_inputs_replay_to_the_same_result(rag_qa, tmp_path):
+    queries = ["what is alpha?", "what is beta?"]
+    with capturing(["rag_qa.query_with_context", "similarities"], spill_dir=str(tmp_path / "spill"),
+                   spill_bytes=64) as capture:
+        responses = [rag_qa.execute(final_vars=["query_with_context"],
+                                    inputs={"query": query, "completion_fn": echo_completion})
+                     for query in queries]
+
+    # nested HyperNodes are captured under their own name
+    assert capture.names() == ["rag_qa.query_with_context", "sklearn_ranker.similarities"]
+    assert capture.count("similarities") == 2
+    first = capture.get("query_with_context", index=0)
+    assert first["query"] == queries[0]
+    # large values were spilled to disk and are read back on get
+    assert list((tmp_path / "spill").glob("*.pkl"))
+    assert rag_qa.replay("query_with_context", capture=capture) == responses[-1]["query_with_context"]
+    assert rag_qa.replay("query_with_context", capture=capture, index=0) == responses[0]["query_with_context"]
+
+    capture.save(str(tmp_path / "capture.pkl"))
+    loaded = InputCapture.load(str(tmp_path / "capture.pkl"))
+    assert loaded.get("rag_qa.query_with_context") == capture.get("rag_qa.query_with_context")
+
+
+def test_nodes_that_were_not_captured_run_their_upstream(rag_qa):
+    inputs = rag_qa.get_node_inputs("query_with_context")
+    assert set(inputs) >= {"query", "context_chunks"}
+    with capturing(["other_node"]) as capture:
+        rag_qa.execute(final_vars=["query_with_context"], inputs={"completion_fn": echo_completion})
+    assert capture.names() == []
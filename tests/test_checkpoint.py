@@ -0,0 +1,76 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from src.checkpoint import CheckpointLog
+from src.concurrency import RateLimiter
+from src.hypernodes import HyperNode
+
+ROOT = Path(__file__).resolve().parent.parent
+QUESTIONS = pd.Series([f"question {i}?" for i in range(6)])
+
+
+@pytest.fixture(autouse=True)
+def in_repository_root(monkeypatch):
+    # node folders in the hp configs are relative to the repository root
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture
+def batch_qa_dag():
+    return HyperNode.load(str(ROOT / "src" / "nodes" / "batch_qa")).dag_modules[0]
+
+
+@pytest.fixture
+def rag_qa(tmp_path):
+    (tmp_path / "a.txt").write_text("alpha")
+    node = HyperNode.load(str(ROOT / "src" / "nodes" / "rag_qa"))
+    node.instantiate_inputs(overrides={"texts_path": str(tmp_path)})
+    return node
+
+
+def answer_all(batch_qa_dag, rag_qa, top_k_chunks, checkpoint_log, fail_on=None):
+    answered = []
+
+    def completion(model: str, messages: list, **kwargs) -> SimpleNamespace:
+        question = messages[-1]["content"].split("\n")[1]
+        if question == fail_on:
+            raise ValueError("not a transient error")
+        answered.append(question)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer to {question}"))])
+
+    responses = batch_qa_dag.llm_responses(QUESTIONS, top_k_chunks, rag_qa.with_inputs({"completion_fn": completion}),
+                                           RateLimiter(), max_concurrency=1, max_retries=0, retry_backoff=0,
+                                           checkpoint_log=checkpoint_log)
+    return responses, answered
+
+
+def test_resumed_runs_skip_completed_rows(batch_qa_dag, rag_qa, tmp_path):
+    log = CheckpointLog(str(tmp_path / "checkpoints" / "run.jsonl"))
+    top_k_chunks = [["alpha"]] * len(QUESTIONS)
+    with pytest.raises(ValueError):
+        answer_all(batch_qa_dag, rag_qa, top_k_chunks, log, fail_on="question 3?")
+    assert sorted(log.load()) == [0, 1, 2]
+
+    responses, answered = answer_all(batch_qa_dag, rag_qa, top_k_chunks, log)
+    assert answered == ["question 3?", "question 4?", "question 5?"]
+    assert responses == [f"answer to {q}" for q in QUESTIONS]
+
+    # a row whose retrieved chunks changed is answered again
+    responses, answered = answer_all(batch_qa_dag, rag_qa, [["beta"]] + top_k_chunks[1:], log)
+    assert answered == ["question 0?"]
+    assert responses == [f"answer to {q}" for q in QUESTIONS]
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    log = CheckpointLog(str(tmp_path / "run.jsonl"))
+    log.append(0, "key0", "answer 0", 0.1)
+    log.append(1, "key1", "answer 1", 0.1)
+    with open(log.path, "a") as f:
+        f.write('{"index": 2, "key": "ke')
+    assert sorted(log.load()) == [0, 1]
+    log.append(2, "key2", "answer 2", 0.1)
+    assert log.load()[2]["response"] == "answer 2"
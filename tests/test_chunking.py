@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from src.chunking import CHUNKERS, get_chunker
+
+
+def random_document(seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(50)]
+    paragraphs = []
+    for _ in range(rng.randint(1, 8)):
+        sentences = [" ".join(rng.choices(words, k=rng.randint(1, 40))).capitalize() + rng.choice([".", "!", "?"])
+                     for _ in range(rng.randint(1, 10))]
+        paragraphs.append(" ".join(sentences))
+    # one run-on paragraph without any sentence end, longer than a chunk
+    paragraphs.insert(rng.randint(0, len(paragraphs)), " ".join(rng.choices(words, k=200)))
+    return "\n\n".join(paragraphs)
+
+
+@pytest.mark.parametrize("chunker", CHUNKERS)
+@pytest.mark.parametrize("seed", range(5))
+def test_chunks_are_bounded_ordered_and_cover_the_text(chunker, seed):
+    text = random_document(seed)
+    max_chars, overlap = 300, 60
+    spans = list(get_chunker(chunker, max_chars=max_chars, overlap=overlap)(text))
+
+    assert spans
+    assert all(0 <= start < end <= len(text) and end - start <= max_chars for start, end in spans)
+    # in document order, each chunk overlapping the previous one by at most `overlap` characters
+    for (prev_start, prev_end), (start, end) in zip(spans, spans[1:]):
+        assert prev_start < start and prev_end < end
+        assert prev_end - start <= overlap
+    # every word ends up in some chunk
+    covered = set()
+    for start, end in spans:
+        covered.update(range(start, end))
+    assert all(i in covered for i, c in enumerate(text) if not c.isspace())
+
+
+def test_paragraphs_are_split_on_blank_lines():
+    text = "first paragraph.\n\nsecond one\nwith a line break.\n\n\n\nthird."
+    chunks = [text[s:e] for s, e in get_chunker("paragraph")(text)]
+    assert chunks == text.split("\n\n")
+
+
+def test_long_units_are_windowed_at_whitespace_with_overlap():
+    text = " ".join(f"w{i:03d}" for i in range(100))  # 499 characters, no sentence ends
+    chunks = [text[s:e] for s, e in get_chunker("sentence", max_chars=100, overlap=20)(text)]
+    assert all(len(chunk) <= 100 and not chunk.startswith(" ") for chunk in chunks)
+    # windows are cut between words, and each one repeats the last words of the previous one
+    assert all(chunk.split() == [w for w in chunk.split() if len(w) == 4] for chunk in chunks)
+    for prev, chunk in zip(chunks, chunks[1:]):
+        repeated = chunk.split()[0]
+        assert repeated in prev.split()[-5:]
+    assert " ".join(dict.fromkeys(w for chunk in chunks for w in chunk.split())) == text
+
+
+def test_sentences_are_packed_whole():
+    sentences = [f"Sentence number {i} is here." for i in range(20)]
+    text = " ".join(sentences)
+    chunks = [text[s:e] for s, e in get_chunker("sentence", max_chars=90, overlap=30)(text)]
+    for chunk in chunks:
+        assert chunk.startswith("Sentence") and chunk.endswith("here.")
+        assert len(chunk) <= 90
+    # each chunk closed for size repeats its last sentence, which fits the overlap
+    for prev, chunk in zip(chunks, chunks[1:]):
+        assert prev.rsplit(". ", 1)[-1].rstrip(".") == chunk.split(". ", 1)[0].rstrip(".")
+
+
+def test_semantic_chunks_end_at_topic_shifts():
+    cats = " ".join(f"Cats purr, cats nap{i}." for i in range(6))
+    rockets = " ".join(f"Rockets launch, rockets orbit{i}." for i in range(6))
+    text = f"{cats} {rockets}"
+    # well under the size limit, but each topic fills a quarter of it
+    chunks = [text[s:e] for s, e in get_chunker("semantic", max_chars=400, overlap=0, semantic_window=2)(text)]
+    assert chunks == [cats, rockets]
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        get_chunker("paragraph", max_chars=0)
+    with pytest.raises(ValueError):
+        get_chunker("paragraph", max_chars=100, overlap=100)
+    with pytest.raises(ValueError):
+        get_chunker("unknown")
@@ -0,0 +1,96 @@
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import src.concurrency
+from src.concurrency import RateLimiter, call_with_retries, map_concurrently
+
+
+class StubCompletion:
+    """Answers with the prompt after a random delay, failing the first `failures` calls per prompt."""
+
+    def __init__(self, latency: float = 0.01, failures: int = 0, seed: int = 0):
+        self.latency = latency
+        self.failures = failures
+        self.rng = random.Random(seed)
+        self.attempts = {}
+        self.in_flight = self.max_in_flight = 0
+        self.started = []
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt: str) -> SimpleNamespace:
+        with self.lock:
+            self.attempts[prompt] = self.attempts.get(prompt, 0) + 1
+            attempt = self.attempts[prompt]
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.started.append(time.monotonic())
+            delay = self.rng.uniform(0, self.latency)
+        try:
+            time.sleep(delay)
+            if attempt <= self.failures:
+                raise ConnectionError(f"attempt {attempt} for {prompt!r} failed")
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=prompt))])
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def contents(responses: list) -> list:
+    return [r.choices[0].message.content for r in responses]
+
+
+def test_results_keep_the_order_of_items():
+    completion = StubCompletion(latency=0.02)
+    prompts = [f"prompt {i}" for i in range(64)]
+    assert contents(map_concurrently(completion, prompts, max_workers=8)) == prompts
+    assert 1 < completion.max_in_flight <= 8
+
+
+def test_transient_failures_are_retried_with_exponential_backoff(monkeypatch):
+    delays = []
+    monkeypatch.setattr(src.concurrency, "time", SimpleNamespace(sleep=delays.append, monotonic=time.monotonic))
+    completion = StubCompletion(latency=0, failures=2)
+    responses = map_concurrently(completion, ["a"], max_retries=3, backoff=0.5, retry_on=(ConnectionError,))
+    assert contents(responses) == ["a"]
+    assert completion.attempts == {"a": 3}
+    # backoff * 2**attempt, plus up to 100% jitter
+    assert len(delays) == 2
+    assert 0.5 <= delays[0] < 1.0 and 1.0 <= delays[1] < 2.0
+
+
+def test_retries_give_up_and_skip_errors_that_are_not_transient(monkeypatch):
+    monkeypatch.setattr(src.concurrency, "time", SimpleNamespace(sleep=lambda delay: None, monotonic=time.monotonic))
+    completion = StubCompletion(latency=0, failures=5)
+    with pytest.raises(ConnectionError):
+        call_with_retries(lambda: completion("a"), max_retries=2)
+    assert completion.attempts == {"a": 3}
+
+    with pytest.raises(ConnectionError):
+        call_with_retries(lambda: completion("b"), max_retries=2, retry_on=lambda e: not isinstance(e, ConnectionError))
+    assert completion.attempts["b"] == 1
+
+
+def test_rate_limiter_caps_requests_per_period():
+    period = 0.2
+    completion = StubCompletion(latency=0)
+    limiter = RateLimiter(requests_per_minute=3, period=period)
+    prompts = [f"prompt {i}" for i in range(9)]
+    assert contents(map_concurrently(completion, prompts, max_workers=9, rate_limiter=limiter)) == prompts
+    started = sorted(completion.started)
+    # no more than 3 calls start within any one period, so 9 calls span at least two full periods
+    assert all(later - earlier >= period * 0.9 for earlier, later in zip(started, started[3:]))
+    assert started[-1] - started[0] >= 2 * period * 0.9
+
+
+def test_rate_limiter_caps_tokens_per_period():
+    period = 0.2
+    completion = StubCompletion(latency=0)
+    limiter = RateLimiter(tokens_per_minute=100, period=period)
+    prompts = [f"prompt {i}" for i in range(4)]
+    map_concurrently(completion, prompts, max_workers=4, rate_limiter=limiter, cost=lambda prompt: 50)
+    started = sorted(completion.started)
+    assert all(later - earlier >= period * 0.9 for earlier, later in zip(started, started[2:]))
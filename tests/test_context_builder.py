@@ -0,0 +1,58 @@
+import pytest
+
+from src.context_builder import TokenCounter, build_context, get_token_counter
+
+
+class WordCounter:
+    """One token per word, so budgets are easy to reason about."""
+
+    def __init__(self):
+        self.counted = []
+
+    def count(self, text: str) -> int:
+        self.counted.append(text)
+        return len(text.split())
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        return " ".join(text.split()[:max_tokens])
+
+
+def test_chunks_are_picked_in_rank_order_within_the_budget():
+    chunks = ["one two three", "four five six seven eight", "nine", "ten eleven"]
+    # the separator costs a token between chunks: 3 + (1 + 1) + (1 + 2) = 8; the second chunk doesn't fit
+    assert build_context(chunks, 8, WordCounter(), separator=" |") == ["one two three", "nine", "ten eleven"]
+    assert build_context(chunks, 100, WordCounter(), separator=" |") == chunks
+    assert build_context(chunks, 3, WordCounter(), separator=" |") == ["one two three"]
+
+
+def test_a_top_chunk_over_the_budget_is_truncated():
+    assert build_context(["one two three four"], 2, WordCounter()) == ["one two"]
+    assert build_context(["one two three four"], 0, WordCounter()) == []
+    assert build_context([], 10, WordCounter()) == []
+
+
+def test_near_duplicates_are_dropped():
+    chunks = ["the cat sat on the mat", "The cat sat on the mat!", "a dog ran in the park"]
+    assert build_context(chunks, 100, WordCounter(), dedup_threshold=0.9) == [chunks[0], chunks[2]]
+    assert build_context(chunks, 100, WordCounter()) == chunks
+
+
+@pytest.mark.parametrize("model", ["gpt-4o-mini", "anthropic/claude-3-haiku"])
+def test_token_counts_respect_the_budget_and_are_cached(model):
+    counter = get_token_counter(model)
+    assert get_token_counter(model) is counter
+    chunks = [f"chunk {i} " + "word " * (i * 7 % 40) for i in range(30)]
+    picked = build_context(chunks, 200, counter)
+    assert sum(counter.count(chunk) for chunk in picked) + counter.count(", ") * (len(picked) - 1) <= 200
+    # picked chunks keep their rank order
+    assert picked == [chunk for chunk in chunks if chunk in picked]
+
+    hits = counter.hits
+    build_context(chunks, 200, counter)
+    assert counter.hits > hits
+
+
+def test_counter_falls_back_to_an_estimate_without_an_encoding():
+    counter = TokenCounter("no-such-encoding")
+    assert counter.count("abcdefgh") == 2
+    assert counter.truncate("abcdefghij", 2) == "abcdefgh"
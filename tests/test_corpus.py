@@ -0,0 +1,40 @@
+from src.chunking import get_chunker
+from src.corpus import CorpusLoader
+
+
+def test_corpus_is_rebuilt_only_when_files_change(tmp_path):
+    (tmp_path / "a.txt").write_text("alpha one\n\nalpha two")
+    (tmp_path / "b.txt").write_text("beta")
+    loader = CorpusLoader(str(tmp_path))
+    loader.refresh()
+    corpus = loader.corpus()
+    spans = get_chunker("paragraph")
+    chunks = corpus.chunks(("paragraph",), spans)
+    assert list(chunks) == ["alpha one", "alpha two", "beta"]
+    # chunks share the corpus buffer, and are built once per corpus version and chunker
+    assert chunks.buffer is corpus.buffer
+    assert corpus.chunks(("paragraph",), spans) is chunks
+
+    assert not loader.refresh()
+    assert loader.corpus() is corpus
+
+    (tmp_path / "b.txt").write_text("beta changed")
+    (tmp_path / "c.txt").write_text("gamma")
+    changes = loader.refresh()
+    assert changes.changed == [str(tmp_path / "b.txt")] and changes.added == [str(tmp_path / "c.txt")]
+    assert loader.texts() == ["alpha one\n\nalpha two", "beta changed", "gamma"]
+    assert list(loader.corpus().chunks(("paragraph",), spans)) == ["alpha one", "alpha two", "beta changed", "gamma"]
+    assert loader.corpus().digest != corpus.digest
+
+
+def test_corpus_pickles_without_its_chunkings(tmp_path):
+    import pickle
+
+    (tmp_path / "a.txt").write_text("alpha\n\nbeta")
+    loader = CorpusLoader(str(tmp_path))
+    loader.refresh()
+    corpus = loader.corpus()
+    corpus.chunks(("paragraph",), get_chunker("paragraph"))
+    copy = pickle.loads(pickle.dumps(corpus))
+    assert (copy.buffer, copy.paths, copy.bounds, copy.digest) == (corpus.buffer, corpus.paths, corpus.bounds, corpus.digest)
+    assert list(copy.chunks(("paragraph",), get_chunker("paragraph"))) == ["alpha", "beta"]
@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import pytest
+from hamilton.driver import Builder
+from hamilton.lifecycle import NodeExecutionHook
+
+from src.hypernodes import HyperNode
+
+RANKER_PATH = str(Path(__file__).resolve().parent.parent / "src" / "nodes" / "sklearn_ranker")
+
+
+def loaded_driver(use_cache: bool):
+    node = HyperNode.load(RANKER_PATH, use_cache=use_cache)
+    node.instantiate_inputs()
+    node.ensure_driver_initialized()
+    return node
+
+
+def test_cached_loads_share_a_driver():
+    a, b = loaded_driver(use_cache=True), loaded_driver(use_cache=True)
+    assert a.driver is b.driver
+
+
+def test_uncached_loads_get_their_own_driver_and_module_state():
+    a, b = loaded_driver(use_cache=False), loaded_driver(use_cache=False)
+    assert a.driver is not b.driver
+    assert a.dag_modules[0]._index_cache is not b.dag_modules[0]._index_cache
+
+
+@pytest.mark.parametrize("as_list", [False, True])
+def test_artifact_inputs_are_fingerprinted_once_per_object(tmp_path, monkeypatch, as_list):
+    import src.fingerprinting
+    from src.chunk_store import ChunkStore
+
+    chunks = ChunkStore.from_texts(["alpha beta\n\ngamma delta", "epsilon zeta"], lambda text: [(0, len(text))])
+    if as_list:
+        chunks = list(chunks)
+    node = loaded_driver(use_cache=True)
+    node.save(str(tmp_path / "ranker"), artifacts=["fitted_index"], inputs={"text_chunks": chunks, "query": "beta"})
+    saved = HyperNode.load(str(tmp_path / "ranker"))
+    saved.instantiate_inputs()
+    assert "fitted_index" in saved.artifacts
+    HyperNode.clear_cache()  # forgets the fingerprints taken by `save`
+
+    fingerprinted = []
+    fingerprint = src.fingerprinting.fingerprint
+    monkeypatch.setattr(src.fingerprinting, "fingerprint", lambda value: fingerprinted.append(value) or fingerprint(value))
+    for query in ["alpha", "gamma", "zeta"]:
+        res = saved.execute(final_vars=["top_k_chunks"], inputs={"text_chunks": chunks, "query": query})
+        assert query in res["top_k_chunks"][0]
+    assert sum(value is chunks for value in fingerprinted) == 1
+    # the index came with the bundle rather than being fitted
+    assert not saved.dag_modules[0]._index_cache
+
+
+class CountingHook(NodeExecutionHook):
+    def __init__(self, label: str):
+        self.label = label
+        self.calls = 0
+
+    def run_before_node_execution(self, **kwargs):
+        self.calls += 1
+
+    def run_after_node_execution(self, **kwargs):
+        pass
+
+
+def test_drivers_are_shared_per_adapter_instance():
+    first, second = CountingHook("hook"), CountingHook("hook")
+    node = HyperNode.load(RANKER_PATH)
+    node.instantiate_inputs()
+    a = node.with_inputs({"builder": Builder().with_adapters(first)})
+    b = node.with_inputs({"builder": Builder().with_adapters(second)})
+    c = node.with_inputs({"builder": Builder().with_adapters(first)})
+    for n in (a, b, c):
+        n.ensure_driver_initialized()
+    # equal state, but two adapters: each one is called by its own driver
+    assert a.driver is not b.driver
+    assert c.driver is a.driver
+
+    b.execute(final_vars=["top_k_chunks"], inputs={"text_chunks": ["alpha", "beta"], "query": "beta"})
+    assert first.calls == 0 and second.calls > 0
@@ -0,0 +1,61 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from src.hypernodes import HyperNode
+
+ROOT = Path(__file__).resolve().parent.parent
+N_THREADS = 32
+N_QUERIES = 512
+RANKERS = ["sklearn_ranker", "bm25_ranker"]
+
+
+def echo_completion(model: str, messages: list, **kwargs) -> SimpleNamespace:
+    """Answers with the prompt it was given, so a response tells which query produced it."""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=messages[-1]["content"]))])
+
+
+@pytest.fixture(params=RANKERS)
+def rag_qa(request, tmp_path, monkeypatch):
+    # node folders in the hp configs are relative to the repository root
+    monkeypatch.chdir(ROOT)
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for i in range(N_QUERIES):
+        (corpus / f"doc_{i:04d}.txt").write_text(f"Document {i} is about the keyword kw{i:04d}.\n\n"
+                                                 f"kw{i:04d} appears only in this document.\n")
+    node = HyperNode.load(str(ROOT / "src" / "nodes" / "rag_qa"))
+    node.instantiate_inputs(selections={"use_llm_cache": False, "ranker_type": request.param},
+                            overrides={"texts_path": str(corpus)})
+    return node
+
+
+def test_shared_hypernode_keeps_results_per_query(rag_qa):
+    queries = [f"what is kw{i:04d} about?" for i in range(N_QUERIES)]
+    instantiated = dict(rag_qa.instantiated_inputs)
+    start = threading.Barrier(N_THREADS)
+
+    def run(thread_index):
+        start.wait()
+        results = []
+        for query in queries[thread_index::N_THREADS]:
+            res = rag_qa.execute(final_vars=["llm_response", "top_k_chunks"],
+                                 inputs={"query": query, "completion_fn": echo_completion})
+            results.append((query, res))
+        return results
+
+    with ThreadPoolExecutor(max_workers=N_THREADS) as executor:
+        results = [r for thread_results in executor.map(run, range(N_THREADS)) for r in thread_results]
+
+    assert len(results) == N_QUERIES
+    for query, res in results:
+        keyword = query.split()[2]
+        assert res["llm_response"].startswith(f"Here's the user query: \n{query}\n")
+        assert keyword in res["top_k_chunks"][0]
+        # no other query's prompt or chunks leaked into this result
+        assert res["llm_response"].count("what is kw") == 1
+    # per-call inputs are never written back to the shared node
+    assert dict(rag_qa.instantiated_inputs) == instantiated
@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.incremental_index import IncrementalTfidfIndex
+
+QUERIES = ["w1 w2 w3", "w10 w10 w42", "w250 unknown", "nothing known"]
+
+
+def random_documents(n: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(300)]
+    return {f"doc{i}": [" ".join(rng.choices(vocabulary, k=rng.randint(3, 30))) for _ in range(rng.randint(1, 4))]
+            for i in range(n)}
+
+
+def assert_matches_refit(index: IncrementalTfidfIndex, vectorizer: TfidfVectorizer, documents: dict) -> None:
+    matrix, chunks, _ = index.snapshot()
+    assert sorted(chunks) == sorted(chunk for doc in documents.values() for chunk in doc)
+
+    fresh = TfidfVectorizer(**vectorizer.get_params())
+    expected = fresh.fit_transform(chunks)
+    # the index keeps its own column order, and columns for terms no live chunk uses any more
+    columns = [index.vocabulary_[term] for term in fresh.get_feature_names_out()]
+    np.testing.assert_allclose(matrix[:, columns].toarray(), expected.toarray(), atol=1e-12)
+    assert matrix.sum() == pytest.approx(matrix[:, columns].sum())
+    np.testing.assert_allclose(index.transform(QUERIES)[:, columns].toarray(), fresh.transform(QUERIES).toarray(),
+                               atol=1e-12)
+
+
+@pytest.mark.parametrize("params", [{}, {"sublinear_tf": True, "smooth_idf": False},
+                                    {"ngram_range": (1, 2), "binary": True}])
+def test_updates_match_a_full_refit(params):
+    vectorizer = TfidfVectorizer(**params)
+    index = IncrementalTfidfIndex(vectorizer)
+    documents = random_documents(200)
+    assert index.sync(documents) == (list(documents), [], [])
+    assert_matches_refit(index, vectorizer, documents)
+
+    updated = random_documents(60, seed=1)
+    updated = {**{doc_id: chunks for doc_id, chunks in documents.items() if doc_id not in ("doc3", "doc4")},
+               "doc0": updated["doc0"], "doc1": updated["doc1"], "new0": updated["doc2"], "new1": updated["doc5"]}
+    assert index.sync(updated) == (["new0", "new1"], ["doc0", "doc1"], ["doc3", "doc4"])
+    assert_matches_refit(index, vectorizer, updated)
+
+    index.remove("doc10")
+    index.upsert("doc11", ["w1 w2 w3 w3"])
+    del updated["doc10"]
+    updated["doc11"] = ["w1 w2 w3 w3"]
+    assert_matches_refit(index, vectorizer, updated)
+
+    index.compact()
+    assert index.drift == 0
+    assert_matches_refit(index, vectorizer, updated)
+    index.refit()
+    assert_matches_refit(index, vectorizer, updated)
+
+
+def test_unchanged_documents_are_left_alone():
+    index = IncrementalTfidfIndex(TfidfVectorizer())
+    documents = random_documents(50)
+    index.sync(documents)
+    snapshot = index.snapshot()
+    assert index.sync(documents) == ([], [], [])
+    assert index.snapshot() is snapshot
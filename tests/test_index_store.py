@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from src.index_store import load_tfidf_index, save_tfidf_index
+
+
+def random_texts(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(200)] + ["café", "naïve", "日本語"]
+    return [" ".join(rng.choices(vocabulary, k=rng.randint(3, 30))) for _ in range(n)]
+
+
+def fitted_index(vectorizer: TfidfVectorizer, texts: list) -> tuple:
+    fitted = TfidfVectorizer(**vectorizer.get_params()).fit(texts)
+    return fitted, normalize(fitted.transform(texts)), texts
+
+
+def top_k(query_vectors, matrix, k: int = 5) -> np.ndarray:
+    scores = (query_vectors @ matrix.T).toarray()
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+
+def test_saved_index_serves_the_same_results(tmp_path):
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2))
+    fitted, matrix, texts = fitted_index(vectorizer, random_texts(300))
+    save_tfidf_index(str(tmp_path / "index"), fitted, matrix, texts)
+
+    transformer, loaded_matrix, chunks = load_tfidf_index(str(tmp_path / "index"), vectorizer)
+    assert list(chunks) == texts
+    assert (loaded_matrix != matrix).nnz == 0
+    queries = random_texts(20, seed=1) + ["café 日本語", "unknown"]
+    expected = normalize(fitted.transform(queries))
+    np.testing.assert_allclose(transformer.transform(queries).toarray(), expected.toarray(), atol=1e-12)
+    np.testing.assert_array_equal(top_k(transformer.transform(queries), loaded_matrix), top_k(expected, matrix))
+
+
+def test_index_for_other_params_is_rejected(tmp_path):
+    fitted, matrix, texts = fitted_index(TfidfVectorizer(), random_texts(50))
+    save_tfidf_index(str(tmp_path / "index"), fitted, matrix, texts)
+    assert load_tfidf_index(str(tmp_path / "index"), TfidfVectorizer(sublinear_tf=True)) is None
+    assert load_tfidf_index(str(tmp_path / "missing"), TfidfVectorizer()) is None
+
+
+def test_saving_over_an_index_replaces_it(tmp_path):
+    vectorizer = TfidfVectorizer()
+    save_tfidf_index(str(tmp_path / "index"), *fitted_index(vectorizer, random_texts(50)))
+    texts = random_texts(80, seed=2)
+    save_tfidf_index(str(tmp_path / "index"), *fitted_index(vectorizer, texts))
+    assert list(load_tfidf_index(str(tmp_path / "index"), vectorizer)[2]) == texts
+    # neither the temporary nor the replaced directory is left behind
+    assert [p.name for p in tmp_path.iterdir()] == ["index"]
@@ -0,0 +1,34 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+from src.hypernodes import HyperNode
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_responses_are_cached_only_where_configured(tmp_path, monkeypatch):
+    # node folders in the hp configs are relative to the repository root
+    monkeypatch.chdir(ROOT)
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "a.txt").write_text("alpha is the first letter.")
+    calls = []
+
+    def completion(model: str, messages: list, **kwargs) -> SimpleNamespace:
+        calls.append(messages)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="alpha"))])
+
+    inputs = {"query": "what is first?", "completion_fn": completion}
+    node = HyperNode.load(str(ROOT / "src" / "nodes" / "rag_qa"))
+    node.instantiate_inputs(overrides={"texts_path": str(corpus)})
+    node.execute(final_vars=["llm_response"], inputs=inputs)
+    node.execute(final_vars=["llm_response"], inputs=inputs)
+    # off by default: nothing is written to the working directory
+    assert len(calls) == 2 and "llm_cache_path" not in node.instantiated_inputs
+
+    cache_path = tmp_path / "llm" / "cache.sqlite"
+    node.instantiate_inputs(selections={"use_llm_cache": True},
+                            overrides={"texts_path": str(corpus), "llm_cache_path": str(cache_path)})
+    for _ in range(2):
+        assert node.execute(final_vars=["llm_response"], inputs=inputs)["llm_response"] == "alpha"
+    assert len(calls) == 3 and cache_path.exists()
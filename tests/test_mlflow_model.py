@@ -0,0 +1,71 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("mlflow")
+
+from src.hypernodes import HyperNode
+from src.mlflow_utils import HyperNodeMLFlow
+from src.profiling import profiling
+
+ROOT = Path(__file__).resolve().parent.parent
+N_DOCS = 20
+
+
+def echo_completion(model: str, messages: list, **kwargs) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=messages[-1]["content"]))])
+
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    # node folders in the hp configs are relative to the repository root
+    monkeypatch.chdir(ROOT)
+    for i in range(N_DOCS):
+        (tmp_path / f"doc_{i:02d}.txt").write_text(f"Document {i} is about kw{i:02d}.\n\nkw{i:02d} is only here.\n")
+    node = HyperNode.load(str(ROOT / "src" / "nodes" / "rag_qa"), use_cache=False)
+    model = HyperNodeMLFlow(node, ["llm_response", "top_k_chunks"], max_concurrency=4,
+                            overrides={"texts_path": str(tmp_path), "use_llm_cache": False})
+    model.load_context(SimpleNamespace(artifacts={}))
+    return model
+
+
+def test_batch_predictions_equal_per_row_predictions(model):
+    rows = pd.DataFrame({"query": [f"what is kw{i:02d}?" for i in range(N_DOCS)],
+                         "completion_fn": [echo_completion] * N_DOCS})
+    with profiling() as report:
+        batch = model.predict(None, rows)
+    single = [model.predict(None, rows.iloc[[i]]) for i in range(N_DOCS)]
+    assert batch == single
+    assert all(f"kw{i:02d}" in res["top_k_chunks"][0] for i, res in enumerate(batch))
+
+    # retrieval ran once for the whole batch, through the ranker's batch node
+    nodes = report.to_dict()["nodes"]
+    assert nodes["rag_qa.batch_top_k_chunks"]["calls"] == 1
+    assert "rag_qa.top_k_chunks" not in nodes
+    assert nodes["rag_qa.llm_response"]["calls"] == N_DOCS
+
+
+def test_warm_start_pins_results_that_dont_depend_on_the_warmup_inputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    (tmp_path / "a.txt").write_text("alpha is the first letter.\n\nbeta is the second letter.\n")
+    node = HyperNode.load(str(ROOT / "src" / "nodes" / "rag_qa"), use_cache=False)
+    model = HyperNodeMLFlow(node, "top_k_chunks", warm_start=True, warmup_nodes=["text_chunks", "top_k_chunks"],
+                            warmup_inputs={"query": "warm up"},
+                            overrides={"texts_path": str(tmp_path), "use_llm_cache": False})
+    model.load_context(SimpleNamespace(artifacts={}))
+
+    assert node.driver is not None
+    assert {"instantiate_seconds", "driver_seconds", "warmup_nodes_seconds", "total_seconds"} <= set(model.warmup_timings)
+    # top_k_chunks was computed for the dummy query, so only text_chunks is kept for predictions
+    assert set(model._pinned_results) == {"text_chunks"}
+
+    with profiling() as report:
+        assert "beta" in model.predict(None, pd.DataFrame({"query": ["what is beta?"]}))[0]
+    nodes = report.to_dict()["nodes"]
+    assert "rag_qa.top_k_chunks" in nodes
+    assert "rag_qa.text_chunks" not in nodes and "rag_qa.corpus" not in nodes
+
+    # pinned results are rebuilt by load_context rather than shipped with the pickled model
+    assert model.__getstate__()["_pinned_results"] == {}
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+from hamilton import ad_hoc_utils
+from hamilton.driver import Builder
+
+mlflow = pytest.importorskip("mlflow")
+
+from src.mlflow_tracking import AsyncMLFlowTracker
+
+
+def n_chunks(texts: list) -> int:
+    return len(texts)
+
+
+def summary(texts: list, prefix: str = "") -> str:
+    return prefix + " ".join(texts)
+
+
+dag = ad_hoc_utils.create_temporary_module(n_chunks, summary, module_name="tracked_dag")
+
+
+@pytest.fixture
+def tracking_uri(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    return (tmp_path / "mlruns").as_uri()
+
+
+def execute(tracker: AsyncMLFlowTracker, texts: list) -> None:
+    driver = Builder().with_modules(dag).with_adapters(tracker).build()
+    driver.execute(["n_chunks", "summary"], inputs={"texts": texts})
+
+
+def writer_threads(tracker: AsyncMLFlowTracker) -> list:
+    # the writer's bound method keeps a reference to its tracker
+    return [t for t in threading.enumerate()
+            if t.name == "mlflow-tracker" and getattr(getattr(t, "_target", None), "__self__", None) is tracker]
+
+
+def wait_for(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_runs_are_logged_to_a_file_store(tracking_uri):
+    tracker = AsyncMLFlowTracker("test", tracking_uri=tracking_uri, flush_interval=0.05)
+    execute(tracker, ["a", "b", "c"])
+    assert tracker.close(timeout=30)
+
+    client = mlflow.MlflowClient(tracking_uri)
+    [run] = client.search_runs([client.get_experiment_by_name("test").experiment_id])
+    assert run.info.status == "FINISHED"
+    assert run.data.metrics == {"n_chunks": 3.0}
+    assert run.data.params["texts"] == "['a', 'b', 'c']"
+    assert {a.path for a in client.list_artifacts(run.info.run_id)} >= {"summary.txt", "config.json"}
+
+
+def test_writer_exits_when_idle_and_restarts(tracking_uri):
+    tracker = AsyncMLFlowTracker("test", tracking_uri=tracking_uri, flush_interval=0.05, idle_timeout=0.2)
+    execute(tracker, ["a"])
+    assert tracker.flush(timeout=30)
+    assert wait_for(lambda: not writer_threads(tracker))
+
+    execute(tracker, ["a", "b"])
+    assert tracker.close(timeout=30)
+    assert wait_for(lambda: not writer_threads(tracker))
+    client = mlflow.MlflowClient(tracking_uri)
+    runs = client.search_runs([client.get_experiment_by_name("test").experiment_id])
+    assert sorted(run.data.metrics["n_chunks"] for run in runs) == [1.0, 2.0]
+
+
+def test_failed_batches_are_dropped_after_max_send_attempts(tracking_uri, monkeypatch):
+    calls = []
+
+    def failing_log_batch(self, run_id, **kwargs):
+        calls.append(run_id)
+        raise ConnectionError("tracking server unreachable")
+
+    monkeypatch.setattr(mlflow.MlflowClient, "log_batch", failing_log_batch)
+    tracker = AsyncMLFlowTracker("test", tracking_uri=tracking_uri, flush_interval=0.05, idle_timeout=0.2,
+                                 max_send_attempts=3)
+    execute(tracker, ["a"])
+    assert tracker.flush(timeout=30)
+    # given up after 3 attempts, so nothing is left pending and the writer can exit
+    assert wait_for(lambda: not writer_threads(tracker))
+    assert len(calls) == 3
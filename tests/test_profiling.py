@@ -0,0 +1,55 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from src.hypernodes import HyperNode
+from src.profiling import profiling
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def echo_completion(model: str, messages: list, **kwargs) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=messages[-1]["content"]))])
+
+
+@pytest.fixture
+def rag_qa(tmp_path, monkeypatch):
+    # node folders in the hp configs are relative to the repository root
+    monkeypatch.chdir(ROOT)
+    (tmp_path / "a.txt").write_text("alpha is the first letter.\n\nbeta is the second letter.\n")
+    node = HyperNode.load(str(ROOT / "src" / "nodes" / "rag_qa"))
+    node.instantiate_inputs(selections={"use_llm_cache": False}, overrides={"texts_path": str(tmp_path)})
+    return node
+
+
+def test_report_nests_nodes_under_their_hypernodes(rag_qa):
+    inputs = {"query": "what is beta?", "completion_fn": echo_completion}
+    with profiling(track_memory=True) as report:
+        for _ in range(2):
+            rag_qa.execute(final_vars=["llm_response"], inputs=inputs)
+
+    nodes = report.to_dict()["nodes"]
+    assert nodes["rag_qa"]["calls"] == 2
+    assert nodes["rag_qa.llm_response"]["calls"] == 2
+    # the ranker runs inside rag_qa's top_k_chunks node, and its own nodes inside it
+    ranker = "rag_qa.top_k_chunks/sklearn_ranker"
+    assert nodes[ranker]["calls"] == 2 and nodes[f"{ranker}.similarities"]["calls"] == 2
+    assert nodes["rag_qa.top_k_chunks"]["total_seconds"] >= nodes[ranker]["total_seconds"] \
+        >= nodes[f"{ranker}.similarities"]["total_seconds"]
+    assert report.wall_time >= nodes["rag_qa"]["total_seconds"]
+    assert all("peak_memory_delta_bytes" in stats for stats in nodes.values())
+    assert report.slowest(1)[0][0] == "rag_qa"
+    assert report.to_metrics()["profile/rag_qa/calls"] == 2.0
+
+
+def test_nothing_is_recorded_outside_a_sampled_block(rag_qa):
+    inputs = {"query": "what is beta?", "completion_fn": echo_completion}
+    res, report = rag_qa.profile(final_vars=["llm_response"], inputs=inputs)
+    assert set(report.to_dict()["nodes"]) >= {"rag_qa", "rag_qa.llm_response"}
+
+    rag_qa.execute(final_vars=["llm_response"], inputs=inputs)
+    assert report.to_dict()["nodes"]["rag_qa"]["calls"] == 1
+    with profiling(sample_rate=0.0) as unsampled:
+        assert unsampled is None
+        assert rag_qa.execute(final_vars=["llm_response"], inputs=inputs) == res
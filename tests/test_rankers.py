@@ -0,0 +1,30 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from src.hypernodes import HyperNode
+
+ROOT = Path(__file__).resolve().parent.parent
+RANKERS = ["sklearn_ranker", "bm25_ranker"]
+
+
+def random_texts(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(300)]
+    return [" ".join(rng.choices(vocabulary, k=rng.randint(5, 40))) for _ in range(n)]
+
+
+@pytest.mark.parametrize("ranker", RANKERS)
+def test_batch_results_equal_per_query_results(ranker):
+    node = HyperNode.load(str(ROOT / "src" / "nodes" / ranker))
+    node.instantiate_inputs(overrides={"top_k": 5})
+    texts = random_texts(400)
+    queries = random_texts(37, seed=1) + ["unknown terms only"]
+
+    # blocks of 8 queries, so the last block is a partial one
+    batch = node.execute(final_vars=["batch_top_k_chunks"],
+                         inputs={"text_chunks": texts, "queries": queries, "batch_block_size": 8})
+    single = [node.execute(final_vars=["top_k_chunks"], inputs={"text_chunks": texts, "query": query})
+              for query in queries]
+    assert batch["batch_top_k_chunks"] == [res["top_k_chunks"] for res in single]
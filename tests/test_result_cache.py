@@ -0,0 +1,78 @@
+import time
+
+from hamilton import ad_hoc_utils
+from hamilton.driver import Builder
+
+from src.result_cache import ResultCacheAdapter
+
+calls = []
+
+
+def chunks(text: str) -> list:
+    calls.append(text)
+    return text.split()
+
+
+def n_chunks(chunks: list) -> int:
+    return len(chunks)
+
+
+dag = ad_hoc_utils.create_temporary_module(chunks, n_chunks, module_name="cached_dag")
+
+
+def execute(adapter: ResultCacheAdapter, text: str, module=dag) -> dict:
+    driver = Builder().with_modules(module).with_adapters(adapter).build()
+    return driver.execute(["chunks", "n_chunks"], inputs={"text": text})
+
+
+def test_hits_return_the_same_object_and_misses_recompute(tmp_path):
+    calls.clear()
+    adapter = ResultCacheAdapter(str(tmp_path), nodes=["chunks"])
+    first = execute(adapter, "a b c")
+    second = execute(adapter, "a b c")
+    assert calls == ["a b c"]
+    # served from memory: later nodes see the very same object, not an unpickled copy
+    assert second["chunks"] is first["chunks"]
+    assert len(list(tmp_path.glob("*.pkl"))) == 1
+
+    assert execute(adapter, "a b")["n_chunks"] == 2
+    assert calls == ["a b c", "a b"]
+
+
+def test_entries_survive_on_disk(tmp_path):
+    calls.clear()
+    execute(ResultCacheAdapter(str(tmp_path)), "a b c")
+    res = execute(ResultCacheAdapter(str(tmp_path)), "a b c")
+    assert calls == ["a b c"]
+    assert res == {"chunks": ["a", "b", "c"], "n_chunks": 3}
+
+
+def test_changing_a_node_source_invalidates_its_entries(tmp_path):
+    adapter = ResultCacheAdapter(str(tmp_path), nodes=["chunks"])
+    execute(adapter, "a,b c")
+
+    def chunks(text: str) -> list:
+        return text.split(",")
+
+    changed = ad_hoc_utils.create_temporary_module(chunks, n_chunks, module_name="changed_dag")
+    assert execute(adapter, "a,b c", module=changed)["chunks"] == ["a", "b c"]
+    assert execute(adapter, "a,b c")["chunks"] == ["a,b", "c"]
+
+
+def test_least_recently_used_entries_are_evicted_past_max_size(tmp_path):
+    # room for two entries of ~40KB, not three
+    adapter = ResultCacheAdapter(str(tmp_path), max_size_mb=0.1, nodes=["chunks"], memory_size=0)
+    texts = [" ".join(f"{word}{i}" for i in range(5000)) for word in ("x", "y", "z")]
+    # a hit on texts[0] leaves texts[1] the least recently used; spaced out, since the last access
+    # is read from mtimes, which some filesystems only keep to the clock tick
+    for text in [texts[0], texts[1], texts[0], texts[2]]:
+        execute(adapter, text)
+        time.sleep(0.05)
+    assert len(list(tmp_path.glob("*.pkl"))) == 2
+
+    calls.clear()
+    execute(adapter, texts[0])
+    execute(adapter, texts[2])
+    assert calls == []
+    execute(adapter, texts[1])
+    assert calls == [texts[1]]
@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from src.hypernodes import HyperNode
+from src.profiling import profiling
+from src.sweep import plan_sweep
+
+ROOT = Path(__file__).resolve().parent.parent
+SYSTEM_PROMPTS = ["Answer with one word only", "Answer in one sentence", "Answer in French"]
+
+
+def echo_completion(model: str, messages: list, **kwargs) -> SimpleNamespace:
+    content = f"{messages[0]['content']}: {messages[-1]['content']}"
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture
+def batch_qa(tmp_path, monkeypatch):
+    # node folders in the hp configs are relative to the repository root
+    monkeypatch.chdir(ROOT)
+    # batch_qa's rag_qa node calls litellm's completion, there's no input to pass it another one
+    monkeypatch.setitem(sys.modules, "litellm", SimpleNamespace(completion=echo_completion))
+    texts = tmp_path / "texts"
+    texts.mkdir()
+    for i in range(5):
+        (texts / f"doc_{i}.txt").write_text(f"Document {i} is about kw{i}.\n\nkw{i} is only here.\n")
+    pd.DataFrame({"questions": [f"what is kw{i}?" for i in range(5)],
+                  "answers": [f"kw{i}" for i in range(5)]}).to_excel(tmp_path / "qa.xlsx", index=False)
+    node = HyperNode.load(str(ROOT / "src" / "nodes" / "batch_qa"))
+    selections = {"use_mlflow_adapter": False}
+    overrides = {"queries_path": str(tmp_path / "qa.xlsx"), "texts_path": str(texts),
+                 "rag_qa.texts_path": str(texts)}
+    return node, selections, overrides
+
+
+def test_generation_params_do_not_affect_retrieval(batch_qa):
+    node, selections, overrides = batch_qa
+    plan = plan_sweep(node, {"rag_qa.system_prompt": SYSTEM_PROMPTS, "rag_qa.ranker.top_k": [1, 2]},
+                      selections=selections, overrides=overrides)
+    # rag_qa's system prompt only changes its llm_response, which questions_top_k_chunks doesn't execute
+    assert plan.affected_nodes["rag_qa.system_prompt"] == \
+        ["batch_qa.accuracy", "batch_qa.checkpoint_log", "batch_qa.llm_responses", "rag_qa.llm_response"]
+    assert {"batch_qa.questions_top_k_chunks", "rag_qa.batch_top_k_chunks"} \
+        <= set(plan.affected_nodes["rag_qa.ranker.top_k"])
+    assert plan.params == ["rag_qa.ranker.top_k", "rag_qa.system_prompt"]
+
+
+def test_sweeping_a_generation_param_runs_retrieval_once(batch_qa):
+    node, selections, overrides = batch_qa
+    with profiling() as report:
+        runs = node.sweep({"rag_qa.system_prompt": SYSTEM_PROMPTS}, final_vars=["llm_responses"],
+                          selections=selections, overrides=overrides)
+
+    assert [run.config for run in runs] == [{"rag_qa.system_prompt": prompt} for prompt in SYSTEM_PROMPTS]
+    for prompt, run in zip(SYSTEM_PROMPTS, runs):
+        assert len(run.results["llm_responses"]) == 5
+        assert all(response.startswith(f"{prompt}: ") for response in run.results["llm_responses"])
+    nodes = report.to_dict()["nodes"]
+    # the system prompt isn't upstream of rag_qa's retrieval, so the later configs reuse its result
+    assert nodes["batch_qa.questions_top_k_chunks"]["calls"] == 1
+    retrieval = [name for name in nodes if name.endswith("/rag_qa.batch_top_k_chunks")]
+    assert retrieval and all(nodes[name]["calls"] == 1 for name in retrieval)
+    assert sum(stats["calls"] for name, stats in nodes.items() if name.endswith("rag_qa.llm_response")) == 15